@@ -0,0 +1,185 @@
+# api_server.py
+
+# Schlanker JSON-HTTP-Server für Libby ohne Oberfläche (z.B. für andere Frontends oder Lasttests).
+# Jede Anfrage läuft als Coroutine (handle_user_message_async); während GPT antwortet, ist kein
+# Thread blockiert. Die Verläufe liegen im Session-Speicher (session_store.py).
+#
+#   POST /chat     {"message": "...", "session_id": "..."}  →  {"session_id", "reply", "medium_ids"}
+#   GET  /health   Auslastung: laufende und wartende Anfragen, Ablehnungen, Trefferquote des Schnellwegs
+#
+# Gegendruck: höchstens --max-concurrent Runden laufen gleichzeitig, höchstens --max-queue warten.
+# Ist auch die Warteschlange voll, gibt es sofort 503 mit Retry-After, statt Anfragen endlos zu
+# stapeln. Eine Session bearbeitet immer nur eine Nachricht zur Zeit (sonst 409).
+# Persönliche Empfehlungen (Tool recommend_for_me) gibt es nur mit --user-header: der Server muss
+# dann hinter einem Proxy laufen, der die Nutzer anmeldet und diesen Header selbst setzt (ein vom
+# Client mitgeschickter Header muss dort überschrieben werden). Ohne die Option ist niemand angemeldet.
+#
+#   python api_server.py --port 8080 --max-concurrent 32 --max-queue 64
+#   OPENAI_BASE_URL=http://127.0.0.1:8001/v1 python api_server.py   (gegen einen Fake-Server, siehe benchmarks/)
+
+import argparse
+import asyncio
+import json
+import re
+import uuid
+
+import tornado.web
+
+import intent_router
+import tracing
+from chat_engine import handle_user_message_async
+from session_store import get_session_store
+
+MAX_CONCURRENT = 32   # gleichzeitig laufende Runden
+MAX_QUEUE = 64        # wartende Runden, darüber 503
+RETRY_AFTER = 1       # Sekunden (Header Retry-After bei 503)
+MAX_MESSAGE_CHARS = 2000
+
+# medium_id-Liste auf der letzten Zeile der Antwort, z.B. "[12345, 67896]"
+ID_LIST = re.compile(r"\[([\d,\s]*)\]\s*`*\s*$")
+
+
+# Trennt die abschliessende medium_id-Liste vom Antworttext
+def split_reply(text):
+    match = ID_LIST.search(text or "")
+    if not match:
+        return text, []
+    ids = [int(x) for x in match.group(1).split(",") if x.strip()]
+    return text[:match.start()].rstrip(" `\n"), ids
+
+
+class Limiter:
+    def __init__(self, max_concurrent=MAX_CONCURRENT, max_queue=MAX_QUEUE):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self.in_flight = 0
+        self.queued = 0
+        self.rejected = 0
+
+    # False, wenn schon zu viele Anfragen laufen und warten
+    def admit(self):
+        if self.in_flight + self.queued >= self.max_concurrent + self.max_queue:
+            self.rejected += 1
+            tracing.add("api_rejected_total", 1)
+            return False
+        return True
+
+    async def __aenter__(self):
+        self.queued += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.queued -= 1
+        self.in_flight += 1
+        return self
+
+    async def __aexit__(self, *exc):
+        self.in_flight -= 1
+        self._semaphore.release()
+        return False
+
+
+class JsonHandler(tornado.web.RequestHandler):
+    def write_json(self, status, data):
+        self.set_status(status)
+        self.set_header("Content-Type", "application/json; charset=utf-8")
+        self.finish(json.dumps(data, ensure_ascii=False))
+
+    def write_error(self, status_code, **kwargs):
+        self.write_json(status_code, {"error": self._reason})
+
+
+class ChatHandler(JsonHandler):
+    def initialize(self, limiter, busy, client, user_header=None):
+        self.limiter = limiter
+        self.busy = busy      # Sessions, die gerade eine Nachricht bearbeiten
+        self.client = client  # None: gemeinsamer AsyncOpenAI-Client
+        self.user_header = user_header  # Header mit der Ausweisnummer vom anmeldenden Proxy; None: keine
+
+    async def post(self):
+        try:
+            body = json.loads(self.request.body or b"{}")
+            message = str(body["message"]).strip()
+        except (ValueError, KeyError, TypeError):
+            return self.write_json(400, {"error": "JSON mit Feld 'message' erwartet"})
+        if not message or len(message) > MAX_MESSAGE_CHARS:
+            return self.write_json(400, {"error": f"'message' muss 1 bis {MAX_MESSAGE_CHARS} Zeichen lang sein"})
+
+        session_id = str(body.get("session_id") or uuid.uuid4().hex)
+        if session_id in self.busy:
+            return self.write_json(409, {"error": "Diese Session bearbeitet noch eine Nachricht", "session_id": session_id})
+        if not self.limiter.admit():
+            self.set_header("Retry-After", str(RETRY_AFTER))
+            return self.write_json(503, {"error": "Zu viele gleichzeitige Anfragen, bitte später erneut versuchen"})
+
+        self.busy.add(session_id)
+        try:
+            async with self.limiter:
+                # SQLite blockiert (Lesen, Schreiben, Warten auf die Sperre), deshalb in einem Thread
+                store = get_session_store()
+                session = await asyncio.to_thread(store.get, session_id)
+                session.memory.user_id = self.request.headers.get(self.user_header) if self.user_header else None
+                try:
+                    reply = await handle_user_message_async(message, session.memory, self.client)
+                except Exception as e:
+                    print(f"❌ Fehler in Session {session_id}: {e}")
+                    return self.write_json(502, {"error": "Das Sprachmodell ist nicht erreichbar", "session_id": session_id})
+                await asyncio.to_thread(store.save, session_id, session)
+        finally:
+            self.busy.discard(session_id)
+
+        text, medium_ids = split_reply(reply)
+        self.write_json(200, {"session_id": session_id, "reply": text, "medium_ids": medium_ids})
+
+
+class HealthHandler(JsonHandler):
+    def initialize(self, limiter):
+        self.limiter = limiter
+
+    def get(self):
+        limiter = self.limiter
+        self.write_json(200, {
+            "status": "ok",
+            "in_flight": limiter.in_flight,
+            "queued": limiter.queued,
+            "rejected": limiter.rejected,
+            "max_concurrent": limiter.max_concurrent,
+            "max_queue": limiter.max_queue,
+            "router": intent_router.router.stats(),
+        })
+
+
+# Baut die Tornado-Anwendung; `client` ersetzt den OpenAI-Client (z.B. für Tests)
+def make_app(max_concurrent=MAX_CONCURRENT, max_queue=MAX_QUEUE, client=None, user_header=None):
+    limiter = Limiter(max_concurrent, max_queue)
+    return tornado.web.Application([
+        (r"/chat", ChatHandler, {"limiter": limiter, "busy": set(), "client": client, "user_header": user_header}),
+        (r"/health", HealthHandler, {"limiter": limiter}),
+    ])
+
+
+async def serve(host, port, max_concurrent, max_queue, user_header=None):
+    app = make_app(max_concurrent, max_queue, user_header=user_header)
+    app.listen(port, address=host)
+    print(f"📡 Libby-API auf http://{host}:{port} (max. {max_concurrent} gleichzeitig, {max_queue} wartend)")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="JSON-HTTP-Server für Libby")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--max-concurrent", type=int, default=MAX_CONCURRENT, help="Gleichzeitig laufende Runden")
+    parser.add_argument("--max-queue", type=int, default=MAX_QUEUE, help="Wartende Runden, darüber 503")
+    parser.add_argument("--warmup", action="store_true", help="Modell und Daten vor dem Start laden")
+    parser.add_argument("--trace", help="Spans/Kennzahlen ausgeben (wie LIBBY_TRACE)")
+    parser.add_argument("--user-header", help="Header mit der Ausweisnummer, gesetzt vom anmeldenden Proxy (z.B. X-Libby-User)")
+    args = parser.parse_args()
+
+    if args.trace:
+        tracing.configure(args.trace)
+    if args.warmup:
+        import startup
+        startup.warm_up(client=False)
+    asyncio.run(serve(args.host, args.port, args.max_concurrent, args.max_queue, args.user_header))
@@ -0,0 +1,142 @@
+# availability.py
+
+# Verfügbarkeitsabfragen bei biblioweb (Ausleihstatus pro medium_id).
+# Statt pro Buchkarte einen blockierenden requests.post mit neuer Verbindung zu machen,
+# fragt der AvailabilityService mehrere medium_ids parallel über eine gemeinsame Session
+# (Connection-Pool) ab und legt die Antworten in einem prozessweiten Cache ab:
+# - frische Einträge (jünger als ttl) werden direkt geliefert
+# - Fehler werden kurz negativ gecacht (negative_ttl), damit ein hängender Server nicht jede Karte bremst
+# - abgelaufene, aber noch nicht zu alte Einträge (stale_ttl) werden sofort geliefert und im
+#   Hintergrund aktualisiert (stale-while-revalidate); schlägt die Aktualisierung fehl, bleibt der
+#   alte Wert stehen und der nächste Versuch kommt frühestens nach negative_ttl
+# base_url ist einstellbar, damit man gegen einen lokalen Test-Server prüfen kann.
+
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import tracing
+
+BASE_URL = "https://seengen.biblioweb.ch"
+
+
+class AvailabilityService:
+    def __init__(self, base_url=BASE_URL, ttl=300, negative_ttl=30, stale_ttl=3600, timeout=5,
+                 max_workers=8, session=None):
+        self.base_url = base_url.rstrip("/")
+        self.ttl = ttl                    # Sekunden, die ein Status als frisch gilt
+        self.negative_ttl = negative_ttl  # Sekunden, die ein Fehler gemerkt wird
+        self.stale_ttl = stale_ttl        # bis dahin wird ein alter Status geliefert und nachgeladen
+        self.timeout = timeout
+
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        self.session = session
+        self.session.headers.setdefault("User-Agent", "Mozilla/5.0")
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="availability")
+        self._cache = {}     # medium_id → (status oder None, Zeitpunkt)
+        self._inflight = {}  # medium_id → laufende Abfrage (Future), damit nichts doppelt abgefragt wird
+        self._retry_at = {}  # medium_id → frühester neuer Versuch nach fehlgeschlagener Aktualisierung
+        self._lock = threading.Lock()
+
+    # Eine einzelne Abfrage beim Server; None bei jedem Fehler
+    def _fetch(self, medium_id):
+        url = f"{self.base_url}/medium/status/{medium_id}"
+        with tracing.span("availability.fetch", medium_id=medium_id) as span:
+            try:
+                response = self.session.post(url, timeout=self.timeout)
+                span.set(http_status=response.status_code, response_bytes=len(response.content))
+                response.raise_for_status()
+                return response.json()["ausleihstatus"]["status"]
+            except (requests.RequestException, KeyError, TypeError, ValueError) as e:
+                span.status = "error"
+                span.set(error=str(e))
+                return None
+
+    def _fetch_and_store(self, medium_id):
+        try:
+            status = self._fetch(medium_id)
+            now = time.monotonic()
+            with self._lock:
+                previous, previous_at = self._cache.get(medium_id, (None, 0.0))
+                if status is None and previous is not None and now - previous_at < self.stale_ttl:
+                    # Fehler beim Aktualisieren: guten alten Wert behalten, statt ihn mit None zu überschreiben
+                    self._retry_at[medium_id] = now + self.negative_ttl
+                    return previous
+                self._cache[medium_id] = (status, now)
+                self._retry_at.pop(medium_id, None)
+            return status
+        finally:
+            with self._lock:
+                self._inflight.pop(medium_id, None)
+
+    # Startet eine Abfrage, falls für diese medium_id nicht schon eine läuft (Aufruf nur mit Lock)
+    def _submit(self, medium_id):
+        future = self._inflight.get(medium_id)
+        if future is None:
+            future = self._executor.submit(contextvars.copy_context().run, self._fetch_and_store, medium_id)
+            self._inflight[medium_id] = future
+        return future
+
+    # Status für mehrere medium_ids; dauert höchstens so lange wie die langsamste einzelne Abfrage
+    def get_many(self, medium_ids):
+        with tracing.span("availability") as span:
+            results, pending = self._get_many(medium_ids)
+            span.set(requested=len(results) + len(pending), cached=len(results), fetched=len(pending))
+            if pending:
+                wait(pending.values())
+                for medium_id, future in pending.items():
+                    results[medium_id] = future.result()
+        return results
+
+    # Liefert (Ergebnisse aus dem Cache, noch laufende Abfragen)
+    def _get_many(self, medium_ids):
+        now = time.monotonic()
+        results, pending = {}, {}
+        with self._lock:
+            for medium_id in dict.fromkeys(int(m) for m in medium_ids if m is not None):
+                entry = self._cache.get(medium_id)
+                if entry is not None:
+                    status, fetched_at = entry
+                    age = now - fetched_at
+                    if age < (self.ttl if status is not None else self.negative_ttl):
+                        results[medium_id] = status
+                        continue
+                    if status is not None and age < self.stale_ttl:
+                        results[medium_id] = status  # alten Wert liefern ...
+                        if now >= self._retry_at.get(medium_id, 0):
+                            self._submit(medium_id)  # ... und im Hintergrund aktualisieren
+                        continue
+                pending[medium_id] = self._submit(medium_id)
+        return results, pending
+
+    def get(self, medium_id):
+        if medium_id is None:
+            return None
+        return self.get_many([medium_id]).get(int(medium_id))
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self._retry_at.clear()
+
+
+_default_service = None
+_default_lock = threading.Lock()
+
+
+# Prozessweit geteilter Dienst (ein Cache und ein Connection-Pool für alle Sessions)
+def get_availability_service():
+    global _default_service
+    with _default_lock:
+        if _default_service is None:
+            _default_service = AvailabilityService()
+        return _default_service
@@ -0,0 +1,4 @@
+# benchmarks/
+
+# Offline-Benchmarks für Libby. Ausführen aus dem Projektordner, z.B.:
+#   python -m benchmarks.bench_chat
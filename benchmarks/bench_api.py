@@ -0,0 +1,130 @@
+# benchmarks/bench_api.py
+
+# Lasttest für api_server.py, komplett lokal: Fake-OpenAI-Server (fake_llm_server.py) und
+# Libby-API laufen im selben Prozess auf freien Ports, der AsyncOpenAI-Client spricht über HTTP
+# mit dem Fake. Dann führen `--users` virtuelle Nutzer gleichzeitig die Unterhaltungen aus
+# bench_chat; bei 503 warten sie Retry-After ab und versuchen es erneut. Wie dort ist der Schnellweg
+# aus (--router schaltet ihn ein) und die Verfügbarkeit kommt von einem lokalen Fake-Server.
+# Ausgabe: Latenz pro Runde (p50/p95/p99), Runden pro Sekunde, Ablehnungen durch den Gegendruck.
+#
+#   python -m benchmarks.bench_api --users 200 --latency 0.5 --max-concurrent 64 --max-queue 64
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import os
+import socket
+import tempfile
+import time
+
+import tornado.httpclient
+
+import api_server
+import session_store
+from benchmarks import fake_llm_server
+from benchmarks.bench_chat import CONVERSATIONS, offline_services
+from benchmarks.stats import percentiles
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def run_user(http, url, conversations, turn_times, counts):
+    for conversation in conversations:
+        session_id = None
+        for turn in conversation["turns"]:
+            body = {"message": turn["user"], "session_id": session_id}
+            start = time.perf_counter()
+            while True:
+                response = await http.fetch(url, method="POST", body=json.dumps(body), raise_error=False)
+                if response.code != 503:
+                    break
+                counts["rejected"] += 1
+                await asyncio.sleep(float(response.headers.get("Retry-After", 1)))
+            turn_times.append(time.perf_counter() - start)
+            counts[response.code] = counts.get(response.code, 0) + 1
+            if response.code == 200:
+                session_id = json.loads(response.body)["session_id"]
+
+
+async def run_benchmark(users=50, latency=0.5, jitter=0.0, max_concurrent=api_server.MAX_CONCURRENT,
+                        max_queue=api_server.MAX_QUEUE, conversations=CONVERSATIONS, router=False):
+    from openai import AsyncOpenAI
+
+    llm_port, api_port = free_port(), free_port()
+    llm_stats = {"requests": 0}
+    scripts = fake_llm_server.scripts_from_conversations(conversations)
+    fake_llm_server.make_app(scripts, latency, jitter, llm_stats).listen(llm_port, address="127.0.0.1")
+    client = AsyncOpenAI(api_key="fake", base_url=f"http://127.0.0.1:{llm_port}/v1", max_retries=0)
+    api_server.make_app(max_concurrent, max_queue, client).listen(api_port, address="127.0.0.1")
+
+    # Ohne Begrenzung durch den Client selbst, sonst misst man dessen Warteschlange
+    http = tornado.httpclient.AsyncHTTPClient(force_instance=True, max_clients=users)
+    url = f"http://127.0.0.1:{api_port}/chat"
+
+    turn_times, counts = [], {"rejected": 0}
+    with offline_services(router):
+        # Aufwärmen: Daten und Indizes laden, bevor die Uhr läuft
+        await run_user(http, url, conversations[:1], [], {})
+
+        start = time.perf_counter()
+        await asyncio.gather(*(run_user(http, url, conversations, turn_times, counts) for _ in range(users)))
+        elapsed = time.perf_counter() - start
+    http.close()
+
+    return {
+        "config": {"users": users, "latency_s": latency, "jitter_s": jitter,
+                   "max_concurrent": max_concurrent, "max_queue": max_queue, "router": router},
+        "turns": percentiles(turn_times),
+        "turns_per_s": len(turn_times) / elapsed,
+        "llm_requests": llm_stats["requests"],
+        "responses": {str(code): n for code, n in counts.items() if code != "rejected"},
+        "rejected_503": counts["rejected"],
+        "elapsed_s": elapsed,
+    }
+
+
+def format_results(results):
+    turns = results["turns"]
+    return "\n".join([
+        f"{results['config']['users']} Nutzer, LLM-Latenz {results['config']['latency_s']} s, "
+        f"max. {results['config']['max_concurrent']} gleichzeitig / {results['config']['max_queue']} wartend",
+        f"  Runden: {turns['n']}  p50 {turns['p50_ms']:.0f} ms  p95 {turns['p95_ms']:.0f} ms  p99 {turns['p99_ms']:.0f} ms",
+        f"  Durchsatz: {results['turns_per_s']:.1f} Runden/s in {results['elapsed_s']:.1f} s "
+        f"({results['llm_requests']} LLM-Anfragen)",
+        f"  Antworten: {results['responses']}  abgelehnt (503): {results['rejected_503']}",
+    ])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lokaler Lasttest für api_server.py mit Fake-OpenAI-Server.")
+    parser.add_argument("--users", type=int, default=50, help="Gleichzeitige virtuelle Nutzer")
+    parser.add_argument("--latency", type=float, default=0.5, help="Simulierte LLM-Latenz pro Anfrage (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Zufällige Abweichung der Latenz (± s)")
+    parser.add_argument("--max-concurrent", type=int, default=api_server.MAX_CONCURRENT)
+    parser.add_argument("--max-queue", type=int, default=api_server.MAX_QUEUE)
+    parser.add_argument("--router", action="store_true", help="Schnellweg eingeschaltet lassen (einfache Fragen ohne GPT)")
+    parser.add_argument("--json", help="Ergebnisse zusätzlich als JSON in diese Datei schreiben")
+    args = parser.parse_args()
+
+    logging.getLogger("tornado.access").setLevel(logging.ERROR)  # keine Zeile pro 503
+
+    # Eigene, temporäre Session-Datenbank, damit der Test keine echten Sessions anlegt
+    with tempfile.TemporaryDirectory() as tmp:
+        session_store._default_store = session_store.SessionStore(os.path.join(tmp, "sessions.sqlite3"))
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = asyncio.run(run_benchmark(
+                args.users, args.latency, args.jitter, args.max_concurrent, args.max_queue, router=args.router
+            ))
+        session_store._default_store.close()
+
+    print(format_results(results))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
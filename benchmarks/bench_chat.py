@@ -0,0 +1,214 @@
+# benchmarks/bench_chat.py
+
+# End-to-End-Latenz-Benchmark der Chat-Pipeline, komplett offline.
+# handle_user_message (bzw. stream_user_message) wird mit dem FakeOpenAIClient durch typische
+# Unterhaltungen geführt; die Tools aus function_map laufen dabei echt gegen den lokalen Katalog.
+# Ausgabe: p50/p95/p99 pro Runde und pro Tool, optional zusätzlich als JSON-Datei.
+# Der Schnellweg (intent_router) ist standardmässig aus, damit jede Runde den GPT-Weg misst;
+# die Verfügbarkeit kommt von einem lokalen Fake-Server statt von biblioweb.
+#
+#   python -m benchmarks.bench_chat --repeats 20 --latency 0.5 --jitter 0.2
+#   python -m benchmarks.bench_chat --stream --json bench_chat.json
+#   python -m benchmarks.bench_chat --router      (mit Schnellweg: einfache Fragen ohne GPT)
+#
+# Hinweis: find_books_by_keyword braucht das SentenceTransformer-Modell im lokalen Cache.
+# Ohne Netzwerk und ohne Cache liefert das Tool eine leere Liste, der Benchmark läuft trotzdem.
+
+import argparse
+import contextlib
+import io
+import json
+import time
+from collections import defaultdict
+from functools import wraps
+
+import numpy as np  # für numerische Operationen (z.B. Mittelwerte)
+
+import availability
+import chat_engine
+import intent_router
+from benchmarks.fake_availability_server import FakeAvailabilityServer
+from benchmarks.fake_llm import FakeOpenAIClient
+from benchmarks.stats import percentiles
+
+# Typische Unterhaltungen: pro Runde die User-Nachricht und das Skript der GPT-Antworten
+CONVERSATIONS = [
+    {
+        "name": "books_like_title",
+        "turns": [{
+            "user": "Ich mochte 'Die Frau in Rot'. Hast du ähnliche Bücher?",
+            "script": [
+                {"tool_calls": [("is_book_in_library", {"title": "Die Frau in Rot"})]},
+                {"tool_calls": [
+                    ("find_similar_books_by_title", {"title": "Die Frau in Rot"}),
+                    ("recommend_by_shared_reads", {"isbn": "9783426509500"}),
+                ]},
+                {"content": "Wenn dir 'Die Frau in Rot' gefallen hat, passt 'Alle sieben Wellen'.\n[5459]"},
+            ],
+        }],
+    },
+    {
+        # Dieselbe Anfrage mit dem kombinierten Tool: eine GPT-Runde weniger
+        "name": "books_like_title_composite",
+        "turns": [{
+            "user": "Ich mochte 'Die Frau in Rot'. Hast du ähnliche Bücher?",
+            "script": [
+                {"tool_calls": [("recommend_books_like_title", {"title": "Die Frau in Rot"})]},
+                {"content": "Wenn dir 'Die Frau in Rot' gefallen hat, passt 'Verschwiegen'.\n[27196]"},
+            ],
+        }],
+    },
+    {
+        "name": "author_then_keyword",
+        "turns": [
+            {
+                "user": "Was habt ihr von Glattauer?",
+                "script": [
+                    {"tool_calls": [("find_books_by_author", {"author": "Glattauer"})]},
+                    {"content": "Von Daniel Glattauer haben wir 'Alle sieben Wellen'.\n[5459]"},
+                ],
+            },
+            {
+                "user": "Und etwas Fantasy mit Drachen?",
+                "script": [
+                    {"tool_calls": [("find_books_by_keyword", {"keywords": "Fantasy mit Drachen"})]},
+                    {"content": "Für Drachenfans empfehle ich dir gern ein paar Titel.\n[9493]"},
+                ],
+            },
+        ],
+    },
+    {
+        "name": "availability_check",
+        "turns": [{
+            "user": "Habt ihr 'Alle sieben Wellen'?",
+            "script": [
+                {"tool_calls": [("is_book_in_library", {"title": "Alle sieben Wellen"})]},
+                {"content": "Ja, 'Alle sieben Wellen' von Daniel Glattauer ist im Bestand.\n[5459]"},
+            ],
+        }],
+    },
+]
+
+
+# Ersetzt die Tools in function_map vorübergehend durch zeitmessende Hüllen
+@contextlib.contextmanager
+def timed_tools(tool_times):
+    original = dict(chat_engine.function_map)
+
+    def wrap(name, func):
+        @wraps(func)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                tool_times[name].append(time.perf_counter() - start)
+        return timed
+
+    chat_engine.function_map.update({name: wrap(name, func) for name, func in original.items()})
+    try:
+        yield
+    finally:
+        chat_engine.function_map.update(original)
+
+
+# Schaltet den Schnellweg ein oder aus und ersetzt den Verfügbarkeitsdienst vorübergehend durch
+# einen gegen den lokalen Fake-Server, damit der Benchmark nie ins Netz geht
+@contextlib.contextmanager
+def offline_services(router=False):
+    server = FakeAvailabilityServer().start()
+    previous = intent_router.ENABLED, availability._default_service
+    intent_router.ENABLED = router
+    availability._default_service = availability.AvailabilityService(base_url=server.base_url)
+    try:
+        yield
+    finally:
+        intent_router.ENABLED, availability._default_service = previous
+        server.stop()
+
+
+def run_turn(turn, memory, client, stream):
+    start = time.perf_counter()
+    first_token = None
+    if stream:
+        reply = chat_engine.stream_user_message(turn["user"], memory, client=client)
+        for _ in reply:
+            if first_token is None:
+                first_token = time.perf_counter() - start
+    else:
+        chat_engine.handle_user_message(turn["user"], memory, client=client)
+    return time.perf_counter() - start, first_token
+
+
+def run_benchmark(repeats=10, warmup=1, latency=0.0, jitter=0.0, stream=False, conversations=CONVERSATIONS,
+                  router=False):
+    turn_times = defaultdict(list)
+    first_token_times = defaultdict(list)
+    tool_times = defaultdict(list)
+    round_trips = defaultdict(list)
+
+    with offline_services(router), timed_tools(tool_times), contextlib.redirect_stdout(io.StringIO()):
+        for repeat in range(warmup + repeats):
+            measured = repeat >= warmup  # erste Durchläufe laden Daten/Modell und zählen nicht
+            for conversation in conversations:
+                memory = chat_engine.ChatMemory()
+                for i, turn in enumerate(conversation["turns"]):
+                    client = FakeOpenAIClient(turn["script"], latency=latency, jitter=jitter, seed=repeat)
+                    elapsed, first_token = run_turn(turn, memory, client, stream)
+                    if measured:
+                        key = f"{conversation['name']}#{i + 1}"
+                        turn_times[key].append(elapsed)
+                        turn_times["all turns"].append(elapsed)
+                        round_trips[key].append(client.calls)
+                        if first_token is not None:
+                            first_token_times["all turns"].append(first_token)
+            if not measured:
+                tool_times.clear()
+
+    turns = {name: percentiles(values) for name, values in turn_times.items()}
+    for name, calls in round_trips.items():
+        turns[name]["llm_round_trips"] = float(np.mean(calls))
+
+    return {
+        "config": {"repeats": repeats, "warmup": warmup, "latency_s": latency, "jitter_s": jitter, "stream": stream,
+                   "router": router},
+        "turns": turns,
+        "time_to_first_token": {name: percentiles(v) for name, v in first_token_times.items()},
+        "tools": {name: percentiles(v) for name, v in tool_times.items()},
+    }
+
+
+def format_results(results):
+    lines = []
+    for section in ("turns", "time_to_first_token", "tools"):
+        if not results[section]:
+            continue
+        lines.append(f"\n{section}")
+        width = max(len(name) for name in results[section])
+        extra = f"  {'GPT-Runden':>10}" if section == "turns" else ""
+        lines.append(f"  {'':<{width}}  {'n':>4}  {'p50 ms':>9}  {'p95 ms':>9}  {'p99 ms':>9}{extra}")
+        for name, stats in results[section].items():
+            round_trips = f"{stats['llm_round_trips']:>10.1f}" if "llm_round_trips" in stats else ""
+            lines.append(
+                f"  {name:<{width}}  {stats['n']:>4}  {stats['p50_ms']:>9.1f}  {stats['p95_ms']:>9.1f}  {stats['p99_ms']:>9.1f}"
+                f"  {round_trips}".rstrip()
+            )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline-Latenz-Benchmark der Chat-Pipeline mit Fake-LLM.")
+    parser.add_argument("--repeats", type=int, default=10, help="Gemessene Durchläufe pro Unterhaltung")
+    parser.add_argument("--warmup", type=int, default=1, help="Nicht gemessene Aufwärm-Durchläufe")
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulierte LLM-Latenz pro Anfrage (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Zufällige Abweichung der Latenz (± s)")
+    parser.add_argument("--stream", action="store_true", help="stream_user_message statt handle_user_message")
+    parser.add_argument("--router", action="store_true", help="Schnellweg eingeschaltet lassen (einfache Fragen ohne GPT)")
+    parser.add_argument("--json", help="Ergebnisse zusätzlich als JSON in diese Datei schreiben")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.repeats, args.warmup, args.latency, args.jitter, args.stream, router=args.router)
+    print(format_results(results))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
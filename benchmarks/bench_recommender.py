@@ -0,0 +1,279 @@
+# benchmarks/bench_recommender.py
+
+# Micro-Benchmarks der Tool-Funktionen aus recommender.py auf synthetischen Katalogen
+# (siehe synthetic_catalog.py) in mehreren Grössen. Pro Grösse und Funktion:
+# - Latenz (p50/p95/p99) und Durchsatz (Aufrufe pro Sekunde, nacheinander ausgeführt)
+# - Spitzen-Speicher pro Aufruf (tracemalloc, in einem eigenen Durchlauf, weil es bremst)
+# - Ladezeiten (Katalog, vorberechnete Tabellen, Indizes) und Speicher des Prozesses
+# Das Ergebnis geht als JSON in eine Datei; mit --baseline wird gegen einen früheren Lauf verglichen.
+#
+#   python -m benchmarks.bench_recommender --scales 1k 100k --json bench_recommender.json
+#   python -m benchmarks.bench_recommender --scales 1k --baseline bench_recommender.json
+#
+# Anfrage-Embeddings kommen aus einem deterministischen Fake-Encoder statt aus dem
+# SentenceTransformer-Modell: gemessen wird die Suche, nicht das Modell.
+# Speicher: rss_peak_mb ist der Höchststand des ganzen Prozesses; für saubere Werte pro
+# Grösse eine Grösse pro Aufruf messen.
+
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np  # für numerische Operationen (z.B. Matrizen)
+
+import recommender
+import startup
+from benchmarks.stats import percentiles
+from benchmarks.synthetic_catalog import EMBEDDING_DIM, SCALES, generate_catalog
+from catalog import load_catalog
+from co_reads import build_neighbor_table
+from embedding_cache import QueryEmbeddingCache
+from embedding_store import DTYPES, EMBEDDING_DTYPE
+from user_recommendations import build_user_recommendations
+from vector_search import VectorIndex, save_similar_books_table
+
+DATA_ROOT = os.path.join("benchmarks", ".data")
+SIMILAR_TABLE_MAX_BOOKS = 200_000       # darüber wäre die Tabelle ähnlicher Bücher (Bücher × Bücher) zu teuer
+USER_TABLE_MAX_PAIRS = 1_000_000_000     # ebenso die persönlichen Empfehlungen (Nutzer × Bücher)
+MEMORY_CALLS = 20                  # Aufrufe pro Funktion im tracemalloc-Durchlauf
+
+
+# Deterministische "Embeddings" aus dem Text-Hash, gleiche Dimension wie der Katalog
+def fake_encoder(dim):
+    def encode(texts):
+        vectors = []
+        for text in texts:
+            seed = int.from_bytes(hashlib.sha1(text.encode("utf-8")).digest()[:8], "little")
+            vectors.append(np.random.default_rng(seed).standard_normal(dim, dtype=np.float32))
+        return np.stack(vectors)
+    return encode
+
+
+# Lässt die Tool-Funktionen vorübergehend auf `data` statt auf den Daten aus 00_data/ laufen
+@contextlib.contextmanager
+def use_data(data, dim):
+    original = recommender.load_data, recommender.load_query_cache
+    query_cache = QueryEmbeddingCache(fake_encoder(dim), max_size=2048)
+    recommender.load_data = lambda: data
+    recommender.load_query_cache = lambda: query_cache
+    try:
+        yield
+    finally:
+        recommender.load_data, recommender.load_query_cache = original
+
+
+# Eingaben pro Funktion, zufällig aus dem Katalog gezogen: Name → Liste von Argument-Tupeln
+def tool_cases(data, n_calls, rng):
+    books_df = data.books_df
+    rows = rng.integers(len(books_df), size=n_calls)
+    titles = books_df["title"].to_numpy()[rows]
+    isbns = books_df["isbn13"].to_numpy()[rows]
+    last_names = [authors[0].split(",")[0] for authors in books_df["author_list"].to_numpy()[rows]]
+    # Tippfehler (ein Zeichen fehlt) erzwingen die unscharfe Titelsuche
+    typos = [t[:len(t) // 2] + t[len(t) // 2 + 1:] for t in titles]
+    words = books_df["description_clean"].to_numpy()[rows]
+    keywords = [" ".join(w.split()[:4]) + f" {i}" for i, w in enumerate(words)]  # eindeutig → Cache-Fehlzugriffe
+    user_ids = rng.choice(data.catalog.user_ids, size=n_calls)
+
+    return {
+        "get_book_index_by_title": [(t,) for t in titles],
+        "get_book_by_isbn": [(i,) for i in isbns],
+        "is_book_in_library": [(t,) for t in titles],
+        "is_book_in_library (typo)": [(t,) for t in typos],
+        "find_similar_books_by_title": [(t,) for t in titles],
+        "recommend_books_like_title": [(t,) for t in titles],
+        "find_books_by_keyword": [(k,) for k in keywords],
+        "find_books_by_keywords (batch of 8)": [(keywords[i:i + 8],) for i in range(0, n_calls, 8)],
+        "recommend_by_shared_reads": [(str(i),) for i in isbns],
+        "find_books_by_author": [(name,) for name in last_names],
+        "recommend_for_user": [(str(u),) for u in user_ids],
+    }
+
+
+def tool_function(name):
+    return getattr(recommender, name.split(" ")[0])
+
+
+def measure_latency(func, cases, warmup=3):
+    for args in cases[:warmup]:
+        func(*args)
+    times = []
+    for args in cases:
+        start = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - start)
+    stats = percentiles(times)
+    stats["throughput_per_s"] = len(times) / sum(times) if sum(times) else None
+    return stats
+
+
+# Grösster zusätzlicher Speicher, den ein einzelner Aufruf belegt hat
+def measure_peak_memory(func, cases):
+    tracemalloc.start()
+    try:
+        peak_bytes = 0
+        for args in cases[:MEMORY_CALLS]:
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            func(*args)
+            _, peak = tracemalloc.get_traced_memory()
+            peak_bytes = max(peak_bytes, peak - before)
+    finally:
+        tracemalloc.stop()
+    return peak_bytes / 1024
+
+
+def rss_peak_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024**2 if sys.platform == "darwin" else peak / 1024  # macOS: Bytes, Linux: KB
+
+
+def bench_scale(name, n_calls=200, dim=EMBEDDING_DIM, seed=0, tables=True, embedding_dtype=EMBEDDING_DTYPE,
+                data_root=DATA_ROOT):
+    scale = SCALES[name]
+    data_dir = os.path.join(data_root, name)
+    result = dict(scale, dim=dim, embedding_dtype=embedding_dtype)
+
+    start = time.perf_counter()
+    generated = generate_catalog(data_dir, dim=dim, seed=seed, **scale)
+    result["generate_s"] = time.perf_counter() - start if generated else None
+
+    start = time.perf_counter()
+    catalog = load_catalog(data_dir)  # erstes Einlesen der CSV-Dateien (danach aus dem Prozess-Cache)
+    result["load_catalog_s"] = time.perf_counter() - start
+
+    neighbors_path = os.path.join(data_dir, "co_read_neighbors.npz")
+    user_recommendations_path = os.path.join(data_dir, "user_recommendations.npz")
+    similar_prefix = None
+    with contextlib.redirect_stdout(io.StringIO()):
+        if tables:
+            start = time.perf_counter()
+            build_neighbor_table(neighbors_path, data_dir=data_dir)
+            result["build_co_read_table_s"] = time.perf_counter() - start
+            if scale["n_books"] <= SIMILAR_TABLE_MAX_BOOKS:
+                similar_prefix = os.path.join(data_dir, "similar_books")
+                start = time.perf_counter()
+                save_similar_books_table(VectorIndex(catalog.embeddings), catalog.source_hashes, similar_prefix)
+                result["build_similar_books_table_s"] = time.perf_counter() - start
+            if scale["n_books"] * scale["n_users"] <= USER_TABLE_MAX_PAIRS:
+                start = time.perf_counter()
+                build_user_recommendations(user_recommendations_path, data_dir=data_dir)
+                result["build_user_recommendations_s"] = time.perf_counter() - start
+
+        startup.timings.clear()
+        start = time.perf_counter()
+        data = recommender.RecommenderData(
+            data_dir, neighbors_path, similar_prefix, user_recommendations_path,
+            os.path.join(data_dir, "embedding_store"), embedding_dtype,
+        )
+        result["load_indexes_s"] = time.perf_counter() - start
+    result["load_components_s"] = dict(startup.timings)
+    result["n_reads"] = int(data.catalog.read_counts.sum())
+    result["co_read_table"] = data.co_read_neighbors is not None
+    result["similar_books_table"] = data.similar_books is not None
+    result["user_recommendations_table"] = data.user_recommendations is not None
+    result["rss_after_load_mb"] = rss_peak_mb()
+
+    rng = np.random.default_rng(seed)
+    result["tools"] = {}
+    with use_data(data, dim), contextlib.redirect_stdout(io.StringIO()):
+        for tool_name, cases in tool_cases(data, n_calls, rng).items():
+            func = tool_function(tool_name)
+            stats = measure_latency(func, cases)
+            stats["peak_alloc_kb"] = measure_peak_memory(func, cases)
+            result["tools"][tool_name] = stats
+    result["rss_peak_mb"] = rss_peak_mb()
+    return result
+
+
+def environment():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def format_results(results):
+    lines = []
+    for name, scale in results["scales"].items():
+        lines.append(
+            f"\n{name}: {scale['n_books']} Bücher, {scale['n_users']} Nutzer, {scale['n_reads']} Ausleihen"
+            f" — Katalog {scale['load_catalog_s']:.2f} s, Indizes {scale['load_indexes_s']:.2f} s,"
+            f" RSS {scale['rss_peak_mb'] or 0:.0f} MB"
+        )
+        width = max(len(tool) for tool in scale["tools"])
+        lines.append(f"  {'':<{width}}  {'p50 ms':>9}  {'p95 ms':>9}  {'p99 ms':>9}  {'Aufrufe/s':>10}  {'Peak KB':>9}")
+        for tool, stats in scale["tools"].items():
+            lines.append(
+                f"  {tool:<{width}}  {stats['p50_ms']:>9.2f}  {stats['p95_ms']:>9.2f}  {stats['p99_ms']:>9.2f}"
+                f"  {stats['throughput_per_s']:>10.0f}  {stats['peak_alloc_kb']:>9.0f}"
+            )
+    return "\n".join(lines)
+
+
+# Vergleich mit einem früheren Lauf: Faktor der p50-Latenz pro Funktion (> threshold wird markiert)
+def compare(results, baseline, threshold=1.2):
+    lines = [f"\nVergleich mit {baseline['environment'].get('commit')} (p50, neu / alt):"]
+    for name, scale in results["scales"].items():
+        old_scale = baseline["scales"].get(name)
+        if old_scale is None:
+            continue
+        for tool, stats in scale["tools"].items():
+            old = old_scale["tools"].get(tool)
+            if not old or not old.get("p50_ms"):
+                continue
+            ratio = stats["p50_ms"] / old["p50_ms"]
+            flag = "  ⚠️ langsamer" if ratio > threshold else ""
+            lines.append(f"  {name:>5}  {tool:<36}  {ratio:6.2f}×{flag}")
+    if len(lines) == 1:
+        lines.append("  keine gemeinsamen Grössen/Funktionen")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-Benchmarks der Recommender-Funktionen auf synthetischen Katalogen.")
+    parser.add_argument("--scales", nargs="+", choices=list(SCALES), default=["1k"], help="Katalog-Grössen")
+    parser.add_argument("--calls", type=int, default=200, help="Gemessene Aufrufe pro Funktion")
+    parser.add_argument("--dim", type=int, default=EMBEDDING_DIM, help="Dimension der synthetischen Embeddings")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-tables", action="store_true", help="Ohne vorberechnete Tabellen (nur Live-Suche)")
+    parser.add_argument("--embedding-dtype", choices=DTYPES, default=EMBEDDING_DTYPE, help="Typ des Embedding-Speichers")
+    parser.add_argument("--json", help="Ergebnisse als JSON in diese Datei schreiben")
+    parser.add_argument("--baseline", help="JSON eines früheren Laufs zum Vergleich")
+    args = parser.parse_args()
+
+    results = {"environment": environment(), "scales": {}}
+    for name in args.scales:
+        results["scales"][name] = bench_scale(
+            name, args.calls, args.dim, args.seed, tables=not args.no_tables, embedding_dtype=args.embedding_dtype
+        )
+    print(format_results(results))
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            print(compare(results, json.load(f)))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,94 @@
+# benchmarks/fake_availability_server.py
+
+# Lokaler Ersatz für den biblioweb-Statusdienst (POST /medium/status/<medium_id>), damit sich
+# AvailabilityService ohne Netzwerk testen und messen lässt. Antwortet wie das Original mit
+# {"ausleihstatus": {"status": ...}}, auf Wunsch mit Verzögerung oder mit Fehler 503.
+# Zählt die Anfragen pro medium_id und die höchste Zahl gleichzeitig laufender Anfragen.
+#
+#   python -m benchmarks.fake_availability_server --port 8002 --latency 0.2
+#   AvailabilityService(base_url="http://127.0.0.1:8002")
+
+import argparse
+import json
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_STATUS = "Verfügbar"
+STATUS_PATH = re.compile(r"^/medium/status/(\d+)$")
+
+
+class StatusHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        match = STATUS_PATH.match(self.path)
+        if not match:
+            return self._reply(404, {"error": "unbekannter Pfad"})
+        medium_id = int(match.group(1))
+
+        server = self.server
+        with server.lock:
+            server.requests[medium_id] += 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            time.sleep(server.latency)
+            status = server.statuses.get(medium_id, server.status)
+            if status is None:
+                return self._reply(503, {"error": "Dienst nicht verfügbar"})
+            self._reply(200, {"ausleihstatus": {"status": status}})
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def _reply(self, code, data):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # keine Zeile pro Anfrage
+
+
+class FakeAvailabilityServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, status=DEFAULT_STATUS):
+        super().__init__((host, port), StatusHandler)
+        self.latency = latency  # Sekunden pro Anfrage
+        self.status = status    # Antwort für alle medium_ids; None → Fehler 503
+        self.statuses = {}      # abweichende Antworten pro medium_id (None → Fehler 503)
+        self.requests = Counter()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    # Läuft in einem Hintergrund-Thread, bis stop() aufgerufen wird
+    def start(self):
+        threading.Thread(target=self.serve_forever, args=(0.05,), name="fake-availability", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lokaler Fake-Server für die biblioweb-Verfügbarkeit")
+    parser.add_argument("--port", type=int, default=8002)
+    parser.add_argument("--latency", type=float, default=0.2, help="Sekunden pro Anfrage")
+    parser.add_argument("--status", default=DEFAULT_STATUS, help="Status für alle medium_ids")
+    args = parser.parse_args()
+
+    server = FakeAvailabilityServer(port=args.port, latency=args.latency, status=args.status)
+    print(f"📚 Fake-Verfügbarkeit auf {server.base_url} (Latenz {args.latency} s)")
+    server.serve_forever()
@@ -0,0 +1,101 @@
+# benchmarks/fake_llm.py
+
+# Ein Fake-OpenAI-Client ohne Netzwerk: Er spielt vorgegebene Antworten ab (Tool-Aufrufe oder
+# Text), mit einstellbarer Latenz pro Anfrage. Damit lässt sich handle_user_message mit den
+# echten Tools aus function_map durchlaufen, ohne die OpenAI-API zu benutzen.
+#
+# Ein Skript ist eine Liste von Schritten, ein Schritt pro chat.completions.create-Aufruf:
+#   {"tool_calls": [("is_book_in_library", {"title": "Der Schwarm"})]}
+#   {"content": "Antworttext ...\n[12345, 67896]"}
+
+import itertools
+import json
+import random
+import time
+
+from openai.types import CompletionUsage
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+
+class FakeOpenAIClient:
+    def __init__(self, script, latency=0.0, jitter=0.0, chunk_size=8, seed=0):
+        self.script = list(script)
+        self.latency = latency      # Sekunden pro Anfrage (simulierte Netz- und Modellzeit)
+        self.jitter = jitter        # zufällige Abweichung ± jitter Sekunden
+        self.chunk_size = chunk_size  # Zeichen pro Stream-Stück
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._ids = itertools.count(1)
+        self.chat = self  # damit client.chat.completions.create(...) funktioniert
+        self.completions = self
+
+    def create(self, model=None, messages=None, tools=None, tool_choice=None, stream=False, **kwargs):
+        if self.calls >= len(self.script):
+            raise RuntimeError("FakeOpenAIClient: Skript ist zu Ende")
+        step = self.script[self.calls]
+        self.calls += 1
+        time.sleep(max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter)))
+
+        message = {"role": "assistant", "content": step.get("content")}
+        if step.get("tool_calls"):
+            message["tool_calls"] = [
+                {
+                    "id": f"call_{next(self._ids)}",
+                    "type": "function",
+                    "function": {"name": name, "arguments": json.dumps(args)},
+                }
+                for name, args in step["tool_calls"]
+            ]
+        usage = self._usage(messages, message)
+        if stream:
+            include_usage = (kwargs.get("stream_options") or {}).get("include_usage", False)
+            return self._stream(message, usage if include_usage else None)
+        return ChatCompletion.model_validate({
+            "id": f"fake-{self.calls}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model or "fake",
+            "choices": [{
+                "index": 0,
+                "finish_reason": "tool_calls" if message.get("tool_calls") else "stop",
+                "message": message,
+            }],
+            "usage": usage,
+        })
+
+    # Grobe Token-Zählung (ca. 4 Zeichen pro Token), damit Nutzungsdaten vorhanden sind
+    @staticmethod
+    def _usage(messages, message):
+        prompt = sum(len(json.dumps(m, default=str)) for m in messages or []) // 4
+        completion = len(json.dumps(message)) // 4
+        return {"prompt_tokens": prompt, "completion_tokens": completion, "total_tokens": prompt + completion}
+
+    def _chunk(self, delta, finish_reason=None):
+        return ChatCompletionChunk.model_validate({
+            "id": f"fake-{self.calls}",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": "fake",
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        })
+
+    # Liefert die Antwort in Stücken, wie es die echte API mit stream=True tut
+    def _stream(self, message, usage):
+        content = message.get("content") or ""
+        for i in range(0, len(content), self.chunk_size):
+            yield self._chunk({"content": content[i:i + self.chunk_size]})
+        for index, tc in enumerate(message.get("tool_calls") or []):
+            arguments = tc["function"]["arguments"]
+            yield self._chunk({"tool_calls": [{
+                "index": index, "id": tc["id"], "type": "function",
+                "function": {"name": tc["function"]["name"], "arguments": ""},
+            }]})
+            for i in range(0, len(arguments), self.chunk_size):
+                yield self._chunk({"tool_calls": [{
+                    "index": index, "function": {"arguments": arguments[i:i + self.chunk_size]},
+                }]})
+        yield self._chunk({}, "tool_calls" if message.get("tool_calls") else "stop")
+        if usage is not None:
+            # wie die echte API mit stream_options={"include_usage": True}: letztes Stück ohne choices
+            chunk = self._chunk({})
+            yield chunk.model_copy(update={"choices": [], "usage": CompletionUsage.model_validate(usage)})
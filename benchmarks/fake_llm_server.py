@@ -0,0 +1,86 @@
+# benchmarks/fake_llm_server.py
+
+# Ein lokaler Fake-Server mit der Schnittstelle /v1/chat/completions der OpenAI-API.
+# Damit lässt sich api_server.py (oder jeder andere OpenAI-Client) über OPENAI_BASE_URL ohne
+# Netzwerk und ohne Kosten testen, auch mit vielen gleichzeitigen Unterhaltungen.
+#
+# Die Antworten kommen aus denselben Skripten wie im bench_chat: ausgewählt über die letzte
+# User-Nachricht, der Schritt ergibt sich aus der Anzahl Assistant-Nachrichten seither.
+# Der Server hat also keinen Zustand, parallele Unterhaltungen stören sich nicht.
+# Unbekannte Nachrichten bekommen eine kurze Textantwort. Kein Streaming.
+#
+#   python -m benchmarks.fake_llm_server --port 8001 --latency 0.5
+#   OPENAI_BASE_URL=http://127.0.0.1:8001/v1 OPENAI_API_KEY=fake python api_server.py
+
+import argparse
+import asyncio
+import json
+import random
+
+import tornado.web
+
+from benchmarks.fake_llm import FakeOpenAIClient
+
+FALLBACK_REPLY = {"content": "Gern helfe ich dir bei der Suche nach Büchern.\n[]"}
+
+
+# User-Nachricht → Skript, aus den Unterhaltungen von bench_chat
+def scripts_from_conversations(conversations):
+    return {turn["user"]: turn["script"] for conversation in conversations for turn in conversation["turns"]}
+
+
+# Welcher Schritt des Skripts ist dran? Zählt die Assistant-Nachrichten nach der letzten User-Nachricht
+def next_step(messages, scripts):
+    last_user = max((i for i, m in enumerate(messages) if m.get("role") == "user"), default=None)
+    if last_user is None:
+        return FALLBACK_REPLY
+    script = scripts.get(messages[last_user].get("content"))
+    step = sum(1 for m in messages[last_user + 1:] if m.get("role") == "assistant")
+    if not script or step >= len(script):
+        return FALLBACK_REPLY
+    return script[step]
+
+
+class CompletionsHandler(tornado.web.RequestHandler):
+    def initialize(self, scripts, latency, jitter, stats):
+        self.scripts = scripts
+        self.latency = latency
+        self.jitter = jitter
+        self.stats = stats
+
+    async def post(self):
+        request = json.loads(self.request.body)
+        if request.get("stream"):
+            self.set_status(400)
+            return self.finish({"error": {"message": "Streaming wird vom Fake-Server nicht unterstützt"}})
+
+        step = next_step(request.get("messages") or [], self.scripts)
+        self.stats["requests"] += 1
+        await asyncio.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+
+        response = FakeOpenAIClient([step]).create(model=request.get("model"), messages=request.get("messages"))
+        self.set_header("Content-Type", "application/json")
+        self.finish(response.model_dump_json())
+
+
+def make_app(scripts, latency=0.0, jitter=0.0, stats=None):
+    stats = stats if stats is not None else {"requests": 0}
+    options = {"scripts": scripts, "latency": latency, "jitter": jitter, "stats": stats}
+    return tornado.web.Application([(r"/v1/chat/completions", CompletionsHandler, options)])
+
+
+async def serve(port, latency, jitter):
+    from benchmarks.bench_chat import CONVERSATIONS
+
+    make_app(scripts_from_conversations(CONVERSATIONS), latency, jitter).listen(port, address="127.0.0.1")
+    print(f"🤖 Fake-OpenAI auf http://127.0.0.1:{port}/v1 (Latenz {latency} s ± {jitter} s)")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lokaler Fake-Server für /v1/chat/completions")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.5, help="Sekunden pro Anfrage")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Zufällige Abweichung ± Sekunden")
+    args = parser.parse_args()
+    asyncio.run(serve(args.port, args.latency, args.jitter))
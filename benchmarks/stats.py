@@ -0,0 +1,18 @@
+# benchmarks/stats.py
+
+# Gemeinsame Auswertung für die Benchmarks: Perzentile in Millisekunden.
+
+import numpy as np  # für numerische Operationen (z.B. Perzentile)
+
+
+def percentiles(values):
+    if not values:
+        return {"n": 0}
+    values = np.asarray(values) * 1000  # Millisekunden
+    return {
+        "n": int(values.size),
+        "p50_ms": float(np.percentile(values, 50)),
+        "p95_ms": float(np.percentile(values, 95)),
+        "p99_ms": float(np.percentile(values, 99)),
+        "mean_ms": float(values.mean()),
+    }
@@ -0,0 +1,182 @@
+# benchmarks/synthetic_catalog.py
+
+# Erzeugt synthetische Kataloge im Format von 00_data/ (filtered_books.csv,
+# synthetic_user_reads_seengen.csv, book_embeddings.npy), damit sich die Recommender-Funktionen
+# auch bei 100k oder 1M Büchern messen lassen. Alles ist mit `seed` reproduzierbar.
+# - Titel und Autoren aus Wortlisten (mit Kunstwörtern, damit Titel weitgehend eindeutig sind)
+# - Ausleihen mit Zipf-artiger Beliebtheit: wenige Bestseller, viele selten gelesene Bücher
+# - Embeddings um Themen-Zentren gestreut, damit Nachbarschaften eine Struktur haben
+#
+#   python -m benchmarks.synthetic_catalog --scale 100k
+#   python -m benchmarks.synthetic_catalog --books 5000 --users 20000 --out /tmp/katalog
+
+import argparse
+import json
+import os
+
+import numpy as np  # für numerische Operationen (z.B. Matrizen)
+import pandas as pd  # für Datenmanipulation und Tabellen
+
+from catalog import BOOKS_FILE, EMBEDDINGS_FILE, USER_READS_FILE
+
+# Vordefinierte Grössen: Bücher, Nutzer, durchschnittliche Ausleihen pro Nutzer
+SCALES = {
+    "1k": {"n_books": 1_000, "n_users": 5_000, "reads_per_user": 4},
+    "100k": {"n_books": 100_000, "n_users": 250_000, "reads_per_user": 4},
+    "1m": {"n_books": 1_000_000, "n_users": 1_000_000, "reads_per_user": 4},
+}
+EMBEDDING_DIM = 384  # wie paraphrase-multilingual-MiniLM-L12-v2
+PARAMS_FILE = "synthetic.json"
+
+ARTICLES = ["Der", "Die", "Das", "Ein", "Eine", "Im", "Am", "Unter dem", "Hinter der", "Zwischen den"]
+ADJECTIVES = [
+    "rote", "stille", "letzte", "dunkle", "verlorene", "geheime", "kalte", "goldene", "alte", "neue",
+    "wilde", "leise", "ferne", "gläserne", "vergessene", "weisse", "schwarze", "blaue", "kleine", "grosse",
+]
+NOUNS = [
+    "Haus", "Frau", "Winter", "Spur", "Garten", "Insel", "Stadt", "Zeit", "Nacht", "Brief",
+    "Schwester", "Wald", "Fluss", "Sommer", "Erbe", "Lied", "Tal", "Spiegel", "Schatten", "Welle",
+]
+SYLLABLES = [
+    "ber", "lin", "zau", "see", "gen", "mar", "tal", "wen", "dor", "ris", "kel", "an",
+    "ho", "fen", "sta", "lu", "min", "gra", "vo", "tan", "eli", "ros", "bur", "ka",
+]
+FIRST_NAMES = [
+    "Anna", "Daniel", "Lena", "Martin", "Sarah", "Thomas", "Julia", "Peter", "Laura", "Michael",
+    "Nina", "Stefan", "Eva", "Lukas", "Marie", "Jonas", "Claudia", "Felix", "Sophie", "Andreas",
+]
+LAST_NAMES = [
+    "Müller", "Meier", "Schmid", "Keller", "Weber", "Huber", "Schneider", "Meyer", "Steiner", "Fischer",
+    "Gerber", "Brunner", "Baumann", "Frei", "Zimmermann", "Moser", "Widmer", "Wyss", "Graf", "Roth",
+]
+CATEGORIES = ["Roman", "Krimi", "Liebe", "Fantasy", "Sachbuch", "Jugendbuch", "Biografie", "Thriller"]
+DESCRIPTION_WORDS = (
+    "eine geschichte über liebe verlust familie freundschaft geheimnis reise zeit dorf stadt see berge "
+    "winter sommer schuld hoffnung erinnerung brief spur wahrheit mord ermittlung vergangenheit zukunft "
+    "abenteuer drache magie schule krieg frieden heimat fremde mutter vater tochter sohn schwester bruder"
+).split()
+
+
+def _pick(rng, words, n):
+    return np.asarray(words)[rng.integers(len(words), size=n)]
+
+
+def _join(*parts):
+    result = parts[0]
+    for part in parts[1:]:
+        result = np.char.add(result, part)
+    return result
+
+
+# Kunstwörter aus drei Silben, z.B. "Zaumarlin" (macht Titel und Nachnamen praktisch eindeutig)
+def _made_up_words(rng, n):
+    return np.char.capitalize(_join(_pick(rng, SYLLABLES, n), _pick(rng, SYLLABLES, n), _pick(rng, SYLLABLES, n)))
+
+
+def generate_books(n_books, rng):
+    isbns = 9780000000000 + rng.choice(10**9, size=n_books, replace=False)
+    titles = _join(
+        _pick(rng, ARTICLES, n_books), " ", _pick(rng, ADJECTIVES, n_books), " ",
+        _pick(rng, NOUNS, n_books), " von ", _made_up_words(rng, n_books),
+    )
+
+    # Autoren: ein Teil der Nachnamen erfunden, damit Autorensuchen nicht immer tausende Treffer liefern
+    last_names = np.where(rng.random(n_books) < 0.5, _pick(rng, LAST_NAMES, n_books), _made_up_words(rng, n_books))
+    authors = _join(last_names, ", ", _pick(rng, FIRST_NAMES, n_books))
+    second = _join(_pick(rng, LAST_NAMES, n_books), ", ", _pick(rng, FIRST_NAMES, n_books))
+    two_authors = rng.random(n_books) < 0.1
+    author_list = np.where(
+        two_authors, _join("['", authors, "', '", second, "']"), _join("['", authors, "']")
+    )
+
+    vocabulary = np.asarray(DESCRIPTION_WORDS)
+    lengths = rng.integers(40, 140, size=n_books)
+    words = vocabulary[rng.integers(len(vocabulary), size=int(lengths.sum()))]
+    bounds = np.concatenate([[0], np.cumsum(lengths)])
+    descriptions = [" ".join(words[bounds[i]:bounds[i + 1]]) for i in range(n_books)]
+
+    books_df = pd.DataFrame({
+        "isbn13": isbns.astype(float),
+        "medium_id": np.arange(1, n_books + 1),
+        "title": titles,
+        "description": [d.capitalize() + "." for d in descriptions],
+        "published_year": rng.integers(1950, 2025, size=n_books).astype(float),
+        "average_rating": np.round(rng.uniform(1, 5, size=n_books), 1),
+        "num_pages": rng.integers(80, 900, size=n_books).astype(float),
+        "desc_length": [len(d) + 1 for d in descriptions],
+        "bildlink": _join("https://example.invalid/cover/", isbns.astype(str), ".jpg"),
+        "categories": _pick(rng, CATEGORIES, n_books),
+        "author_list": author_list,
+        "description_clean": descriptions,
+    })
+    return books_df
+
+
+# Ausleihlisten im CSV-Format der echten Daten: user_id als float, books als "[isbn.0, isbn.0]"
+def generate_user_reads(isbns, n_users, reads_per_user, rng):
+    popularity = 1.0 / np.arange(1, len(isbns) + 1) ** 0.8
+    popularity = rng.permutation(popularity / popularity.sum())
+
+    counts = 1 + rng.poisson(max(reads_per_user - 1, 0), size=n_users)
+    reads = rng.choice(len(isbns), size=int(counts.sum()), p=popularity)
+    read_strings = np.char.add(np.asarray(isbns)[reads].astype(np.int64).astype(str), ".0")
+    bounds = np.concatenate([[0], np.cumsum(counts)])
+    books = ["[" + ", ".join(read_strings[bounds[i]:bounds[i + 1]]) + "]" for i in range(n_users)]
+    return pd.DataFrame({"user_id": (30000 + np.arange(n_users)).astype(float), "books": books})
+
+
+# Embeddings blockweise direkt in die .npy-Datei schreiben (1M × 384 float32 sind 1.5 GB)
+def write_embeddings(path, n_books, dim, rng, chunk_size=100_000):
+    n_topics = max(8, n_books // 1000)
+    centers = rng.standard_normal((n_topics, dim)).astype(np.float32)
+    out = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(n_books, dim))
+    for start in range(0, n_books, chunk_size):
+        stop = min(start + chunk_size, n_books)
+        topics = rng.integers(n_topics, size=stop - start)
+        noise = rng.standard_normal((stop - start, dim), dtype=np.float32)
+        out[start:stop] = centers[topics] + 0.8 * noise
+    out.flush()
+    del out
+
+
+# Schreibt einen Katalog nach out_dir; ein vorhandener mit denselben Parametern wird wiederverwendet
+def generate_catalog(out_dir, n_books, n_users, reads_per_user=4, dim=EMBEDDING_DIM, seed=0):
+    params = {"n_books": n_books, "n_users": n_users, "reads_per_user": reads_per_user, "dim": dim, "seed": seed}
+    params_path = os.path.join(out_dir, PARAMS_FILE)
+    try:
+        with open(params_path, encoding="utf-8") as f:
+            if json.load(f) == params:
+                return False
+    except (FileNotFoundError, ValueError):
+        pass
+
+    os.makedirs(out_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    books_df = generate_books(n_books, rng)
+    books_df.to_csv(os.path.join(out_dir, BOOKS_FILE), index=False)
+    user_df = generate_user_reads(books_df["isbn13"].to_numpy(), n_users, reads_per_user, rng)
+    user_df.to_csv(os.path.join(out_dir, USER_READS_FILE), index=False)
+    write_embeddings(os.path.join(out_dir, EMBEDDINGS_FILE), n_books, dim, rng)
+
+    # Parameterdatei zuletzt: erst dann gilt der Katalog als vollständig
+    with open(params_path, "w", encoding="utf-8") as f:
+        json.dump(params, f)
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Erzeugt einen synthetischen Katalog im Format von 00_data/.")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="1k", help="Vordefinierte Grösse")
+    parser.add_argument("--books", type=int, help="Anzahl Bücher (überschreibt --scale)")
+    parser.add_argument("--users", type=int, help="Anzahl Nutzer (überschreibt --scale)")
+    parser.add_argument("--dim", type=int, default=EMBEDDING_DIM, help="Dimension der Embeddings")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="Zielordner (Standard: benchmarks/.data/<scale>)")
+    args = parser.parse_args()
+
+    scale = dict(SCALES[args.scale])
+    scale["n_books"] = args.books or scale["n_books"]
+    scale["n_users"] = args.users or scale["n_users"]
+    out_dir = args.out or os.path.join("benchmarks", ".data", args.scale)
+    written = generate_catalog(out_dir, dim=args.dim, seed=args.seed, **scale)
+    print(f"{'✅ Katalog erzeugt' if written else '♻️ Katalog schon vorhanden'}: {out_dir}")
@@ -0,0 +1,191 @@
+# book_index.py
+
+# Nachschlage-Indizes über den Buchkatalog, einmalig beim Laden aufgebaut.
+# Statt bei jeder Anfrage ganze Spalten von books_df klein zu schreiben und zu durchsuchen,
+# arbeiten die Funktionen in recommender.py mit diesen Hash-Maps und invertierten Indizes.
+
+import re
+import unicodedata
+from collections import defaultdict
+
+import numpy as np  # für numerische Operationen (z.B. Matrizen)
+
+# Umlaute werden ausgeschrieben, damit "Mädchen", "Maedchen" und "MÄDCHEN" gleich behandelt werden
+UMLAUTS = str.maketrans({"ä": "ae", "ö": "oe", "ü": "ue", "ß": "ss"})
+
+# Serien-Zusätze am Ende eines Titels, z.B. "(2)", "(Golden Hearts, Band 2)", ", Band 3", " - Teil 1"
+SERIES_SUFFIX = re.compile(
+    r"(?:\s*\((?:[^()]*?,\s*)?(?:band|bd\.?|teil|folge|vol\.?)?\s*\d+\)"
+    r"|[\s,:\-–]+(?:band|bd\.?|teil|folge|vol\.?)\s*\d+)\s*$"
+)
+
+
+MIN_FUZZY_SCORE = 0.8  # Dice-Ähnlichkeit der Trigramme, ab der ein Titel als Vorschlag gilt
+
+
+# Vereinheitlicht einen Text für Vergleiche: klein, Umlaute ausgeschrieben, ohne Akzente und Satzzeichen
+def normalize_text(text):
+    text = unicodedata.normalize("NFC", str(text)).casefold().translate(UMLAUTS)
+    text = "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+    text = re.sub(r"[^\w\s]", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+# Titel ohne Serien-Zusatz, z.B. "Covered Colors (Golden Hearts, Band 2)" → "covered colors"
+def base_title(title):
+    return normalize_text(SERIES_SUFFIX.sub("", str(title).casefold()))
+
+
+# Alle Trigramme eines (normalisierten) Textes; mit Rand-Leerzeichen für die unscharfe Suche
+def trigrams(text, padded=True):
+    if padded:
+        text = f" {text} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TitleIndex:
+    def __init__(self, titles):
+        self.titles = [normalize_text(t) for t in titles]  # normalisierte Titel pro Zeile
+        self.exact = {}   # normalisierter Titel → erste Zeile
+        self.base = {}    # Titel ohne Serien-Zusatz → erste Zeile
+        postings = defaultdict(list)  # Trigramm → Zeilen (aufsteigend)
+
+        for row, (raw, title) in enumerate(zip(titles, self.titles)):
+            self.exact.setdefault(title, row)
+            self.base.setdefault(base_title(raw), row)
+            for gram in trigrams(title):
+                postings[gram].append(row)
+
+        self.postings = {gram: np.asarray(rows, dtype=np.int32) for gram, rows in postings.items()}
+        self.gram_counts = np.fromiter((len(trigrams(t)) for t in self.titles), dtype=np.int32,
+                                       count=len(self.titles))
+
+    # Exakter Treffer (auch ohne Serien-Zusatz); None, wenn es keinen gibt
+    def find_exact(self, title):
+        row = self.exact.get(normalize_text(title))
+        if row is None:
+            row = self.base.get(base_title(title))
+        return row
+
+    # Alle Zeilen, deren Titel den Suchtext enthält (in Tabellenreihenfolge)
+    def find_containing(self, title):
+        query = normalize_text(title)
+        if not query:
+            return []
+        grams = trigrams(query, padded=False)
+        if not grams:
+            # Zu kurz für Trigramme: einfache Suche in den bereits normalisierten Titeln
+            return [row for row, t in enumerate(self.titles) if query in t]
+
+        # Kandidaten = Schnittmenge der Trigramm-Listen, beginnend mit der kürzesten
+        lists = sorted((self.postings.get(g) for g in grams), key=lambda p: 0 if p is None else len(p))
+        if lists[0] is None:
+            return []
+        candidates = lists[0]
+        for rows in lists[1:]:
+            candidates = np.intersect1d(candidates, rows, assume_unique=True)
+            if candidates.size == 0:
+                return []
+        return [int(row) for row in candidates if query in self.titles[row]]
+
+    # Unscharfe Suche über Trigramm-Ähnlichkeit (Dice), z.B. bei Tippfehlern oder fehlenden Umlauten.
+    # Nur für Vorschläge ("Meinten Sie ...?"), nie als sicherer Treffer verwenden
+    def find_similar(self, title, limit=5, min_score=MIN_FUZZY_SCORE):
+        grams = trigrams(normalize_text(title))
+        lists = [self.postings[g] for g in grams if g in self.postings]
+        if not lists:
+            return []
+        shared = np.bincount(np.concatenate(lists), minlength=len(self.titles))
+        candidates = np.flatnonzero(shared)
+        scores = 2.0 * shared[candidates] / (len(grams) + self.gram_counts[candidates])
+        keep = scores >= min_score
+        candidates, scores = candidates[keep], scores[keep]
+        order = np.lexsort((candidates, -scores))[:limit]
+        return [int(row) for row in candidates[order]]
+
+    # Bester einzelner Treffer: exakt → enthält; unscharfe Treffer sind kein Ausgangsbuch
+    def find_one(self, title):
+        row = self.find_exact(title)
+        if row is not None:
+            return row
+        rows = self.find_containing(title)
+        return rows[0] if rows else None
+
+    # Alle passenden Zeilen und die Art des Treffers: "exact", "contains" oder "fuzzy" (nur Vorschläge)
+    def find_all(self, title):
+        rows = self.find_containing(title)
+        if rows:
+            query = normalize_text(title)
+            return rows, "exact" if any(self.titles[row] == query for row in rows) else "contains"
+        rows = self.find_similar(title)
+        return rows, "fuzzy" if rows else None
+
+
+# Zerlegt einen Namen in normalisierte Wort-Tokens, z.B. "Adler-Olsen, Jussi" → ["adler", "olsen", "jussi"]
+def name_tokens(name):
+    return normalize_text(name).split()
+
+
+class AuthorIndex:
+    def __init__(self, author_lists):
+        postings = defaultdict(list)  # Namens-Token → Zeilen (aufsteigend)
+        for row, authors in enumerate(author_lists):
+            tokens = set()
+            for author in authors:
+                tokens.update(name_tokens(author))
+            for token in tokens:
+                postings[token].append(row)
+        self.postings = {token: np.asarray(rows, dtype=np.int32) for token, rows in postings.items()}
+
+    # Zeilen, bei denen ALLE Namensteile als ganze Wörter vorkommen (Reihenfolge egal, Nachname allein genügt)
+    def find(self, author):
+        tokens = set(name_tokens(author))
+        if not tokens:
+            return []
+        lists = sorted((self.postings.get(t) for t in tokens), key=lambda p: 0 if p is None else len(p))
+        if lists[0] is None:
+            return []
+        rows = lists[0]
+        for other in lists[1:]:
+            rows = np.intersect1d(rows, other, assume_unique=True)
+        return [int(row) for row in rows]
+
+
+# Primärschlüssel-Index (z.B. isbn13 oder medium_id) → Zeilenpositionen und fertige Datensätze
+class KeyIndex:
+    def __init__(self, keys, records=None):
+        rows = defaultdict(list)
+        for row, key in enumerate(keys):
+            rows[int(key)].append(row)
+        self._rows = {key: tuple(r) for key, r in rows.items()}
+        self._records = records  # optional: vorbereitete Datensätze (eine dict pro Zeile)
+
+    def __contains__(self, key):
+        return self._key(key) in self._rows
+
+    @staticmethod
+    def _key(key):
+        try:
+            return int(key)
+        except (TypeError, ValueError):
+            return None
+
+    # Alle Zeilen zu einem Schlüssel (leer, wenn unbekannt)
+    def rows(self, key):
+        return self._rows.get(self._key(key), ())
+
+    # Erste Zeile zu einem Schlüssel oder None
+    def first(self, key):
+        rows = self.rows(key)
+        return rows[0] if rows else None
+
+    # Zeilen zu mehreren Schlüsseln in der Reihenfolge der Schlüssel
+    def rows_for(self, keys):
+        return [row for key in keys for row in self.rows(key)]
+
+    # Kopien der vorbereiteten Datensätze zu einem oder mehreren Schlüsseln
+    def records(self, key):
+        return [dict(self._records[row]) for row in self.rows(key)]
+
+    def records_for(self, keys):
+        return [dict(self._records[row]) for row in self.rows_for(keys)]
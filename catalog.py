@@ -0,0 +1,221 @@
+# catalog.py
+
+# Gemeinsamer Lader für alle Datensätze (Bücher, Ausleihen, Embeddings).
+# recommender.py, lit_libby.py und die Offline-Skripte bekommen so dieselben, einheitlich
+# bereinigten Daten. Nach dem ersten Einlesen der CSV-Dateien wird ein binärer Cache
+# (Arrow/Feather für die Buchtabelle, npz für die Ausleihen) in 00_data/.cache/ geschrieben.
+# Der Cache ist an die SHA-1-Hashes der Quelldateien gebunden; ein Warmstart liest dann
+# keine CSV-Datei mehr, sondern nur noch die Binärdateien. Starten mehrere Worker gleichzeitig
+# kalt, liest nur einer die CSV-Dateien und schreibt den Cache, die anderen warten darauf.
+
+import ast  # um Zeichenketten in Listen (z.B. aus CSV) umzuwandeln
+import contextlib
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np  # für numerische Operationen (z.B. Matrizen)
+import pandas as pd  # für Datenmanipulation und Tabellen
+
+DATA_DIR = "./00_data"
+BOOKS_FILE = "filtered_books.csv"
+USER_READS_FILE = "synthetic_user_reads_seengen.csv"
+EMBEDDINGS_FILE = "book_embeddings.npy"
+EMBEDDING_MODEL = "paraphrase-multilingual-MiniLM-L12-v2"  # erzeugt EMBEDDINGS_FILE (siehe reindex.py)
+CACHE_DIR_NAME = ".cache"
+CACHE_VERSION = 1  # erhöhen, wenn sich die Bereinigung ändert
+
+try:
+    import fcntl  # Dateisperre zwischen Prozessen (fehlt unter Windows)
+except ImportError:
+    fcntl = None
+
+
+def file_sha1(path):
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+class Catalog:
+    def __init__(self, books_df, user_ids, read_counts, read_isbns, embeddings, paths, source_hashes):
+        self.books_df = books_df        # Buchtabelle (isbn13 als int, author_list als Liste)
+        self.user_ids = user_ids        # int64, eine Zeile pro Nutzer aus der Ausleih-CSV
+        self.read_counts = read_counts  # int64, Anzahl gültiger Ausleihen pro Nutzer
+        self.read_isbns = read_isbns    # int64, alle gültigen Ausleihen flach hintereinander
+        self.embeddings = embeddings    # float32 (Bücher × Dimension), memory-mapped, zeilengleich mit books_df
+        self.paths = paths              # Quelldateien: {"books": ..., "user_reads": ..., "embeddings": ...}
+        self.source_hashes = source_hashes
+
+    @property
+    def n_users(self):
+        return len(self.user_ids)
+
+    # Zeilenzeiger (CSR-indptr) in read_isbns pro Nutzer
+    @property
+    def read_indptr(self):
+        indptr = np.zeros(len(self.read_counts) + 1, dtype=np.int64)
+        np.cumsum(self.read_counts, out=indptr[1:])
+        return indptr
+
+    # Leselisten als Python-Listen (nur für Stellen, die wirklich Listen brauchen)
+    def user_books(self):
+        indptr = self.read_indptr
+        return [self.read_isbns[indptr[i]:indptr[i + 1]].tolist() for i in range(self.n_users)]
+
+
+# --------------------------
+# Einlesen und Bereinigen der CSV-Dateien
+# --------------------------
+
+def clean_books(path):
+    books_df = pd.read_csv(path)  # enthält Buchdaten (Titel, Autor, Beschreibung usw.)
+    books_df["isbn13"] = books_df["isbn13"].astype(np.int64)  ## WICHTIG
+    books_df["author_list"] = books_df["author_list"].apply(ast.literal_eval)
+    return books_df.reset_index(drop=True)
+
+
+# Liest die Ausleihen ein: "[9783845854281.0, ...]" → flache int64-ISBNs, ohne Bücher ausserhalb des Katalogs
+def clean_user_reads(path, valid_isbns):
+    user_df = pd.read_csv(path)  # simulierte Nutzer-Buchdaten
+    user_ids = user_df["user_id"].astype(float).astype(np.int64).to_numpy()
+
+    # Vektorisiert statt ast.literal_eval + int(float(...)) pro Element
+    items = user_df["books"].astype(str).str.strip("[] ").str.split(",").explode()
+    values = pd.to_numeric(items.str.strip(), errors="coerce")
+    rows = values.index.to_numpy()
+    values = values.to_numpy(dtype=float, na_value=np.nan)
+
+    keep = ~np.isnan(values)
+    rows, isbns = rows[keep], values[keep].astype(np.int64)
+    keep = np.isin(isbns, valid_isbns)
+    rows, isbns = rows[keep], isbns[keep]
+
+    read_counts = np.bincount(rows, minlength=len(user_df)).astype(np.int64)
+    return user_ids, read_counts, isbns
+
+
+# --------------------------
+# Binärer Cache
+# --------------------------
+
+def _cache_paths(cache_dir):
+    return {
+        "meta": os.path.join(cache_dir, "meta.json"),
+        "books": os.path.join(cache_dir, "books.feather"),
+        "reads": os.path.join(cache_dir, "user_reads.npz"),
+        "lock": os.path.join(cache_dir, "cache.lock"),
+    }
+
+
+# Temporäre Datei mit eigenem Namen pro Prozess und Thread, damit sich gleichzeitige Kaltstarts
+# nicht gegenseitig die Datei wegnehmen
+def _tmp_path(path):
+    return f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+
+
+# Nur ein Prozess baut den Cache; die anderen warten und lesen danach dessen Ergebnis.
+# Lässt sich die Sperrdatei nicht anlegen (z.B. schreibgeschütztes Datenverzeichnis), geht es ohne weiter.
+@contextlib.contextmanager
+def _cache_lock(cache_dir):
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        f = open(_cache_paths(cache_dir)["lock"], "a")
+    except OSError as e:
+        print(f"⚠️ Katalog-Cache konnte nicht gesperrt werden: {e}")
+        yield
+        return
+    with f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)  # wird mit dem Schliessen der Datei freigegeben
+        yield
+
+
+def _read_cache(cache_dir, expected):
+    files = _cache_paths(cache_dir)
+    try:
+        with open(files["meta"], encoding="utf-8") as f:
+            if json.load(f) != expected:
+                return None
+        books_df = pd.read_feather(files["books"])
+        books_df["author_list"] = books_df["author_list"].map(list)  # Arrow liefert Arrays statt Listen
+        with np.load(files["reads"]) as reads:
+            return books_df, reads["user_ids"], reads["read_counts"], reads["read_isbns"]
+    except FileNotFoundError:
+        return None  # noch kein Cache vorhanden
+    except (OSError, ValueError, KeyError) as e:
+        print(f"⚠️ Katalog-Cache unbrauchbar, lese CSV neu: {e}")
+        return None
+
+
+# Schreibt den Cache (Aufruf mit _cache_lock)
+def _write_cache(cache_dir, expected, books_df, user_ids, read_counts, read_isbns):
+    files = _cache_paths(cache_dir)
+    tmp = {name: _tmp_path(files[name]) for name in ("books", "reads", "meta")}
+    try:
+        books_df.to_feather(tmp["books"])
+        os.replace(tmp["books"], files["books"])
+        with open(tmp["reads"], "wb") as f:
+            np.savez(f, user_ids=user_ids, read_counts=read_counts, read_isbns=read_isbns)
+        os.replace(tmp["reads"], files["reads"])
+        # Metadatei zuletzt: erst dann gilt der Cache als vollständig
+        with open(tmp["meta"], "w", encoding="utf-8") as f:
+            json.dump(expected, f)
+        os.replace(tmp["meta"], files["meta"])
+    except (OSError, ImportError, ValueError) as e:
+        print(f"⚠️ Katalog-Cache konnte nicht geschrieben werden: {e}")
+        for path in tmp.values():
+            with contextlib.suppress(OSError):
+                os.remove(path)
+
+
+# --------------------------
+# Öffentlicher Einstiegspunkt
+# --------------------------
+
+_catalogs = {}
+_lock = threading.Lock()
+
+
+# Lädt den Katalog einmal pro Prozess (alle Aufrufer teilen sich dasselbe Objekt)
+def load_catalog(data_dir=DATA_DIR, use_cache=True):
+    key = (os.path.abspath(data_dir), use_cache)
+    with _lock:
+        if key not in _catalogs:
+            _catalogs[key] = _load(data_dir, use_cache)
+        return _catalogs[key]
+
+
+def _read_csv(paths):
+    books_df = clean_books(paths["books"])
+    user_ids, read_counts, read_isbns = clean_user_reads(paths["user_reads"], books_df["isbn13"].to_numpy())
+    return books_df, user_ids, read_counts, read_isbns
+
+
+def _load(data_dir, use_cache):
+    paths = {
+        "books": os.path.join(data_dir, BOOKS_FILE),
+        "user_reads": os.path.join(data_dir, USER_READS_FILE),
+        "embeddings": os.path.join(data_dir, EMBEDDINGS_FILE),
+    }
+    source_hashes = {name: file_sha1(path) for name, path in paths.items()}
+    expected = {"version": CACHE_VERSION, **source_hashes}
+    cache_dir = os.path.join(data_dir, CACHE_DIR_NAME)
+
+    cached = _read_cache(cache_dir, expected) if use_cache else None
+    if cached is None and use_cache:
+        with _cache_lock(cache_dir):
+            # Nochmals prüfen: ein anderer Worker hat ihn evtl. geschrieben, während wir gewartet haben
+            cached = _read_cache(cache_dir, expected)
+            if cached is None:
+                cached = _read_csv(paths)
+                _write_cache(cache_dir, expected, *cached)
+    elif cached is None:
+        cached = _read_csv(paths)
+    books_df, user_ids, read_counts, read_isbns = cached
+
+    embeddings = np.load(paths["embeddings"], mmap_mode="r")  # Vektoren für alle Bücher (Seiten erst bei Gebrauch gelesen)
+    return Catalog(books_df, user_ids, read_counts, read_isbns, embeddings, paths, source_hashes)
@@ -4,9 +4,11 @@
 # Es verbindet Nutzereingaben mit GPT-4, führt bei Bedarf Python-Funktionen aus
 # und verwaltet den Dialogverlauf.
 
-from IPython.display import Image, display
+import asyncio
+import itertools
 import json  # Für das Umwandeln von Funktionsargumenten und Ergebnissen
-from openai import OpenAI  # Die OpenAI-Schnittstelle zum Kommunizieren mit GPT-Modellen
+import re
+import time
 from tools import tools  # Liste der verfügbaren „Werkzeuge“, also Funktionen, die GPT aufrufen darf
 from dotenv import load_dotenv
 import streamlit as st
@@ -16,15 +18,35 @@ from recommender import (
     find_books_by_author,
     find_books_by_keyword,
     is_book_in_library,
+    recommend_books_like_title,
+    recommend_for_user,
 )
+from context_budget import compact_history, drop_old_turns, fit_to_budget, history_tokens, message_to_dict  # Token-Budget für den Verlauf
+from tool_executor import ToolExecutor  # führt mehrere Tool-Aufrufe parallel aus
+from startup import record  # misst die Initialisierungszeit pro Komponente
+import tracing  # Spans und Kennzahlen pro Runde (LIBBY_TRACE)
+import intent_router  # lokaler Schnellweg für einfache Nachfragen (ohne GPT)
 
 import os
 
 
 
-# Verbindung zum OpenAI-Client herstellen
+# Verbindung zum OpenAI-Client herstellen – erst beim ersten Gebrauch, nicht schon beim Import
 # load_dotenv()
-client = OpenAI(api_key=st.secrets["openai_api_key"])
+@st.cache_resource
+def get_client():
+    with record("openai client"):
+        from openai import OpenAI  # Die OpenAI-Schnittstelle zum Kommunizieren mit GPT-Modellen
+        return OpenAI(api_key=st.secrets["openai_api_key"])
+
+
+# Asynchroner Client für den HTTP-Server (api_server.py); ohne Streamlit auch über OPENAI_API_KEY.
+# Mit OPENAI_BASE_URL lässt er sich auf einen lokalen Fake-Server umlenken.
+@st.cache_resource
+def get_async_client():
+    with record("openai async client"):
+        from openai import AsyncOpenAI
+        return AsyncOpenAI(api_key=os.environ.get("OPENAI_API_KEY") or st.secrets["openai_api_key"])
 
 # --------------------------------------
 # Gedächtnisobjekt für den Chatverlauf
@@ -35,6 +57,30 @@ class ChatMemory:
         self.last_book_info = None   # Metadaten des zuletzt gefundenen Buchs
         self.last_tool_used = None   # Name des zuletzt genutzten Werkzeugs/Funktion
         self.message_history = []    # Alle Nachrichten der Unterhaltung: User, GPT, Tool-Ergebnisse
+        self.user_id = None          # angemeldeter Nutzer; setzt die Oberfläche bei jeder Anfrage, wird nie gespeichert
+
+    # Geschätzte Tokens des gespeicherten Verlaufs
+    def history_tokens(self):
+        return history_tokens(self.message_history)
+
+    # Einfaches dict (nur JSON-Typen), z.B. für den Session-Speicher (ohne user_id: wer die
+    # Session-ID kennt, soll nicht die Empfehlungen des angemeldeten Nutzers bekommen)
+    def to_dict(self):
+        return {
+            "last_book_title": self.last_book_title,
+            "last_book_info": self.last_book_info,
+            "last_tool_used": self.last_tool_used,
+            "message_history": [message_to_dict(m) for m in self.message_history],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        memory = cls()
+        memory.last_book_title = data.get("last_book_title")
+        memory.last_book_info = data.get("last_book_info")
+        memory.last_tool_used = data.get("last_tool_used")
+        memory.message_history = list(data.get("message_history", []))
+        return memory
 
 # --------------------------------------
 # Zuordnung Funktionsname → Python-Funktion
@@ -45,48 +91,61 @@ function_map = {
     "find_books_by_author": find_books_by_author,
     "find_books_by_keyword": find_books_by_keyword,
     "is_book_in_library": is_book_in_library,
+    "recommend_books_like_title": recommend_books_like_title,
+    "recommend_for_me": recommend_for_user,
 }
 
-# --------------------------------------
-# Hauptfunktion für jede Nutzereingabe
-# --------------------------------------
-def handle_user_message(user_input: str, memory: ChatMemory):
-    """
-    Diese Funktion verarbeitet jede neue Eingabe eines Users.
-    GPT entscheidet, ob es direkt antwortet oder zunächst eine interne Funktion aufruft.
-    Wird eine Funktion aufgerufen, führen wir sie lokal aus und geben das Ergebnis an GPT zurück.
-    GPT kann dann mit dem Ergebnis eine passende Antwort generieren.
+# Tools, denen die Engine die user_id der angemeldeten Session mitgibt; GPT liefert sie nie
+USER_TOOLS = {"recommend_for_me"}
 
-    Dieser Zyklus wiederholt sich, bis GPT eine finale Antwort gibt (ohne weiteren Funktionsaufruf).
-    """
 
-    print("\n🟡 [User Input]")
-    print(user_input)
+# Argumente eines Tool-Aufrufs; bei USER_TOOLS mit der user_id aus der Session (eine von GPT
+# mitgeschickte user_id wird überschrieben)
+def tool_arguments(func_name, arguments, memory: ChatMemory):
+    if func_name not in USER_TOOLS:
+        return arguments
+    try:
+        args = json.loads(arguments) if isinstance(arguments, str) and arguments.strip() else dict(arguments or {})
+    except (ValueError, TypeError):
+        args = {}
+    return {**args, "user_id": memory.user_id}
 
-    # 1. Nachricht des Users zum Verlauf hinzufügen
-    memory.message_history.append({"role": "user", "content": user_input})
+# Gemeinsamer, begrenzter Thread-Pool für die Tool-Aufrufe aller Sessions.
+# Eine Runde belegt höchstens TOOL_THREADS_PER_TURN Threads; der Pool reicht so für etwa
+# TOOL_THREADS / TOOL_THREADS_PER_TURN gleichzeitige Runden, bevor Aufrufe warten müssen.
+# Die Stichwortsuche bekommt mehr Zeit, weil sie beim ersten Aufruf das Modell laden muss.
+TOOL_THREADS = int(os.environ.get("LIBBY_TOOL_THREADS", "32"))
+TOOL_THREADS_PER_TURN = 4
+tool_executor = ToolExecutor(function_map, max_workers=TOOL_THREADS, timeout=20, timeouts={"find_books_by_keyword": 60},
+                             max_per_turn=TOOL_THREADS_PER_TURN)
 
-    while True:
-        # 2. Nachrichtenverlauf für GPT vorbereiten
-        messages = [
-            {
-                "role": "system",
-                "content": """
+# --------------------------------------
+# Systemanweisung für GPT
+# --------------------------------------
+SYSTEM_PROMPT = """
                 You are a helpful virtual librarian assistant for a German library. Always answer the user fluently in German, but use the defined internal function names in English.
                 Kindly remind the user that you can only assist them in your function as a librarian and do not answer unrelated questions.
                 
                 When a user mentions a book by title:
-                1. **Check if the book exists in the library**:
+                1. **If the user wants books like it** ("similar to X", "I liked X"):
+                   - Call 'recommend_books_like_title' with the title — and only this function. It already checks the library,
+                     combines content similarity and other readers' behavior, and returns a ranked list with medium_ids.
+                     Do **not** call 'is_book_in_library', 'find_similar_books_by_title' or 'recommend_by_shared_reads' for this.
+                   - The field 'based_on' tells you whether a book is similar in content ('content'), popular with readers of
+                     the same book ('co_read'), or both. Clearly indicate this in your answer.
+
+                2. **If the user only asks whether a book exists in the library**:
                    - Use 'is_book_in_library' to retrieve one or more matches with ISBN, medium_id, and metadata. 
                    - If multiple versions exist (e.g. series volumes or editions), they will be listed in the 'results' array.
+                   - If the result only contains 'suggestions' (similar spellings), do not claim the book exists; ask whether the user meant one of them.
     
-                2. **Make personalized recommendations**:
-                   - If the user asks for similar books, use 'find_similar_books_by_title' with the title. 
-                   - If the ISBN is already known, you may additionally use 'recommend_by_shared_reads' for user-based suggestions.
-                   - Clearly indicate whether the recommendation is based on similarity or other readers' behavior.
+                3. **Other recommendations**:
+                   - If the user asks for personal recommendations without naming a book or topic ("What should I read next?"), call 'recommend_for_me'.
+                     It takes no arguments. If it only returns an 'info', tell the user kindly and offer to search by title, author or interests instead.
+                   - Use 'find_similar_books_by_title' or 'recommend_by_shared_reads' only if the user explicitly wants just one kind of recommendation.
                    - If no specific book is mentioned but the user describes their interests (e.g., genre, topic, style), use 'find_books_by_keyword' with the full natural language query.
     
-                3. **Format the response clearly and naturally**:
+                4. **Format the response clearly and naturally**:
                    - Always reply in polite, fluent German — as a friendly, personal librarian would.
                    - Reference the user's original query or wording to make the response feel tailored and personal.
                    - Recommend **at least 3 but never more than 5 books in total**, regardless of how many functions you used or how many results were found.
@@ -95,79 +154,357 @@ def handle_user_message(user_input: str, memory: ChatMemory):
                    - Present the titles in natural text (no bullet points or numbered lists), mentioning **title and author(s)**, and optionally add a short note on why the book is a good fit.
                    - The response should feel conversational and human — not like a data dump or list.
     
-                4. **At the end of the message**, output **only** the `medium_ids` of the books you recommend as a plain Python list, like this: `[12345, 67896]`
+                5. **At the end of the message**, output **only** the `medium_ids` of the books you recommend as a plain Python list, like this: `[12345, 67896]`
                    - **Do NOT** add any labels, text, or explanation before or after the list.
                    - Only include the books you mentioned in your reply as a recommendation in this list. The book the user mentioned should not be in the list.
                    - Just output the list by itself on the final line.
             """
-            },
-            *memory.message_history
-        ]
-
-        # 3. Anfrage an GPT senden
-        print("\n📤 [Sending to GPT]")
-        response = client.chat.completions.create(
-            model="gpt-4o",        # GPT-4 mit Funktionsaufruf-Fähigkeit
-            messages=messages,      # Der komplette Verlauf
-            tools=tools,            # Welche Funktionen darf GPT nutzen
-            tool_choice="auto"      # GPT entscheidet selbst, ob/wann es eine Funktion braucht
-        )
-
-        # 4. GPT gibt eine Antwort zurück (entweder Text oder Tool-Call)
-        assistant_msg = response.choices[0].message
-        memory.message_history.append(assistant_msg)
-
-        # 5. Wenn es eine reine Textantwort ist → fertig
-        if not assistant_msg.tool_calls:
-            print("\n✅ [GPT returned final text answer]")
-            print("Answer:", assistant_msg.content)
-            return assistant_msg.content
-
-        # 6. GPT möchte eine oder mehrere Funktionen aufrufen
-        tool_calls = assistant_msg.tool_calls
-        print(f"\n🔧 [GPT made {len(tool_calls)} function call(s)]")
-
-        new_messages = []
-
-        # 7. Alle gewünschten Funktionen nacheinander ausführen
-        for tc in tool_calls:
-            call_id = tc.id
-            func_name = tc.function.name
-            func_args = json.loads(tc.function.arguments)  # JSON → Python-Daten
-
-            print(f"   ↳ Calling {func_name} with {func_args}")
-
-            # 8. Funktion lokal aufrufen
-            py_func = function_map.get(func_name)
-            if not py_func:
-                result_data = {"error": f"Unknown function: {func_name}"}
-            else:
-                try:
-                    result_data = py_func(**func_args)
-
-                    print('Tool response:')
-                    print(result_data)
-
-                    # Speichere ggf. Infos über das zuletzt angefragte Buch
-                    if func_name == "is_book_in_library" and result_data.get("exists"):
-                        # Wenn mehrere Bücher, nimm das erste als Referenz
-                        first_book = result_data["results"][0]
-                        memory.last_book_title = first_book["title"]
-                        memory.last_book_info = first_book
-                except Exception as e:
-                    result_data = {"error": f'Error: {str(e)}'}
-
-            # 9. Rückgabe der Funktion für GPT aufbereiten
-            tool_msg = {
-                "role": "tool",
-                "tool_call_id": call_id,
-                "name": func_name,
-                "content": json.dumps(result_data, default=str)
-            }
-
-            new_messages.append(tool_msg)
-
-        # 10. Alle Tool-Antworten dem Chatverlauf hinzufügen
-        memory.message_history.extend(new_messages)
-
-        # GPT wird in der nächsten Runde eine endgültige Antwort geben oder weitere Tools aufrufen
+
+
+# Maximale (geschätzte) Tokens des Verlaufs, der pro Anfrage mitgeschickt wird
+CONTEXT_TOKEN_BUDGET = 6000
+
+
+# Nachrichtenverlauf für GPT: Systemanweisung + bisheriger Verlauf (im Token-Budget)
+def build_messages(memory: ChatMemory):
+    history = fit_to_budget(memory.message_history, CONTEXT_TOKEN_BUDGET)
+    return [
+        {
+            "role": "system",
+            "content": SYSTEM_PROMPT
+        },
+        *history
+    ]
+
+
+# Neue User-Nachricht speichern; Tool-Ergebnisse älterer Runden werden dabei verdichtet,
+# sehr alte Runden fallen ganz weg (der Verlauf wächst nicht unbegrenzt)
+def add_user_message(user_input: str, memory: ChatMemory):
+    memory.message_history.append({"role": "user", "content": user_input})
+    compact_history(memory.message_history)
+    drop_old_turns(memory.message_history)
+
+
+# Baut aus den Ergebnissen der Tool-Aufrufe die Tool-Nachrichten für GPT.
+# calls: Liste von (tool_call_id, Funktionsname, Argumente), results in derselben Reihenfolge
+def build_tool_messages(calls, results, memory: ChatMemory):
+    new_messages = []
+    for (call_id, func_name, _), result_data in zip(calls, results):
+        # Speichere ggf. Infos über das zuletzt angefragte Buch
+        if func_name == "is_book_in_library" and isinstance(result_data, dict) and result_data.get("exists"):
+            # Wenn mehrere Bücher, nimm das erste als Referenz
+            first_book = result_data["results"][0]
+            memory.last_book_title = first_book["title"]
+            memory.last_book_info = first_book
+        elif func_name == "recommend_books_like_title" and isinstance(result_data, dict) and result_data.get("found"):
+            memory.last_book_title = result_data["book"]["title"]
+            memory.last_book_info = result_data["book"]
+        memory.last_tool_used = func_name
+
+        # Rückgabe der Funktion für GPT aufbereiten
+        new_messages.append({
+            "role": "tool",
+            "tool_call_id": call_id,
+            "name": func_name,
+            "content": json.dumps(result_data, default=str)
+        })
+    return new_messages
+
+_local_call_ids = itertools.count(1)
+
+
+# Einfache Nachfragen (Bestand, Autor) direkt beantworten, ohne GPT (siehe intent_router.py).
+# Der Verlauf bekommt dieselben Nachrichten wie bei einem Tool-Aufruf durch GPT, damit spätere
+# Rückfragen ("Und wovon handelt es?") den Zusammenhang kennen. None: GPT übernimmt.
+def answer_locally(user_input: str, memory: ChatMemory, turn):
+    if not intent_router.ENABLED:
+        return None
+    with tracing.span("router") as span:
+        answer = intent_router.router.route(user_input)
+        span.set(intent=answer.intent if answer else None)
+    if answer is None:
+        return None
+
+    add_user_message(user_input, memory)
+    call = (f"local_{next(_local_call_ids)}", answer.tool, json.dumps(answer.arguments, ensure_ascii=False))
+    memory.message_history.append({
+        "role": "assistant",
+        "content": None,
+        "tool_calls": [{"id": call[0], "type": "function", "function": {"name": call[1], "arguments": call[2]}}],
+    })
+    memory.message_history.extend(build_tool_messages([call], [answer.result], memory))
+    memory.message_history.append({"role": "assistant", "content": answer.text})
+    turn.set(llm_round_trips=0, routed=answer.intent)
+    return answer.text
+
+
+# Hängt Kennzahlen einer GPT-Anfrage an ihren Span: Grösse des Verlaufs und Token-Verbrauch laut API
+def _trace_request(span, messages):
+    if span.recording:
+        span.set(messages=len(messages), context_tokens=history_tokens(messages))
+
+
+def _trace_usage(span, usage):
+    if usage is None or not span.recording:
+        return
+    span.set(prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens)
+    tracing.add("llm_tokens_total", usage.prompt_tokens, kind="prompt")
+    tracing.add("llm_tokens_total", usage.completion_tokens, kind="completion")
+
+# --------------------------------------
+# Hauptfunktion für jede Nutzereingabe
+# --------------------------------------
+def handle_user_message(user_input: str, memory: ChatMemory, client=None):
+    """
+    Diese Funktion verarbeitet jede neue Eingabe eines Users.
+    GPT entscheidet, ob es direkt antwortet oder zunächst eine interne Funktion aufruft.
+    Wird eine Funktion aufgerufen, führen wir sie lokal aus und geben das Ergebnis an GPT zurück.
+    GPT kann dann mit dem Ergebnis eine passende Antwort generieren.
+
+    Dieser Zyklus wiederholt sich, bis GPT eine finale Antwort gibt (ohne weiteren Funktionsaufruf).
+
+    Mit `client` kann ein anderer OpenAI-kompatibler Client übergeben werden (z.B. ein Fake für Benchmarks);
+    ohne Angabe wird der gemeinsame Client aus get_client() verwendet.
+    """
+    with tracing.span("turn", chars=len(user_input)) as turn:
+        # 0. Einfache Nachfragen beantwortet der lokale Schnellweg ohne GPT
+        text = answer_locally(user_input, memory, turn)
+        if text is not None:
+            return text
+        client = client or get_client()
+
+        # 1. Nachricht des Users zum Verlauf hinzufügen
+        add_user_message(user_input, memory)
+        slots = tool_executor.turn_slots()  # Threads, die diese Runde im Tool-Pool belegen darf
+
+        for round_no in itertools.count(1):
+            # 2. Nachrichtenverlauf für GPT vorbereiten
+            messages = build_messages(memory)
+
+            # 3. Anfrage an GPT senden
+            with tracing.span("llm", "gpt-4o", round=round_no) as span:
+                _trace_request(span, messages)
+                response = client.chat.completions.create(
+                    model="gpt-4o",        # GPT-4 mit Funktionsaufruf-Fähigkeit
+                    messages=messages,      # Der komplette Verlauf
+                    tools=tools,            # Welche Funktionen darf GPT nutzen
+                    tool_choice="auto"      # GPT entscheidet selbst, ob/wann es eine Funktion braucht
+                )
+                _trace_usage(span, response.usage)
+
+            # 4. GPT gibt eine Antwort zurück (entweder Text oder Tool-Call)
+            assistant_msg = response.choices[0].message
+            memory.message_history.append(message_to_dict(assistant_msg))
+
+            # 5. Wenn es eine reine Textantwort ist → fertig
+            if not assistant_msg.tool_calls:
+                turn.set(llm_round_trips=round_no)
+                return assistant_msg.content
+
+            # 6./7. GPT möchte eine oder mehrere Funktionen aufrufen: alle gleichzeitig ausführen
+            # (Ergebnisse in Originalreihenfolge)
+            calls = [(tc.id, tc.function.name, tc.function.arguments) for tc in assistant_msg.tool_calls]
+            results = tool_executor.run(
+                [(name, tool_arguments(name, arguments, memory)) for _, name, arguments in calls], slots
+            )
+
+            # 8./9. Ergebnisse für GPT aufbereiten
+            new_messages = build_tool_messages(calls, results, memory)
+
+            # 10. Alle Tool-Antworten dem Chatverlauf hinzufügen
+            memory.message_history.extend(new_messages)
+
+            # GPT wird in der nächsten Runde eine endgültige Antwort geben oder weitere Tools aufrufen
+
+
+# --------------------------------------
+# Asynchrone Variante für den HTTP-Server
+# --------------------------------------
+async def handle_user_message_async(user_input: str, memory: ChatMemory, client=None):
+    """
+    Wie handle_user_message, aber als Coroutine auf dem asynchronen OpenAI-Client:
+    Während GPT rechnet, blockiert kein Thread, ein Prozess kann so viele Unterhaltungen
+    gleichzeitig führen. Die Tools laufen weiterhin auf dem Thread-Pool von tool_executor.
+    """
+    with tracing.span("turn", chars=len(user_input), mode="async") as turn:
+        # Der Schnellweg fragt evtl. die Verfügbarkeit ab (blockierend), deshalb in einem Thread
+        text = await asyncio.to_thread(answer_locally, user_input, memory, turn)
+        if text is not None:
+            return text
+        client = client or get_async_client()
+        add_user_message(user_input, memory)
+        slots = tool_executor.turn_slots()
+
+        for round_no in itertools.count(1):
+            messages = build_messages(memory)
+
+            with tracing.span("llm", "gpt-4o", round=round_no) as span:
+                _trace_request(span, messages)
+                response = await client.chat.completions.create(
+                    model="gpt-4o",
+                    messages=messages,
+                    tools=tools,
+                    tool_choice="auto"
+                )
+                _trace_usage(span, response.usage)
+
+            assistant_msg = response.choices[0].message
+            memory.message_history.append(message_to_dict(assistant_msg))
+            if not assistant_msg.tool_calls:
+                turn.set(llm_round_trips=round_no)
+                return assistant_msg.content
+
+            calls = [(tc.id, tc.function.name, tc.function.arguments) for tc in assistant_msg.tool_calls]
+            results = await tool_executor.run_async(
+                [(name, tool_arguments(name, arguments, memory)) for _, name, arguments in calls], slots
+            )
+            memory.message_history.extend(build_tool_messages(calls, results, memory))
+
+
+# --------------------------------------
+# Streaming-Variante für die Streamlit-Oberfläche
+# --------------------------------------
+
+# Letzte Zeile einer Antwort, die nur aus der medium_id-Liste besteht, z.B. "[12345, 67896]"
+ID_LINE = re.compile(r"`*\s*\[[\d,\s]*\]\s*`*")
+
+
+# Angefangene Zeile, aus der noch eine medium_id-Liste werden kann, z.B. "`[12345, 6"
+ID_LINE_PREFIX = re.compile(r"\s*`*\s*(?:\[[\d,\s]*(?:\]\s*`*)?)?")
+
+
+# Kann der Text ab hier noch das Ende der Antwort sein? Ganze Zeilen nur aus medium_id-Listen,
+# Leerraum oder Backticks, die letzte (angefangene) Zeile der Anfang einer solchen Liste.
+def _could_be_id_tail(text):
+    *lines, last = text.split("\n")
+    return (
+        all(ID_LINE.fullmatch(line.strip()) or not line.strip("` \t\r") for line in lines)
+        and ID_LINE_PREFIX.fullmatch(last) is not None
+    )
+
+
+# Lässt Text-Stücke direkt durch, hält aber ab dem frühesten Zeilenanfang zurück, ab dem der Rest
+# noch die abschliessende medium_id-Liste (samt folgendem Leerraum) sein kann. Erst am Ende des
+# Streams wird entschieden: enthält der zurückgehaltene Rest die Liste, wird er nicht angezeigt
+# (die Oberfläche zeigt stattdessen die Buchkarten), sonst wird er nachgeliefert.
+def _hide_id_line(chunks):
+    held = ""             # zurückgehaltenes Ende, beginnt immer an einem Zeilenanfang
+    at_line_start = True  # endete der zuletzt ausgegebene Text mit einem Zeilenumbruch?
+    for chunk in chunks:
+        held += chunk
+        starts = ([0] if at_line_start else []) + [i + 1 for i, c in enumerate(held) if c == "\n"]
+        split = next((i for i in starts if _could_be_id_tail(held[i:])), len(held))
+        if split:
+            at_line_start = held[split - 1] == "\n"
+            yield held[:split]
+            held = held[split:]
+    if held and not any(ID_LINE.fullmatch(line.strip()) for line in held.split("\n")):
+        yield held
+
+
+class StreamedReply:
+    """
+    Streaming-Variante von handle_user_message.
+    Beim Iterieren werden die Text-Stücke der finalen Antwort geliefert, sobald GPT sie erzeugt
+    (z.B. für st.write_stream). Tool-Aufrufe werden schon während des Streamings gestartet,
+    sobald ihre Argumente vollständig sind. Nach dem Durchlauf enthält `text` die komplette
+    Antwort inklusive der medium_id-Liste auf der letzten Zeile.
+    """
+
+    def __init__(self, user_input: str, memory: ChatMemory, client=None):
+        self.user_input = user_input
+        self.memory = memory
+        self.client = client
+        self.text = None
+
+    def __iter__(self):
+        return _hide_id_line(self._stream())
+
+    def _stream(self):
+        memory = self.memory
+        with tracing.span("turn", chars=len(self.user_input), stream=True) as turn:
+            text = answer_locally(self.user_input, memory, turn)
+            if text is not None:
+                self.text = text
+                yield text
+                return
+            client = self.client or get_client()
+            add_user_message(self.user_input, memory)
+            slots = tool_executor.turn_slots()
+            started = time.perf_counter()
+            first_token = None
+
+            for round_no in itertools.count(1):
+                messages = build_messages(memory)
+                content_parts = []
+                calls = []      # [tool_call_id, Funktionsname, Argumente] in Reihenfolge der Indizes
+                submitted = []  # gestartete Aufrufe für tool_executor.collect
+
+                with tracing.span("llm", "gpt-4o", round=round_no, stream=True) as span:
+                    _trace_request(span, messages)
+                    stream = client.chat.completions.create(
+                        model="gpt-4o",
+                        messages=messages,
+                        tools=tools,
+                        tool_choice="auto",
+                        stream=True,
+                        stream_options={"include_usage": True},  # Token-Verbrauch im letzten Stück
+                    )
+
+                    for chunk in stream:
+                        if not chunk.choices:
+                            _trace_usage(span, chunk.usage)
+                            continue
+                        delta = chunk.choices[0].delta
+
+                        # Text der finalen Antwort sofort weitergeben
+                        if delta.content:
+                            if first_token is None:
+                                first_token = time.perf_counter() - started
+                            content_parts.append(delta.content)
+                            yield delta.content
+
+                        # Tool-Call-Deltas zusammensetzen: ein neuer Index heisst, der vorherige ist vollständig
+                        for tc in delta.tool_calls or []:
+                            if tc.index >= len(calls):
+                                for call in calls[len(submitted):]:
+                                    self._start(call, submitted, slots, memory)
+                                calls.extend(["", "", ""] for _ in range(tc.index + 1 - len(calls)))
+                            if tc.id:
+                                calls[tc.index][0] = tc.id
+                            if tc.function and tc.function.name:
+                                calls[tc.index][1] += tc.function.name
+                            if tc.function and tc.function.arguments:
+                                calls[tc.index][2] += tc.function.arguments
+
+                content = "".join(content_parts)
+                if not calls:
+                    memory.message_history.append({"role": "assistant", "content": content})
+                    self.text = content
+                    turn.set(llm_round_trips=round_no)
+                    if first_token is not None:
+                        turn.set(first_token_ms=round(first_token * 1000, 1))
+                    return
+
+                # Letzten (bzw. noch nicht gestarteten) Aufruf starten und auf alle Ergebnisse warten
+                for call in calls[len(submitted):]:
+                    self._start(call, submitted, slots, memory)
+                results = tool_executor.collect(submitted)
+
+                memory.message_history.append({
+                    "role": "assistant",
+                    "content": content or None,
+                    "tool_calls": [
+                        {"id": call_id, "type": "function", "function": {"name": name, "arguments": arguments}}
+                        for call_id, name, arguments in calls
+                    ],
+                })
+                memory.message_history.extend(build_tool_messages(calls, results, memory))
+
+    @staticmethod
+    def _start(call, submitted, slots, memory):
+        submitted.append(tool_executor.submit(call[1], tool_arguments(call[1], call[2], memory), slots))
+
+
+def stream_user_message(user_input: str, memory: ChatMemory, client=None):
+    return StreamedReply(user_input, memory, client)
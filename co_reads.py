@@ -0,0 +1,276 @@
+# co_reads.py
+
+# Dieses Modul baut einmalig beim Laden einen kompakten Index über alle Ausleihen:
+# - user_reads:   CSR-Matrix (Nutzer × Buch), jede Zeile enthält die gelesenen Bücher als int32-Positionen
+# - book_readers: invertierter Index (Buch × Nutzer), d.h. wer hat welches Buch gelesen
+# Damit werden Co-Reads nicht mehr pro Anfrage über alle Nutzer gesucht und gezählt,
+# sondern mit wenigen vektorisierten Operationen aus den Sparse-Matrizen berechnet.
+
+from itertools import chain
+
+import numpy as np  # für numerische Operationen (z.B. Matrizen)
+from scipy import sparse  # für dünn besetzte Matrizen (CSR/CSC)
+
+from catalog import DATA_DIR, load_catalog  # gemeinsamer, gecachter Datenlader
+
+
+# Wählt die k größten Werte aus, bei Gleichstand gewinnt die kleinere Buchposition.
+# argpartition bestimmt nur den Schwellenwert, sortiert werden danach nur die wenigen Kandidaten.
+def top_k(cols, vals, k):
+    if cols.size > k:
+        kth = -np.partition(-vals, k - 1)[k - 1]
+        keep = vals >= kth
+        cols, vals = cols[keep], vals[keep]
+    order = np.lexsort((cols, -vals))[:k]
+    return cols[order], vals[order]
+
+
+class CoReadIndex:
+    def __init__(self, isbns, user_reads):
+        self.isbns = np.asarray(isbns, dtype=np.int64)  # Position → ISBN (gleiche Reihenfolge wie books_df)
+        self.isbn_to_pos = {}
+        for pos, isbn in enumerate(self.isbns.tolist()):
+            self.isbn_to_pos.setdefault(isbn, pos)  # bei doppelten ISBNs zählt die erste Zeile
+        self.user_reads = user_reads  # CSR: Nutzer × Buch
+        self.book_readers = user_reads.T.tocsr()  # CSR: Buch × Nutzer (invertierter Index)
+
+    # Baut den Index aus den ISBNs von books_df und den Leselisten als Python-Listen
+    @classmethod
+    def from_user_reads(cls, isbns, user_books):
+        user_books = list(user_books)
+        lengths = np.fromiter((len(books) for books in user_books), dtype=np.int64, count=len(user_books))
+        flat = np.fromiter(chain.from_iterable(user_books), dtype=np.int64, count=int(lengths.sum()))
+        return cls.from_flat(isbns, flat, lengths)
+
+    # Baut den Index aus allen Ausleihen flach hintereinander (flat) plus Anzahl pro Nutzer (lengths)
+    @classmethod
+    def from_flat(cls, isbns, flat, lengths):
+        isbns = np.asarray(isbns, dtype=np.int64)
+        flat = np.asarray(flat, dtype=np.int64)
+        lengths = np.asarray(lengths, dtype=np.int64)
+        n_users = len(lengths)
+
+        # ISBN → Position in books_df per Binärsuche (vektorisiert statt dict-Lookup pro Element)
+        order = np.argsort(isbns, kind="stable")
+        sorted_isbns = isbns[order]
+        found = np.searchsorted(sorted_isbns, flat)
+        found = np.clip(found, 0, max(len(sorted_isbns) - 1, 0))
+        valid = sorted_isbns[found] == flat if len(sorted_isbns) else np.zeros(len(flat), dtype=bool)
+        positions = order[found[valid]].astype(np.int32)
+
+        # Unbekannte ISBNs fallen weg, die Zeilenzeiger werden entsprechend angepasst
+        row_ids = np.repeat(np.arange(n_users), lengths)[valid]
+        indptr = np.zeros(n_users + 1, dtype=np.int64)
+        np.cumsum(np.bincount(row_ids, minlength=n_users), out=indptr[1:])
+
+        user_reads = sparse.csr_matrix(
+            (np.ones(len(positions), dtype=np.int32), positions, indptr),
+            shape=(n_users, len(isbns)),
+        )
+        user_reads.sum_duplicates()  # doppelt gelesene Bücher zählen wie bisher mehrfach
+        return cls(isbns, user_reads)
+
+    @property
+    def n_users(self):
+        return self.user_reads.shape[0]
+
+    # Gibt die Positionen aller Nutzer zurück, die das Buch an Position `pos` gelesen haben
+    def readers_of(self, pos):
+        start, end = self.book_readers.indptr[pos], self.book_readers.indptr[pos + 1]
+        return self.book_readers.indices[start:end]
+
+    # Zählt für alle Bücher, wie oft sie zusammen mit dem Buch an Position `pos` gelesen wurden
+    def co_read_counts(self, pos):
+        readers = self.readers_of(pos)
+        if readers.size == 0:
+            return np.zeros(len(self.isbns), dtype=np.int64)
+        counts = np.asarray(self.user_reads[readers].sum(axis=0), dtype=np.int64).ravel()
+        counts[pos] = 0  # das Buch selbst nicht mitzählen
+        return counts
+
+    # Liefert die top_n meistgemeinsam gelesenen Bücher als Liste von (ISBN, Anzahl)
+    def most_common(self, isbn, top_n=5):
+        pos = self.isbn_to_pos.get(int(isbn))
+        if pos is None:
+            return []
+
+        counts = self.co_read_counts(pos)
+        candidates = np.flatnonzero(counts)
+        if candidates.size == 0:
+            return []
+
+        # Nur die besten top_n Kandidaten sortieren statt alle Zählungen
+        cols, vals = top_k(candidates, counts[candidates], top_n)
+        return [(int(self.isbns[i]), int(c)) for i, c in zip(cols, vals)]
+
+
+# --------------------------
+# Vorberechnete Nachbarschaftstabelle (Top-K Co-Reads pro Buch)
+# --------------------------
+
+# Offline-Build:   python co_reads.py           (inkrementell, falls möglich)
+#                  python co_reads.py --full    (kompletter Neuaufbau)
+# Die Tabelle wird als kompakte .npz-Datei in 00_data/ abgelegt. Zusätzlich wird die
+# Ko-Okkurrenz-Matrix gespeichert, damit neu angehängte Ausleihen nur addiert werden müssen.
+
+NEIGHBORS_PATH = "./00_data/co_read_neighbors.npz"
+DEFAULT_K = 20
+
+
+# Ko-Okkurrenz (Buch × Buch): Eintrag [a, b] = wie oft b von Lesern von a gelesen wurde
+def co_occurrence(user_reads):
+    readers = user_reads.copy()
+    readers.data = np.ones_like(readers.data)  # jeder Leser zählt einmal pro Ausgangsbuch
+    cooc = (readers.T @ user_reads).tocsr()
+    cooc.setdiag(0)  # ein Buch ist nicht sein eigener Co-Read
+    cooc.eliminate_zeros()
+    return cooc
+
+
+# Berechnet für die angegebenen Zeilen der Ko-Okkurrenz-Matrix die Top-K Nachbarn
+def top_k_rows(cooc, rows, k, neighbors, counts):
+    for row in rows:
+        start, end = cooc.indptr[row], cooc.indptr[row + 1]
+        cols, vals = cooc.indices[start:end], cooc.data[start:end]
+        neighbors[row] = -1
+        counts[row] = 0
+        if cols.size == 0:
+            continue
+        cols, vals = top_k(cols, vals, k)
+        neighbors[row, :len(cols)] = cols
+        counts[row, :len(cols)] = vals
+
+
+class CoReadNeighbors:
+    def __init__(self, isbns, neighbors, counts):
+        self.isbns = np.asarray(isbns, dtype=np.int64)
+        self.isbn_to_pos = {}
+        for pos, isbn in enumerate(self.isbns.tolist()):
+            self.isbn_to_pos.setdefault(isbn, pos)
+        self.neighbors = neighbors  # int32, (Bücher × K), -1 = kein Nachbar
+        self.counts = counts        # int32, (Bücher × K)
+
+    @property
+    def k(self):
+        return self.neighbors.shape[1]
+
+    # Ein einziger Tabellen-Lookup; None, wenn mehr Nachbarn verlangt werden als gespeichert sind
+    def most_common(self, isbn, top_n=5):
+        if top_n > self.k:
+            return None
+        pos = self.isbn_to_pos.get(int(isbn))
+        if pos is None:
+            return []
+        return [
+            (int(self.isbns[n]), int(c))
+            for n, c in zip(self.neighbors[pos, :top_n], self.counts[pos, :top_n])
+            if n >= 0
+        ]
+
+
+# Lädt die Tabelle; None, wenn sie fehlt oder nicht zu den aktuellen Daten passt.
+# user_reads_sha1: SHA-1 der Ausleih-CSV (catalog.source_hashes["user_reads"]); so fallen auch
+# geänderte Zeilen auf, nicht nur eine andere Zeilenzahl
+def load_neighbor_table(path, isbns, n_user_rows, user_reads_sha1):
+    try:
+        with np.load(path) as data:
+            if (
+                int(data["n_user_rows"]) != n_user_rows
+                or str(data["source_sha1"]) != user_reads_sha1
+                or not np.array_equal(data["isbns"], np.asarray(isbns))
+            ):
+                print(f"⚠️ Co-Read-Tabelle {path} ist veraltet – bitte 'python co_reads.py' ausführen.")
+                return None
+            return CoReadNeighbors(data["isbns"], data["neighbors"], data["counts"])
+    except FileNotFoundError:
+        return None
+
+
+def _file_sha1(path, n_bytes):
+    import hashlib
+
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as f:
+        remaining = n_bytes
+        while remaining > 0:
+            chunk = f.read(min(remaining, 1 << 20))
+            if not chunk:
+                break
+            sha1.update(chunk)
+            remaining -= len(chunk)
+    return sha1.hexdigest()
+
+
+# Baut die Tabelle neu auf oder ergänzt sie um neu angehängte Ausleihzeilen
+def build_neighbor_table(path=NEIGHBORS_PATH, data_dir=DATA_DIR, k=DEFAULT_K, full=False):
+    import os
+
+    catalog = load_catalog(data_dir)
+    isbns = catalog.books_df["isbn13"].to_numpy()
+    n_users = catalog.n_users
+    user_reads_path = catalog.paths["user_reads"]
+    source_bytes = os.path.getsize(user_reads_path)
+
+    previous = None
+    if not full and os.path.exists(path):
+        with np.load(path) as data:
+            previous = {name: data[name] for name in data.files}
+
+    # Inkrementell nur, wenn Katalog und K gleich sind und die bisherigen Zeilen unverändert geblieben sind
+    incremental = (
+        previous is not None
+        and np.array_equal(previous["isbns"], isbns)
+        and previous["neighbors"].shape[1] == k
+        and int(previous["n_user_rows"]) <= n_users
+        and _file_sha1(user_reads_path, int(previous["source_bytes"])) == str(previous["source_sha1"])
+    )
+
+    if incremental:
+        start = int(previous["n_user_rows"])
+        offset = catalog.read_indptr[start]
+        new_reads = CoReadIndex.from_flat(isbns, catalog.read_isbns[offset:], catalog.read_counts[start:]).user_reads
+        cooc = sparse.csr_matrix(
+            (previous["cooc_data"], previous["cooc_indices"], previous["cooc_indptr"]),
+            shape=(len(isbns), len(isbns)),
+        )
+        cooc = (cooc + co_occurrence(new_reads)).tocsr()
+        neighbors, counts = previous["neighbors"], previous["counts"]
+        # Nur Bücher, die in den neuen Zeilen vorkommen, haben eine veränderte Nachbarschaft
+        rows = np.unique(new_reads.indices)
+        print(f"🔁 Inkrementell: {n_users - start} neue Zeilen, {len(rows)} Bücher betroffen")
+    else:
+        cooc = co_occurrence(CoReadIndex.from_flat(isbns, catalog.read_isbns, catalog.read_counts).user_reads)
+        neighbors = np.full((len(isbns), k), -1, dtype=np.int32)
+        counts = np.zeros((len(isbns), k), dtype=np.int32)
+        rows = np.arange(len(isbns))
+        print(f"🧱 Vollständiger Aufbau: {n_users} Zeilen, {len(isbns)} Bücher")
+
+    top_k_rows(cooc, rows, k, neighbors, counts)
+
+    # Atomar schreiben, damit laufende Prozesse nie eine halbe Datei lesen
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(
+            f,
+            isbns=isbns,
+            neighbors=neighbors,
+            counts=counts,
+            n_user_rows=np.int64(n_users),
+            source_bytes=np.int64(source_bytes),
+            source_sha1=np.str_(_file_sha1(user_reads_path, source_bytes)),
+            cooc_data=cooc.data.astype(np.int32),
+            cooc_indices=cooc.indices.astype(np.int32),
+            cooc_indptr=cooc.indptr.astype(np.int64),
+        )
+    os.replace(tmp_path, path)
+    print(f"✅ Co-Read-Tabelle gespeichert: {path}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Baut die Top-K Co-Read-Tabelle für alle Bücher.")
+    parser.add_argument("--k", type=int, default=DEFAULT_K, help="Anzahl gespeicherter Nachbarn pro Buch")
+    parser.add_argument("--full", action="store_true", help="Kompletter Neuaufbau statt inkrementell")
+    args = parser.parse_args()
+    build_neighbor_table(k=args.k, full=args.full)
@@ -0,0 +1,114 @@
+# context_budget.py
+
+# Hält den Chatverlauf, der bei jeder GPT-Anfrage mitgeschickt wird, in einem Token-Budget.
+# - Tool-Ergebnisse älterer Runden werden zu kurzen Zusammenfassungen (Titel, Autor, medium_id)
+#   verdichtet; lange Felder wie "description" fallen weg.
+# - Die letzten Runden bleiben unverändert.
+# - Reicht das nicht, werden die ältesten Runden ganz weggelassen. Es werden immer ganze Runden
+#   entfernt, damit ein Tool-Aufruf nie ohne sein Ergebnis (oder umgekehrt) übrig bleibt.
+# Tokens werden geschätzt (ca. 4 Zeichen pro Token), das reicht für die Budgetierung.
+
+import json
+
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD = 4          # Rollen- und Formatierungs-Tokens pro Nachricht
+DEFAULT_BUDGET = 6000         # Tokens für den Verlauf (ohne Systemanweisung)
+KEEP_RECENT_TURNS = 2         # so viele letzte Runden bleiben wörtlich erhalten
+MAX_STORED_TURNS = 50         # ältere Runden werden gar nicht mehr gespeichert
+SUMMARY_FIELDS = ("medium_id", "isbn13", "title", "author_list", "authors")
+
+
+# Wandelt eine Nachricht (dict oder OpenAI-Objekt) in ein einfaches dict um
+def message_to_dict(message):
+    if isinstance(message, dict):
+        return message
+    return message.model_dump(exclude_none=True)
+
+
+def estimate_tokens(text):
+    return len(text or "") // CHARS_PER_TOKEN + 1
+
+
+def message_tokens(message):
+    message = message_to_dict(message)
+    tokens = MESSAGE_OVERHEAD + estimate_tokens(message.get("content"))
+    for tc in message.get("tool_calls") or []:
+        tokens += estimate_tokens(tc["function"]["name"]) + estimate_tokens(tc["function"]["arguments"])
+    return tokens
+
+
+def history_tokens(messages):
+    return sum(message_tokens(m) for m in messages)
+
+
+# Teilt den Verlauf in Runden auf; jede Runde beginnt mit einer User-Nachricht
+def split_turns(messages):
+    turns = []
+    for message in messages:
+        if message_to_dict(message).get("role") == "user" or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+# Kürzt ein Buch auf die Felder, die GPT für spätere Rückfragen braucht
+def _summarize_book(book):
+    return {key: book[key] for key in SUMMARY_FIELDS if key in book}
+
+
+# Kürzt alle Bücher in einem Tool-Ergebnis, egal unter welchem Feld oder in welcher Liste sie stehen
+# (z.B. "results", "suggestions", "recommendations", "book" oder Listen von Listen)
+def _compact_value(value):
+    if isinstance(value, list):
+        return [_compact_value(item) for item in value]
+    if isinstance(value, dict):
+        if any(key in value for key in SUMMARY_FIELDS):
+            return _summarize_book(value)
+        return {key: _compact_value(item) for key, item in value.items()}
+    return value
+
+
+# Verdichtet den JSON-Inhalt einer Tool-Nachricht; mehrfaches Anwenden ändert nichts mehr
+def compact_tool_content(content):
+    try:
+        data = json.loads(content)
+    except (TypeError, ValueError):
+        return content
+    return json.dumps(_compact_value(data), default=str, ensure_ascii=False)
+
+
+# Verdichtet die Tool-Ergebnisse aller Runden ausser den letzten keep_recent (direkt im Verlauf)
+def compact_history(messages, keep_recent=KEEP_RECENT_TURNS):
+    turns = split_turns(messages)
+    old_turns = turns[:-keep_recent] if keep_recent else turns
+    compacted = []
+    for turn in old_turns:
+        for message in turn:
+            message = message_to_dict(message)
+            if message.get("role") == "tool":
+                message = dict(message, content=compact_tool_content(message["content"]))
+            compacted.append(message)
+    recent = [m for turn in turns[len(old_turns):] for m in turn]
+    messages[:] = compacted + recent
+    return messages
+
+
+# Entfernt die ältesten Runden, bis höchstens max_turns übrig sind (direkt im Verlauf)
+def drop_old_turns(messages, max_turns=MAX_STORED_TURNS):
+    turns = split_turns(messages)
+    if len(turns) > max_turns:
+        messages[:] = [m for turn in turns[-max_turns:] for m in turn]
+    return messages
+
+
+# Verlauf für die nächste GPT-Anfrage: älteste Runden fallen weg, bis das Budget passt.
+# Die aktuelle (letzte) Runde wird immer mitgeschickt.
+def fit_to_budget(messages, budget=DEFAULT_BUDGET):
+    turns = split_turns(messages)
+    costs = [history_tokens(turn) for turn in turns]
+    total = sum(costs)
+    start = 0
+    while total > budget and start < len(turns) - 1:
+        total -= costs[start]
+        start += 1
+    return [m for turn in turns[start:] for m in turn]
@@ -0,0 +1,89 @@
+# embedding_cache.py
+
+# Cache für Anfrage-Embeddings (z.B. "Fantasy mit Drachen").
+# Das Kodieren mit dem SentenceTransformer ist der langsamste lokale Schritt einer Chat-Runde,
+# und das Sprachmodell schickt oft gleiche oder fast gleiche Suchtexte. Deshalb werden die
+# Vektoren unter einem normalisierten Schlüssel gespeichert (LRU, begrenzte Grösse); kodiert wird
+# aber der Originaltext der ersten Anfrage zu diesem Schlüssel.
+# Der Cache ist thread-sicher und kann so von allen Streamlit-Sessions gemeinsam genutzt werden.
+
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np  # für numerische Operationen (z.B. Matrizen)
+
+
+# Vereinheitlicht einen Suchtext: Unicode-Form, Gross-/Kleinschreibung und Leerzeichen
+def normalize_query(text):
+    text = unicodedata.normalize("NFC", str(text))
+    return re.sub(r"\s+", " ", text).strip().casefold()
+
+
+class QueryEmbeddingCache:
+    def __init__(self, encode, max_size=2048):
+        self._encode = encode        # Funktion: Liste von Texten → Matrix (Texte × Dimension)
+        self.max_size = max_size
+        self._entries = OrderedDict()  # Schlüssel → Vektor, älteste Einträge vorne
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    # Embedding für einen einzelnen Suchtext
+    def get(self, text):
+        return self.get_many([text])[0]
+
+    # Embeddings für mehrere Suchtexte; alle fehlenden werden in EINEM encode-Aufruf berechnet
+    def get_many(self, texts):
+        keys = [normalize_query(t) for t in texts]
+        found = {}
+        with self._lock:
+            for key in keys:
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                    found[key] = vector
+                    self.hits += 1
+                else:
+                    self.misses += 1
+
+        # Fehlende Schlüssel ohne Duplikate, je mit dem ersten Originaltext: kodiert wird der Text, wie
+        # er kam (casefold würde z.B. aus "Straße" "strasse" machen und das Embedding verändern)
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                missing.setdefault(key, str(text))
+        if missing:
+            vectors = np.asarray(self._encode(list(missing.values())), dtype=np.float32)
+            with self._lock:
+                for key, vector in zip(missing, vectors):
+                    vector.setflags(write=False)  # geteilte Einträge dürfen nicht verändert werden
+                    found[key] = vector
+                    self._entries[key] = vector
+                    self._entries.move_to_end(key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+
+        return np.stack([found[key] for key in keys])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    # Zähler zum Dimensionieren des Caches
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+            }
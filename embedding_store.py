@@ -0,0 +1,191 @@
+# embedding_store.py
+
+# Speicher für die Buch-Embeddings, der nicht pro Prozess kopiert wird.
+# Die normalisierten Vektoren werden einmalig in eine eigene .npy-Datei in 00_data/ geschrieben
+# und danach nur noch per Memory-Map geöffnet: alle Streamlit-Worker teilen sich dieselben
+# Seiten im Page-Cache des Betriebssystems, statt je eine eigene float32-Kopie zu halten.
+# Optional kompakter:
+# - float16: halber Speicher, praktisch gleiche Treffer
+# - int8:    ein Viertel, pro Vektor ein Skalierungsfaktor (Wert ≈ int8 × scale)
+# Gerechnet wird direkt auf der kompakten Form: blockweise werden nur einige tausend Zeilen nach
+# float32 umgewandelt, der Skalierungsfaktor wird erst auf die Scores angewendet.
+#
+#   python embedding_store.py --dtype int8 --k 10     (baut den Speicher und prüft den Recall)
+
+import contextlib
+import json
+import os
+import threading
+
+import numpy as np  # für numerische Operationen (z.B. Matrizen)
+
+from vector_search import VectorIndex, l2_normalize, top_k_indices
+
+EMBEDDING_STORE_PREFIX = "./00_data/embedding_store"
+DTYPES = ("float32", "float16", "int8")
+EMBEDDING_DTYPE = os.environ.get("LIBBY_EMBEDDING_DTYPE", "float32")  # Standard: exakt wie bisher
+BLOCK_SIZE = 8192  # Zeilen pro Rechenblock (int8 → float32: 8192 × 384 × 4 B ≈ 12 MB)
+
+try:
+    import fcntl  # Dateisperre zwischen Prozessen (fehlt unter Windows)
+except ImportError:
+    fcntl = None
+
+
+# Normalisiert und verdichtet Vektoren; Rückgabe (Werte, Skalierung oder None)
+def quantize(vectors, dtype):
+    vectors = l2_normalize(vectors)
+    if dtype == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127
+        scales[scales == 0] = 1.0
+        return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+    return vectors.astype(dtype), None
+
+
+class QuantizedVectorIndex(VectorIndex):
+    def __init__(self, vectors, scales=None, block_size=BLOCK_SIZE):
+        self.vectors = vectors        # (Bücher × Dimension) float32/float16/int8, meist memory-mapped
+        self.scales = scales          # float32 pro Buch (nur int8), sonst None
+        self.block_size = block_size
+
+    @property
+    def dtype(self):
+        return self.vectors.dtype.name
+
+    def vector(self, idx):
+        vector = np.asarray(self.vectors[idx], dtype=np.float32)
+        return vector * self.scales[idx] if self.scales is not None else vector
+
+    def rows(self, start, stop):
+        block = np.asarray(self.vectors[start:stop], dtype=np.float32)
+        return block * self.scales[start:stop, None] if self.scales is not None else block
+
+    # Kosinus-Ähnlichkeit zu allen Büchern, blockweise auf den kompakten Werten
+    def scores(self, queries):
+        queries = l2_normalize(queries)
+        out = np.empty(queries.shape[:-1] + (len(self),), dtype=np.float32)
+        for start in range(0, len(self), self.block_size):
+            stop = min(start + self.block_size, len(self))
+            block = np.asarray(self.vectors[start:stop], dtype=np.float32)
+            out[..., start:stop] = queries @ block.T
+            if self.scales is not None:
+                out[..., start:stop] *= self.scales[start:stop]
+        return out
+
+
+def _store_paths(prefix, dtype):
+    return {
+        "vectors": f"{prefix}_{dtype}.npy",
+        "scales": f"{prefix}_{dtype}_scales.npy",
+        "meta": f"{prefix}_{dtype}_meta.json",
+        "lock": f"{prefix}_{dtype}.lock",
+    }
+
+
+# Temporäre Datei mit eigenem Namen pro Prozess und Thread, damit sich gleichzeitige Builds
+# nicht gegenseitig die Datei wegnehmen
+def _tmp_path(path):
+    return f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+
+
+# Nur ein Prozess baut den Speicher; die anderen warten und öffnen danach dessen Ergebnis
+@contextlib.contextmanager
+def _build_lock(path):
+    with open(path, "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)  # wird mit dem Schliessen der Datei freigegeben
+        yield
+
+
+def _is_fresh(paths, expected):
+    try:
+        with open(paths["meta"], encoding="utf-8") as f:
+            return json.load(f) == expected
+    except (FileNotFoundError, ValueError):
+        return False
+
+
+# Schreibt den Speicher blockweise (die Quelle kann selbst memory-mapped sein)
+def build_embedding_store(embeddings, prefix=EMBEDDING_STORE_PREFIX, dtype=EMBEDDING_DTYPE, block_size=BLOCK_SIZE):
+    paths = _store_paths(prefix, dtype)
+    n_books, dim = embeddings.shape
+    tmp_vectors, tmp_scales = _tmp_path(paths["vectors"]), _tmp_path(paths["scales"])
+    vectors = np.lib.format.open_memmap(tmp_vectors, mode="w+", dtype=dtype, shape=(n_books, dim))
+    scales = np.ones(n_books, dtype=np.float32)
+    for start in range(0, n_books, block_size):
+        stop = min(start + block_size, n_books)
+        values, block_scales = quantize(embeddings[start:stop], dtype)
+        vectors[start:stop] = values
+        if block_scales is not None:
+            scales[start:stop] = block_scales
+    vectors.flush()
+    del vectors
+    os.replace(tmp_vectors, paths["vectors"])
+    if dtype == "int8":
+        with open(tmp_scales, "wb") as f:
+            np.save(f, scales)
+        os.replace(tmp_scales, paths["scales"])
+
+
+# Öffnet den Speicher per Memory-Map und baut ihn neu, wenn er fehlt oder nicht zu den Embeddings passt
+def load_embedding_store(embeddings, source_hashes, prefix=EMBEDDING_STORE_PREFIX, dtype=EMBEDDING_DTYPE):
+    if dtype not in DTYPES:
+        raise ValueError(f"Unbekannter Embedding-Typ {dtype!r}, erlaubt: {', '.join(DTYPES)}")
+    paths = _store_paths(prefix, dtype)
+    expected = {"embeddings_sha1": source_hashes["embeddings"], "dtype": dtype}
+
+    if not _is_fresh(paths, expected):
+        with _build_lock(paths["lock"]):
+            # Nochmals prüfen: ein anderer Worker hat ihn evtl. gebaut, während wir gewartet haben
+            if not _is_fresh(paths, expected):
+                print(f"🧱 Baue Embedding-Speicher ({dtype}) neu auf...")
+                build_embedding_store(embeddings, prefix, dtype)
+                # Metadatei zuletzt: erst dann gilt der Speicher als vollständig
+                tmp_meta = _tmp_path(paths["meta"])
+                with open(tmp_meta, "w", encoding="utf-8") as f:
+                    json.dump(expected, f)
+                os.replace(tmp_meta, paths["meta"])
+
+    vectors = np.load(paths["vectors"], mmap_mode="r")
+    scales = np.load(paths["scales"]) if dtype == "int8" else None  # klein, ein float32 pro Buch
+    return QuantizedVectorIndex(vectors, scales)
+
+
+# Anteil der exakten Top-k (float32), den der Index ebenfalls findet, gemittelt über die Anfragen
+def recall_at_k(index, exact, queries, k=10):
+    found = top_k_indices(index.scores(queries), k)
+    expected = top_k_indices(exact.scores(queries), k)
+    hits = [len(np.intersect1d(a, b)) for a, b in zip(found, expected)]
+    return float(np.mean(hits)) / k
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from catalog import load_catalog
+
+    parser = argparse.ArgumentParser(description="Baut den Embedding-Speicher und prüft den Recall gegen float32.")
+    parser.add_argument("--dtype", choices=DTYPES, default=EMBEDDING_DTYPE)
+    parser.add_argument("--k", type=int, default=10, help="Recall@k")
+    parser.add_argument("--queries", type=int, default=500, help="Anzahl Test-Anfragen")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    catalog = load_catalog()
+    index = load_embedding_store(catalog.embeddings, catalog.source_hashes, dtype=args.dtype)
+    exact = VectorIndex(catalog.embeddings)
+
+    # Test-Anfragen: Buchvektoren mit etwas Rauschen (wie "ähnlich zu X", aber nicht exakt X)
+    rng = np.random.default_rng(args.seed)
+    rows = rng.integers(len(exact), size=args.queries)
+    queries = exact.vectors[rows] + 0.05 * rng.standard_normal((args.queries, exact.vectors.shape[1]), dtype=np.float32)
+
+    start = time.perf_counter()
+    recall = recall_at_k(index, exact, queries, args.k)
+    elapsed = time.perf_counter() - start
+    error = np.abs(index.scores(queries[:50]) - exact.scores(queries[:50])).max()
+    size = index.vectors.nbytes + (index.scales.nbytes if index.scales is not None else 0)
+
+    print(f"📦 {args.dtype}: {size / 1024**2:.1f} MB (float32: {exact.vectors.nbytes / 1024**2:.1f} MB)")
+    print(f"🎯 Recall@{args.k}: {recall:.4f}  (grösster Score-Fehler {error:.5f}, {elapsed:.2f} s für {args.queries} Anfragen)")
@@ -0,0 +1,185 @@
+# intent_router.py
+
+# Lokaler Schnellweg für einfache Nachfragen, ganz ohne GPT:
+# - Bestand/Verfügbarkeit: "Habt ihr Der Schwarm?", "Ist Alle sieben Wellen verfügbar?"
+# - Autor:                 "Was habt ihr von Glattauer?", "Bücher von Jussi Adler-Olsen"
+# Erkannt wird mit Mustern über die ganze Nachricht; beantwortet wird mit is_book_in_library bzw.
+# find_books_by_author und der Verfügbarkeitsabfrage, als Textvorlage mit der üblichen
+# medium_id-Liste auf der letzten Zeile. Alles, was nicht eindeutig ist (kein Muster, Wünsche nach
+# Empfehlungen, nur unscharfe Titeltreffer, mehrere Autoren mit demselben Namen), geht an GPT.
+# Abschalten mit LIBBY_ROUTER=0. Die Trefferquote steht in router.stats() (und in den Trace-Zählern).
+
+import os
+import re
+import threading
+from collections import Counter
+
+import tracing
+from availability import get_availability_service
+from book_index import name_tokens, normalize_text
+from recommender import find_books_by_author, is_book_in_library, load_data
+
+ENABLED = os.environ.get("LIBBY_ROUTER", "1") != "0"
+MAX_BOOKS = 5             # wie in der Systemanweisung: nie mehr als 5 Bücher
+MIN_TITLE_COVERAGE = 0.6  # Teil-Titel müssen mindestens so viel des Titels abdecken
+
+_END = r"\s*[?!.]*\s*$"
+AUTHOR_PATTERNS = [
+    re.compile(r"^(?:was|welche bücher|welche titel)\s+(?:habt ihr|haben sie|hast du|gibt es)\s+(?:alles\s+)?von\s+(?P<author>.+?)" + _END),
+    re.compile(r"^(?:habt ihr|haben sie|hast du|gibt es)\s+(?:etwas|was|bücher|romane)\s+von\s+(?P<author>.+?)" + _END),
+    re.compile(r"^(?:bücher|romane|titel)\s+von\s+(?P<author>.+?)" + _END),
+]
+AVAILABILITY_PATTERNS = [
+    re.compile(
+        r"^(?:habt ihr|haben sie|hast du|gibt es)\s+(?:das buch\s+|den roman\s+|den titel\s+)?(?P<title>.+?)"
+        r"(?:\s+(?:da|im bestand|in der bibliothek|bei euch|zum ausleihen))?" + _END
+    ),
+    re.compile(
+        r"^ist\s+(?:das buch\s+|der roman\s+)?(?P<title>.+?)\s+"
+        r"(?:verfügbar|vorrätig|ausleihbar|da|ausgeliehen|im bestand|in der bibliothek)" + _END
+    ),
+    re.compile(r"^kann ich\s+(?:das buch\s+)?(?P<title>.+?)\s+ausleihen" + _END),
+]
+# Wer nach Ähnlichem oder Empfehlungen fragt, braucht GPT, auch wenn ein Muster passt
+NEEDS_LLM = re.compile(r"ähnlich|empfehl|\bwie\s|mochte|gefallen|passt|zu mir")
+QUOTES = "\"'«»„“”‚‘’`"
+
+
+class RoutedAnswer:
+    def __init__(self, intent, tool, arguments, result, text):
+        self.intent = intent        # "availability" oder "author"
+        self.tool = tool            # verwendete Funktion (wie ein Tool-Aufruf von GPT)
+        self.arguments = arguments  # deren Argumente
+        self.result = result        # deren Ergebnis
+        self.text = text            # fertige Antwort inklusive medium_id-Liste
+
+
+def _join_titles(titles):
+    quoted = [f"„{title}“" for title in titles]
+    return quoted[0] if len(quoted) == 1 else ", ".join(quoted[:-1]) + " und " + quoted[-1]
+
+
+# "Glattauer, Daniel" → "Daniel Glattauer"
+def _display_name(name):
+    last, sep, first = str(name).partition(", ")
+    return f"{first} {last}" if sep else last
+
+
+def _id_line(books):
+    return "[" + ", ".join(str(int(book["medium_id"])) for book in books) + "]"
+
+
+class IntentRouter:
+    def __init__(self):
+        self.counts = Counter()  # (Absicht, Ergebnis) → Anzahl; Ergebnis "hit" oder Grund für GPT
+        self._lock = threading.Lock()
+
+    def _count(self, intent, outcome):
+        with self._lock:
+            self.counts[(intent, outcome)] += 1
+        tracing.add("router_total", 1, intent=intent, outcome=outcome)
+
+    # Antwort für einfache Nachfragen; None, wenn GPT übernehmen soll
+    def route(self, user_input):
+        text = " ".join(str(user_input).split()).casefold()
+        intent, query = self._match(text)
+        if intent is None:
+            self._count("none", "no_pattern")
+            return None
+        if NEEDS_LLM.search(text):
+            self._count(intent, "needs_llm")
+            return None
+
+        query = query.strip(QUOTES + " ")
+        answer = self._availability(query) if intent == "availability" else self._author(query)
+        if isinstance(answer, str):
+            self._count(intent, answer)  # Grund, warum GPT übernimmt
+            return None
+        self._count(intent, "hit")
+        return answer
+
+    @staticmethod
+    def _match(text):
+        for intent, patterns in (("author", AUTHOR_PATTERNS), ("availability", AVAILABILITY_PATTERNS)):
+            for pattern in patterns:
+                match = pattern.match(text)
+                if match:
+                    return intent, match.group(intent if intent == "author" else "title")
+        return None, None
+
+    # Nur eindeutige Titel: exakter Treffer, oder die Anfrage deckt den grössten Teil eines einzigen
+    # Titels ab (mehrere Ausgaben desselben Titels sind erlaubt). Unscharfe Treffer gehen an GPT.
+    def _availability(self, title):
+        query = normalize_text(title)
+        if len(query) < 3:
+            return "too_short"
+        result = is_book_in_library(title)
+        if not result["exists"]:
+            return "not_found"
+
+        data = load_data()
+        exact_row = data.title_index.find_exact(title)
+        if exact_row is not None:
+            wanted = normalize_text(data.books_df["title"].iat[exact_row])
+        else:
+            titles = {normalize_text(book["title"]) for book in result["results"]}
+            if len(titles) > 1:
+                return "ambiguous"
+            wanted = titles.pop()
+            if query not in wanted or len(query) < MIN_TITLE_COVERAGE * len(wanted):
+                return "ambiguous"
+        books = [book for book in result["results"] if normalize_text(book["title"]) == wanted]
+        if not books:
+            return "ambiguous"
+        result = {"exists": True, "results": books}
+
+        books = books[:MAX_BOOKS]
+        status = get_availability_service().get_many([book["medium_id"] for book in books])
+        first = books[0]
+        authors = " und ".join(_display_name(name) for name in first.get("authors") or []) or "unbekannt"
+        if len(books) == 1:
+            line = f"Ja, „{first['title']}“ von {authors} haben wir im Bestand. "
+            line += f"Aktueller Status: {status.get(int(first['medium_id'])) or 'unbekannt'}."
+        else:
+            states = "; ".join(f"Ausgabe {i}: {status.get(int(b['medium_id'])) or 'unbekannt'}" for i, b in enumerate(books, 1))
+            line = f"Ja, „{first['title']}“ von {authors} haben wir in {len(books)} Ausgaben im Bestand ({states})."
+        text = line + "\nMöchtest du ähnliche Bücher entdecken? Frag mich einfach!\n" + _id_line(books)
+        return RoutedAnswer("availability", "is_book_in_library", {"title": title}, result, text)
+
+    # Nur ein eindeutiger Autor: alle Namensteile passen zu genau einem Autorennamen
+    def _author(self, author):
+        tokens = set(name_tokens(author))
+        if not tokens:
+            return "too_short"
+        books = find_books_by_author(author, top_n=MAX_BOOKS)
+        if not books or "info" in books[0]:
+            return "not_found"
+        names = {
+            name for book in books for name in book["author_list"] if tokens <= set(name_tokens(name))
+        }
+        if len(names) != 1:
+            return "ambiguous"
+
+        text = (
+            f"Von {_display_name(names.pop())} haben wir zum Beispiel {_join_titles([book['title'] for book in books])} im Bestand.\n"
+            "Soll ich dir zu einem davon mehr erzählen oder ähnliche Bücher suchen?\n" + _id_line(books)
+        )
+        return RoutedAnswer("author", "find_books_by_author", {"author": author}, books, text)
+
+    # Trefferquote insgesamt und pro Absicht
+    def stats(self):
+        with self._lock:
+            counts = dict(self.counts)
+        total = sum(counts.values())
+        hits = sum(n for (_, outcome), n in counts.items() if outcome == "hit")
+        by_outcome = {f"{intent}:{outcome}": n for (intent, outcome), n in sorted(counts.items())}
+        return {"messages": total, "hits": hits, "hit_rate": hits / total if total else 0.0, "counts": by_outcome}
+
+    def format_report(self):
+        stats = self.stats()
+        lines = [f"🚦 Schnellweg: {stats['hits']} von {stats['messages']} Nachrichten ohne GPT ({stats['hit_rate']:.0%})"]
+        lines += [f"   {key}: {n}" for key, n in stats["counts"].items()]
+        return "\n".join(lines)
+
+
+router = IntentRouter()  # prozessweit geteilt (Zähler für alle Sessions)
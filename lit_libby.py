@@ -1,9 +1,13 @@
 import streamlit as st
-import pandas as pd
-import requests
-from chat_engine import handle_user_message, ChatMemory
+from chat_engine import stream_user_message
+from session_store import get_session_store  # Sessions in SQLite, nur die aktiven im Speicher
+from availability import get_availability_service
+from recommender import load_data  # gemeinsamer Katalog + Schlüssel-Indizes (beim ersten Gebrauch geladen)
+import startup
+import os
 import re
-import ast
+import time
+import uuid
 
 # --------------------------
 # Setup
@@ -13,23 +17,22 @@ st.set_page_config(page_title="Libby - Deine Bibliothekarin", page_icon="📚",
 AVATAR_PATH = "./static/avatar.png"
 LOGO_PATH = "./static/logo.png"
 
-books_df = pd.read_csv("./00_data/filtered_books.csv")
-books_df['isbn13'] = books_df['isbn13'].astype(int)
-books_df["author_list"] = books_df["author_list"].apply(ast.literal_eval)
+# Optional: Modell, Daten und OpenAI-Client schon beim Start des Workers laden (LIBBY_WARMUP=1)
+@st.cache_resource
+def warm_up():
+    startup.warm_up()
+    print(startup.format_report())
+
+if os.environ.get("LIBBY_WARMUP") == "1":
+    warm_up()
+
+# Persönliche Empfehlungen nur für angemeldete Nutzer (Streamlit-Login, st.login): LIBBY_USER_ID_CLAIM
+# nennt das Feld des Logins mit der Ausweisnummer. Ohne die Variable ist niemand angemeldet.
+USER_ID_CLAIM = os.environ.get("LIBBY_USER_ID_CLAIM")
 
 # --------------------------
 # Helpers
 # --------------------------
-def scrape_verfuegbarkeit(medium_id):
-    url = f"https://seengen.biblioweb.ch/medium/status/{medium_id}"
-    headers = {"User-Agent": "Mozilla/5.0"}
-    try:
-        response = requests.post(url, headers=headers, timeout=5)
-        response.raise_for_status()
-        return response.json()["ausleihstatus"]["status"]
-    except Exception:
-        return "Unbekannt"
-
 def get_availability_label(status):
     status_lower = status.lower()
     if "ja" in status_lower or "vorrätig" in status_lower:
@@ -39,6 +42,12 @@ def get_availability_label(status):
     else:
         return f'<span style="color:red;font-weight:bold;">❌ {status}</span>'
 
+# Ausweisnummer des angemeldeten Nutzers oder None
+def current_user_id():
+    if not USER_ID_CLAIM or not st.user.get("is_logged_in"):
+        return None
+    return st.user.get(USER_ID_CLAIM)
+
 def extract_ids_from_last_line(text):
     lines = text.strip().split("\n")
     last_line = lines[-1]
@@ -76,6 +85,71 @@ def show_book_card(book, availability):
             if recommendation:
                 st.info(f"💡 **Meine Empfehlung:** {recommendation}")
 
+# Sucht die medium_id eines Buches, falls nur die ISBN bekannt ist
+def resolve_medium_id(book):
+    medium_id = book.get("medium_id")
+    if not medium_id and book.get("isbn13"):
+        data = load_data()
+        row = data.isbn_index.first(book["isbn13"])
+        if row is not None:
+            medium_id = int(data.books_df["medium_id"].iat[row])
+    return int(medium_id) if medium_id else None
+
+# Baut aus einer Bot-Antwort einmalig ein fertiges Anzeige-Paket für diese Runde:
+# bereinigter Text, Buchdatensätze und Verfügbarkeit mit Zeitstempel.
+# Bei späteren Reruns wird nur noch dieses Paket angezeigt, nichts neu berechnet oder abgefragt.
+def build_turn(user_msg, response):
+    text, books = "", []
+    if isinstance(response, str):
+        ids, text = extract_ids_from_last_line(response)
+        books = load_data().medium_index.records_for(ids) if ids else []
+    elif isinstance(response, list):
+        books = [dict(book, medium_id=resolve_medium_id(book)) for book in response]
+
+    turn = {"user": user_msg, "text": text, "books": books, "availability": {}, "checked_at": None}
+    refresh_availability(turn)
+    return turn
+
+# Holt die Verfügbarkeit aller Bücher einer Runde gemeinsam (parallel bzw. aus dem Cache)
+def refresh_availability(turn):
+    medium_ids = [book.get("medium_id") for book in turn["books"]]
+    if medium_ids:
+        turn["availability"] = get_availability_service().get_many(medium_ids)
+        turn["checked_at"] = time.time()
+
+# Button-Callback: Verfügbarkeit neu holen und die Session gleich speichern,
+# sonst ist der neue Stand nach einem Neustart des Workers wieder weg
+def refresh_and_save(turn, session_id, session):
+    refresh_availability(turn)
+    get_session_store().save(session_id, session)
+
+# Zeigt eine gespeicherte Runde an (Text + Karten mit gespeicherter Verfügbarkeit)
+def render_turn(turn, key, session_id, session, show_text=True):
+    if show_text and turn["text"]:
+        st.markdown(turn["text"])
+    if not turn["books"]:
+        return
+    checked_at = time.strftime("%H:%M", time.localtime(turn["checked_at"])) if turn["checked_at"] else "–"
+    col_info, col_button = st.columns([3, 1])
+    with col_info:
+        st.caption(f"Verfügbarkeit, Stand {checked_at} Uhr")
+    with col_button:
+        # Callback läuft vor dem Rerun, die Karten zeigen danach schon den neuen Stand
+        st.button("🔄 Aktualisieren", key=f"refresh_{key}", on_click=refresh_and_save,
+                  args=(turn, session_id, session))
+    for book in turn["books"]:
+        availability = turn["availability"].get(book.get("medium_id"))
+        show_book_card(book, availability or "Unbekannt")
+
+# Zeigt den Spinner nur, bis das erste Textstück da ist (solange GPT noch Tools aufruft)
+def spinner_until_first_chunk(chunks):
+    chunks = iter(chunks)
+    with st.spinner("Libby sucht... 📚"):
+        first = next(chunks, None)
+    if first is not None:
+        yield first
+        yield from chunks
+
 # --------------------------
 # Streamlit App Layout
 # --------------------------
@@ -106,43 +180,33 @@ with avatar_col:
 with title_col:
     st.markdown("<h1 style='color: #0000ee;'>Libby - Deine virtuelle Bibliothekarin</h1>", unsafe_allow_html=True)
 
+# --------------------------
+# Session: die ID steht in der URL (?session=...), damit der Verlauf ein Neuladen der Seite
+# und einen Neustart des Workers übersteht. Verlauf und Karten liegen im Session-Speicher,
+# nicht in st.session_state.
+# --------------------------
+session_id = st.query_params.get("session")
+if not session_id:
+    session_id = uuid.uuid4().hex
+    st.query_params["session"] = session_id
+session = get_session_store().get(session_id)
+session.memory.user_id = current_user_id()  # kommt nie aus der URL oder dem Chat
+
 # --------------------------
 # Chat löschen Button
 # --------------------------
 if st.button("🗑️ Chat löschen"):
-    st.session_state.chat_history = []
-    st.session_state.memory = ChatMemory()
+    get_session_store().delete(session_id)
     st.rerun()
 
 # --------------------------
 # Chat + Karten
 # --------------------------
-if "chat_history" not in st.session_state:
-    st.session_state.chat_history = []
-if "memory" not in st.session_state:
-    st.session_state.memory = ChatMemory()
-
-for user_msg, bot_response in st.session_state.chat_history:
+for i, turn in enumerate(session.turns):
     with st.chat_message("user"):
-        st.markdown(user_msg)
+        st.markdown(turn["user"])
     with st.chat_message("assistant"):
-        if isinstance(bot_response, str):
-            ids, cleaned_text = extract_ids_from_last_line(bot_response)
-            st.markdown(cleaned_text)
-            if ids:
-                books = books_df[books_df["medium_id"].isin(ids)].to_dict(orient="records")
-                for book in books:
-                    availability = scrape_verfuegbarkeit(book["medium_id"])
-                    show_book_card(book, availability)
-        elif isinstance(bot_response, list):
-            for book in bot_response:
-                medium_id = book.get("medium_id")
-                if not medium_id and book.get("isbn13"):
-                    row = books_df[books_df['isbn13'] == int(book["isbn13"])]
-                    if not row.empty:
-                        medium_id = int(row["medium_id"].values[0])
-                availability = scrape_verfuegbarkeit(medium_id) if medium_id else "Unbekannt"
-                show_book_card(book, availability)
+        render_turn(turn, i, session_id, session)
 
 # --------------------------
 # Chat Input
@@ -154,25 +218,11 @@ if user_input:
         st.markdown(user_input)
 
     with st.chat_message("assistant"):
-        with st.spinner("Libby sucht... 📚"):
-            response = handle_user_message(user_input, st.session_state.memory)
-
-        if isinstance(response, str):
-            ids, cleaned_text = extract_ids_from_last_line(response)
-            st.markdown(cleaned_text)
-            if ids:
-                books = books_df[books_df["medium_id"].isin(ids)].to_dict(orient="records")
-                for book in books:
-                    availability = scrape_verfuegbarkeit(book["medium_id"])
-                    show_book_card(book, availability)
-        elif isinstance(response, list):
-            for book in response:
-                medium_id = book.get("medium_id")
-                if not medium_id and book.get("isbn13"):
-                    row = books_df[books_df['isbn13'] == int(book["isbn13"])]
-                    if not row.empty:
-                        medium_id = int(row["medium_id"].values[0])
-                availability = scrape_verfuegbarkeit(medium_id) if medium_id else "Unbekannt"
-                show_book_card(book, availability)
-
-        st.session_state.chat_history.append((user_input, response))
+        # Antwort wird Wort für Wort angezeigt, sobald GPT sie erzeugt; die medium_id-Liste am Ende bleibt verborgen
+        reply = stream_user_message(user_input, session.memory)
+        st.write_stream(spinner_until_first_chunk(reply))
+
+        turn = build_turn(user_input, reply.text)
+        render_turn(turn, len(session.turns), session_id, session, show_text=False)
+        session.turns.append(turn)
+        get_session_store().save(session_id, session)
@@ -1,7 +1,31 @@
 # main.py
 
+import argparse
+import time
+
+_import_start = time.perf_counter()
+
 # Importiere die zentrale Chatlogik und das Gedächtnisobjekt
 from chat_engine import handle_user_message, ChatMemory
+import intent_router
+import startup
+import tracing
+
+startup.timings["import chat_engine"] = time.perf_counter() - _import_start
+
+parser = argparse.ArgumentParser(description="BookBot in der Konsole")
+parser.add_argument("--warmup", action="store_true", help="Modell, Daten und OpenAI-Client sofort laden")
+parser.add_argument("--timings", action="store_true", help="Startzeiten pro Komponente ausgeben")
+parser.add_argument("--trace", help="Spans/Kennzahlen ausgeben, z.B. 'console' oder 'console,jsonl:traces.jsonl' (wie LIBBY_TRACE)")
+args = parser.parse_args()
+
+if args.trace:
+    tracing.configure(args.trace)
+
+if args.warmup:
+    startup.warm_up()
+if args.timings:
+    print(startup.format_report() + "\n")
 
 # Erstelle ein neues Speicherobjekt für den Verlauf des Gesprächs
 memory = ChatMemory()
@@ -16,6 +40,8 @@ while True:
 
     # Wenn Benutzer "exit" oder "quit" eingibt → Programm beenden
     if user_input.lower() in ["exit", "quit"]:
+        if args.timings:
+            print(intent_router.router.format_report())
         break
 
     # Übergib die Eingabe an den Chatbot (GPT + Tools)
@@ -2,40 +2,103 @@
 
 # Bibliotheken importieren
 import pandas as pd  # für Datenmanipulation und Tabellen
-import ast  # um Zeichenketten in Listen (z.B. aus CSV) umzuwandeln
 import numpy as np  # für numerische Operationen (z.B. Matrizen)
-from collections import Counter  # zählt wie oft ein Wert in einer Liste vorkommt
-import requests
 import streamlit as st
 
-# Modell zur Umwandlung von Texten in Vektoren
-from sklearn.metrics.pairwise import cosine_similarity  # misst Ähnlichkeit zwischen Vektoren
-from sentence_transformers import SentenceTransformer  # Modell für sogenannte "Sentence Embeddings"
+from catalog import DATA_DIR, EMBEDDING_MODEL, load_catalog  # gemeinsamer Datenlader mit Binär-Cache
+from book_index import AuthorIndex, KeyIndex, TitleIndex  # Hash-Maps + invertierte Indizes über Titel und Autoren
+from embedding_cache import QueryEmbeddingCache  # LRU-Cache für Anfrage-Embeddings
+from vector_search import SIMILAR_BOOKS_PREFIX, load_similar_books_table  # schnelle Top-k-Suche + vorberechnete Nachbarn
+from embedding_store import EMBEDDING_DTYPE, EMBEDDING_STORE_PREFIX, load_embedding_store  # memory-mapped (optional quantisiert)
+from reindex import check_embeddings  # passt book_embeddings.npy noch zur Buchtabelle?
+from co_reads import CoReadIndex, NEIGHBORS_PATH, load_neighbor_table  # Index + vorberechnete Co-Reads
+from user_recommendations import USER_RECOMMENDATIONS_PATH, load_user_recommendations  # vorberechnete persönliche Empfehlungen
+from availability import get_availability_service  # parallele, gecachte Verfügbarkeitsabfragen
+from startup import record  # misst die Initialisierungszeit pro Komponente
+import tracing  # Spans und Kennzahlen (LIBBY_TRACE)
+
+# Modell, Datensätze und Indizes werden erst beim ersten Gebrauch geladen (nicht schon beim Import),
+# danach einmal pro Prozess für alle Sessions gecacht. Vorwärmen: startup.warm_up()
 
 # Ein kleines, aber effektives Modell zur Umwandlung von Texten in Zahlenvektoren
 @st.cache_resource
 def load_model():
-    return SentenceTransformer("paraphrase-multilingual-MiniLM-L12-v2")
+    with record("model"):
+        # Import erst hier: sentence_transformers zieht torch nach und ist der teuerste Import
+        from sentence_transformers import SentenceTransformer  # Modell für sogenannte "Sentence Embeddings"
+        return SentenceTransformer(EMBEDDING_MODEL)
 
-model = load_model()
 
-# Datensätze laden
-books_df = pd.read_csv("./00_data/filtered_books.csv")  # enthält Buchdaten (Titel, Autor, Beschreibung usw.)'isbn13
-books_df['isbn13'] = books_df['isbn13'].astype(int)  ## WICHTIG
-books_df = books_df.reset_index(drop=True)
-user_df = pd.read_csv("./00_data/synthetic_user_reads_seengen.csv")  # simulierte Nutzer-Buchdaten
+# Berechnet Embeddings für Anfragetexte (nur für die Texte, die nicht schon im Cache sind)
+def encode_queries(texts):
+    model = load_model()
+    with tracing.span("model.encode", texts=len(texts), chars=sum(len(t) for t in texts)):
+        return model.encode(texts)
 
-# Die Bücherlisten in der User-Datei liegen als Text vor, müssen also zuerst in echte Listen umgewandelt werden
-user_df["books"] = user_df["books"].apply(ast.literal_eval)  ## WICHTIG
 
-# Bücher aus user_df entfernen, die nicht im Datensatz sind
-valid_isbns = set(books_df['isbn13'].tolist())
-user_df["books"] = user_df["books"].apply(
-    lambda books: [int(float(b)) for b in books if int(float(b)) in valid_isbns]
-)
+# Gemeinsamer Cache für Anfrage-Embeddings (einmal pro Prozess, für alle Sessions)
+@st.cache_resource
+def load_query_cache():
+    return QueryEmbeddingCache(encode_queries, max_size=2048)
+
+
+# Alle Datensätze und die daraus gebauten Indizes.
+# Standardmässig aus 00_data/; andere Ordner (z.B. synthetische Kataloge für Benchmarks) über data_dir.
+# similar_books_prefix=None: keine vorberechnete Nachbartabelle, ähnliche Bücher werden live gesucht.
+class RecommenderData:
+    def __init__(self, data_dir=DATA_DIR, neighbors_path=NEIGHBORS_PATH, similar_books_prefix=SIMILAR_BOOKS_PREFIX,
+                 user_recommendations_path=USER_RECOMMENDATIONS_PATH, embedding_store_prefix=EMBEDDING_STORE_PREFIX,
+                 embedding_dtype=EMBEDDING_DTYPE):
+        # Datensätze laden (bereinigt und typisiert; Warmstart aus dem Binär-Cache statt aus den CSV-Dateien)
+        with record("catalog"):
+            self.catalog = load_catalog(data_dir)
+            self.books_df = self.catalog.books_df  # enthält Buchdaten (Titel, Autor, Beschreibung usw.)
+
+        with record("book indexes"):
+            # Schlüssel-Indizes für direkte Zugriffe per ISBN bzw. medium_id (statt Spalten-Scans)
+            book_records = self.books_df.to_dict(orient="records")
+            self.isbn_index = KeyIndex(self.books_df["isbn13"], book_records)
+            self.medium_index = KeyIndex(self.books_df["medium_id"], book_records)
+            # Titel-Index (exakte Treffer, Teilstrings und unscharfe Suche)
+            self.title_index = TitleIndex(self.books_df["title"].tolist())
+            # Autoren-Index aus der geparsten author_list (Namens-Token → Buchzeilen)
+            self.author_index = AuthorIndex(self.books_df["author_list"])
+
+        with record("co-read index"):
+            # Nutzer → Bücher als CSR, Buch → Nutzer als invertierter Index
+            self.co_read_index = CoReadIndex.from_flat(
+                self.books_df["isbn13"], self.catalog.read_isbns, self.catalog.read_counts
+            )
+            # Vorberechnete Top-K Co-Reads (offline mit 'python co_reads.py' gebaut); None, falls fehlend oder veraltet
+            self.co_read_neighbors = load_neighbor_table(
+                neighbors_path, self.books_df["isbn13"], self.catalog.n_users, self.catalog.source_hashes["user_reads"]
+            )
+
+        with record("vector index"):
+            # Zeilenzahl muss stimmen (sonst Fehler); veraltete Vektoren laut Manifest nur melden
+            for warning in check_embeddings(self.catalog):
+                print(f"⚠️ {warning} – bitte 'python reindex.py' ausführen.")
+            # Normalisierte Embeddings als Memory-Map (von allen Worker-Prozessen geteilt), je nach
+            # LIBBY_EMBEDDING_DTYPE als float32, float16 oder int8; danach nur noch Skalarprodukte
+            self.book_index = load_embedding_store(
+                self.catalog.embeddings, self.catalog.source_hashes, embedding_store_prefix, embedding_dtype
+            )
+            # Vorberechnete Nachbarn pro Buch (offline mit 'python vector_search.py' gebaut, memory-mapped);
+            # None, falls fehlend oder veraltet: dann sucht _similar_rows live im book_index
+            self.similar_books = None
+            if similar_books_prefix is not None:
+                self.similar_books = load_similar_books_table(
+                    self.book_index, self.catalog.source_hashes, prefix=similar_books_prefix
+                )
+
+        with record("user recommendations"):
+            # Persönliche Top-N pro Nutzer (offline mit 'python user_recommendations.py' gebaut); None, falls fehlend oder veraltet
+            self.user_recommendations = load_user_recommendations(user_recommendations_path, self.catalog.source_hashes)
+
 
-# Vorgefertigte Dateien laden, um Berechnungen zu beschleunigen
-book_embeddings = np.load("./00_data/book_embeddings.npy")  # enthält Vektoren für alle Bücher
+@st.cache_resource
+def load_data():
+    return RecommenderData()
 
 
 # --------------------------
@@ -44,75 +107,79 @@ book_embeddings = np.load("./00_data/book_embeddings.npy")  # enthält Vektoren
 
 # Sucht den Index eines Buches in der Tabelle anhand des Titels
 def get_book_index_by_title(title: str):
-    # Erst exakte Übereinstimmung
-    exact_matches = books_df[books_df["title"].str.lower() == title.lower()]
-    if not exact_matches.empty:
-        return exact_matches.index[0]
-
-    # Sonst: enthält (teilweise Übereinstimmung)
-    partial_matches = books_df[books_df["title"].str.contains(title, case=False, na=False)]
-    if not partial_matches.empty:
-        return partial_matches.index[0]
-
-    # Wenn nichts gefunden
-    return None
+    # Erst exakte Übereinstimmung, sonst enthält (teilweise Übereinstimmung)
+    # Wenn nichts gefunden: None (unscharfe Treffer wären oft ein ganz anderes Buch)
+    return load_data().title_index.find_one(title)
 
 
 # Gibt alle Buchinformationen zu einer bestimmten ISBN-Nummer zurück
 def get_book_by_isbn(isbn):
-    return books_df[books_df["isbn13"] == isbn].to_dict(orient="records")
+    return load_data().isbn_index.records(isbn)
 
 
-# Prüft, ob ein Buch mit einem bestimmten Titel in der Datenbank vorhanden ist
+# Prüft, ob ein Buch mit einem bestimmten Titel in der Datenbank vorhanden ist.
+# Nur exakte Treffer und Teilstrings zählen als vorhanden; unscharfe Treffer (Tippfehler) kommen
+# als "suggestions" mit exists=False zurück, damit GPT nachfragen kann statt ein anderes Buch zu nennen.
 def is_book_in_library(title: str):
-    matches = books_df[books_df["title"].str.lower().str.contains(title.lower(), na=False)]
-    if not matches.empty:
-        books = []
-        for _, book in matches.iterrows():
-            books.append({
-                "isbn13": book["isbn13"] if pd.notna(book["isbn13"]) else "unbekannt",
-                "medium_id": book["medium_id"],
-                "title": book["title"],
-                "authors": book["author_list"],
-                "bildlink": book["bildlink"],
-                "description": book["description"]
-            })
-        return {"exists": True, "results": books}
+    data = load_data()
+    rows, match = data.title_index.find_all(title)
+    books = []
+    for book in data.books_df.iloc[rows].to_dict(orient="records"):
+        books.append({
+            "isbn13": book["isbn13"] if pd.notna(book["isbn13"]) else "unbekannt",
+            "medium_id": book["medium_id"],
+            "title": book["title"],
+            "authors": book["author_list"],
+            "bildlink": book["bildlink"],
+            "description": book["description"]
+        })
+    if match == "fuzzy":
+        # Für "Meinten Sie ...?" genügen Titel und Autor; die Beschreibung kostet nur Tokens
+        suggestions = [{key: value for key, value in book.items() if key != "description"} for book in books]
+        return {"exists": False, "match": "fuzzy", "results": [], "suggestions": suggestions}
+    if books:
+        return {"exists": True, "match": match, "results": books}
     return {"exists": False, "results": []}
 
 
+# Top-N inhaltlich ähnliche Buchzeilen (ohne sich selbst): direkt aus der Tabelle, nur bei grossem top_n live suchen
+def _similar_rows(data, idx, top_n):
+    found = data.similar_books.lookup(idx, top_n) if data.similar_books is not None else None
+    if found is None:
+        found = data.book_index.search(data.book_index.vector(idx), top_n, exclude=idx)
+    return found
+
+
+# Top-N Co-Reads als (ISBN, Anzahl): erst aus der vorberechneten Tabelle, sonst live mit dem Co-Read-Index
+def _co_reads(data, isbn, top_n):
+    counts = data.co_read_neighbors.most_common(isbn, top_n) if data.co_read_neighbors is not None else None
+    if counts is None:
+        counts = data.co_read_index.most_common(isbn, top_n)
+    return counts
+
+
+
 # --------------------------
 # FUNKTION 1: Ähnliche Bücher finden
 # --------------------------
 
 # Findet Bücher, die inhaltlich einem gegebenen Titel ähneln
 def find_similar_books_by_title(title: str, top_n: int = 8):
-    print(f"🔎 Searching similar books for title: {title}")
     try:
+        data = load_data()
         idx = get_book_index_by_title(title)
         if idx is None:
-            print(f"❌ No book found with title '{title}'")
             return [{"error": f"No book found with title '{title}'."}]
 
-        print(f"✅ Found book index: {idx}")
-        query_emb = book_embeddings[idx].reshape(1, -1)
-        print(f"✅ Query embedding shape: {query_emb.shape}")
+        top_idxs, scores = _similar_rows(data, idx, top_n)
+        pick = np.random.choice(len(top_idxs), min(5, len(top_idxs)), replace=False)
+        top_idxs, scores = top_idxs[pick], scores[pick]
 
-        similarities = cosine_similarity(query_emb, book_embeddings).flatten()
-        print(f"✅ Similarity scores calculated. Shape: {similarities.shape}")
-
-        # Top-N ähnliche (ohne sich selbst)
-        top_idxs = similarities.argsort()[-(top_n + 1):][::-1]
-        top_idxs = [i for i in top_idxs if i != idx][:top_n]
-        top_idxs = np.random.choice(top_idxs, 5, replace=False)
-        print(f"✅ Top indices: {top_idxs}")
-
-        results = books_df.iloc[top_idxs][["isbn13", "medium_id", "title", "description", "author_list"]].copy()
-        results["similarity_score"] = similarities[top_idxs]
-        print(f"✅ Results found: {results.shape[0]} books")
+        results = data.books_df.iloc[top_idxs][["isbn13", "medium_id", "title", "description", "author_list"]].copy()
+        results["similarity_score"] = scores
         return results.to_dict(orient="records")
     except Exception as e:
-        print(f"❌ ERROR in find_similar_books_by_title: {e}")
+        tracing.record_error(e)  # landet im Span des Tool-Aufrufs
         return []
 
 
@@ -122,23 +189,36 @@ def find_similar_books_by_title(title: str, top_n: int = 8):
 
 # Findet Bücher basierend auf eingegebenen Stichwörtern (z.B. "magic school")
 def find_books_by_keyword(keywords: str, top_n: int = 5):
-    print(f'KWS: {keywords}')
     try:
-        print("Step 1: Encoding keywords...")
-        user_emb = model.encode([keywords])
-        print("Step 2: Calculating similarities...")
-        similarities = cosine_similarity(user_emb, book_embeddings).flatten()
-        print("Step 3: Sorting results...")
-        top_idxs = similarities.argsort()[-top_n:][::-1]
-        results = books_df.iloc[top_idxs][["isbn13", "medium_id", "title", "author_list", "bildlink"]].copy()
-        results["similarity_score"] = similarities[top_idxs]
-        print(f'RES: {results.to_dict(orient="records")}')
+        data = load_data()
+        user_emb = load_query_cache().get(keywords)
+        top_idxs, scores = data.book_index.search(user_emb, top_n)
+        results = data.books_df.iloc[top_idxs][["isbn13", "medium_id", "title", "author_list", "bildlink"]].copy()
+        results["similarity_score"] = scores
         return results.to_dict(orient="records")
     except Exception as e:
-        print(f"❌ ERROR in find_books_by_keyword: {e}")
+        tracing.record_error(e)
         return []
 
 
+# Mehrere Stichwort-Suchen auf einmal: ein model.encode-Aufruf für alle noch nicht gecachten Texte
+def find_books_by_keywords(keywords_list, top_n: int = 5):
+    data = load_data()
+    user_embs = load_query_cache().get_many(keywords_list)
+    top_idxs, scores = data.book_index.search_batch(user_embs, top_n)
+    all_results = []
+    for idxs, row_scores in zip(top_idxs, scores):
+        results = data.books_df.iloc[idxs][["isbn13", "medium_id", "title", "author_list", "bildlink"]].copy()
+        results["similarity_score"] = row_scores
+        all_results.append(results.to_dict(orient="records"))
+    return all_results
+
+
+# Treffer-/Fehlzugriffe des Embedding-Caches, z.B. um die Grösse anzupassen
+def query_cache_stats():
+    return load_query_cache().stats()
+
+
 # --------------------------
 # FUNKTION 2: Co-Reads (gemeinschaftlich gelesene Bücher)
 # --------------------------
@@ -146,83 +226,125 @@ def find_books_by_keyword(keywords: str, top_n: int = 5):
 # Empfiehlt Bücher, die von denselben Nutzern wie ein bestimmtes Buch gelesen wurden
 def recommend_by_shared_reads(isbn: str, top_n: int = 5):
     isbn = int(isbn)
+    data = load_data()
 
-    #print('Suche für: ', isbn)
-    # Filtere Nutzer, die dieses Buch gelesen haben
-    #relevant_users = user_df[user_df["books"].apply(lambda books: isbn in books)]
-    relevant_users = user_df[user_df["books"].apply(lambda books: isinstance(books, list) and isbn in books)]
-
-    #print('relevant_users')
-    #print(relevant_users)
-
-
-    # Sammle alle anderen Bücher, die diese Nutzer auch gelesen haben
-    co_read = []
-    for books in relevant_users["books"]:
-        co_read.extend([b for b in books if b != isbn])
-
-    if not co_read:
+    counts = _co_reads(data, isbn, top_n)
+    if not counts:
         return [{"info": "No Co-Reads found."}]
 
-    # Zähle, welche Bücher am häufigsten gemeinsam gelesen wurden
-    counts = Counter(co_read).most_common(top_n)
-    isbns = [int(b) for b, _ in counts]
-
-    #print('isbns')
-    #print(isbns)
+    isbns = [b for b, _ in counts]
 
     # Hole Infos zu den meistgelesenen gemeinsamen Büchern
-    result = books_df[books_df["isbn13"].isin(isbns)][["isbn13", "medium_id", "title", "author_list"]].copy()
+    result = data.books_df.iloc[sorted(data.isbn_index.rows_for(isbns))][["isbn13", "medium_id", "title", "author_list"]].copy()
     result["co_read_count"] = result["isbn13"].map(dict(counts))
     return result.sort_values("co_read_count", ascending=False).to_dict(orient="records")
 
 
+# --------------------------
+# FUNKTION 2B: Ähnliche Bücher und Co-Reads in einem Aufruf
+# --------------------------
+
+FUSION_CANDIDATES = 20  # Kandidaten pro Signal
+RRF_K = 60              # Dämpfung der Reciprocal Rank Fusion (übliche Wahl)
+
+
+# Für "Bücher wie X": Titel auflösen, inhaltlich ähnliche Bücher und Co-Reads bestimmen und zu einer
+# Rangliste zusammenführen (Reciprocal Rank Fusion, je ISBN nur einmal). Ersetzt die Kette
+# is_book_in_library → find_similar_books_by_title / recommend_by_shared_reads, also mehrere GPT-Runden.
+def recommend_books_like_title(title: str, top_n: int = 5):
+    data = load_data()
+    idx = get_book_index_by_title(title)
+    if idx is None:
+        return {"found": False, "info": f"No book found with title '{title}'.", "recommendations": []}
+
+    isbn = int(data.books_df["isbn13"].iat[idx])
+    fused = {}  # ISBN → Eintrag mit Zeile, Score und Herkunft
+
+    def add(row, rank, source, **details):
+        candidate_isbn = int(data.books_df["isbn13"].iat[row])
+        if candidate_isbn == isbn:
+            return  # das Ausgangsbuch selbst (auch als weitere Ausgabe mit gleicher ISBN)
+        entry = fused.setdefault(candidate_isbn, {"row": row, "score": 0.0, "sources": []})
+        entry["score"] += 1.0 / (RRF_K + rank)
+        entry["sources"].append(source)
+        entry.update(details)
+
+    rows, scores = _similar_rows(data, idx, FUSION_CANDIDATES)
+    for rank, (row, score) in enumerate(zip(rows.tolist(), scores.tolist()), 1):
+        add(row, rank, "content", similarity_score=round(score, 4))
+    for rank, (co_isbn, count) in enumerate(_co_reads(data, isbn, FUSION_CANDIDATES), 1):
+        row = data.isbn_index.first(co_isbn)
+        if row is not None:
+            add(row, rank, "co_read", co_read_count=count)
+
+    columns = ["isbn13", "medium_id", "title", "author_list"]
+    ranked = sorted(fused.values(), key=lambda entry: -entry["score"])[:top_n]
+    records = data.books_df.iloc[[entry.pop("row") for entry in ranked]][columns].to_dict(orient="records")
+    recommendations = []
+    for record, entry in zip(records, ranked):
+        entry["based_on"] = " + ".join(entry.pop("sources"))
+        entry["score"] = round(entry["score"], 5)
+        recommendations.append({**record, **entry})
+
+    return {
+        "found": True,
+        "book": data.books_df.iloc[[idx]][columns].to_dict(orient="records")[0],
+        "recommendations": recommendations,
+    }
+
+
 # --------------------------
 # FUNKTION 3: Autorensuche
 # --------------------------
 
 # Findet Bücher basierend auf einem eingegebenen Autorennamen
 def find_books_by_author(author: str, top_n: int = 5):
-    # Vor- und Nachnamen extrahieren
-    parts = author.lower().split()
-    if len(parts) < 2:
-        print("Bitte vollständigen Namen (Vorname Nachname) angeben.")
+    # Alle Namensteile (Vor- und/oder Nachname) müssen als ganze Wörter vorkommen
+    if not author.split():
         return [{"info": "Ungültiger Autorenname."}]
 
-    first_name, last_name = parts[0], parts[1]
-
-    # Beide Namen müssen im String vorkommen
-    matches = books_df[
-        books_df["author_list"].str.lower().str.contains(first_name) &
-        books_df["author_list"].str.lower().str.contains(last_name)
-        ]
-
-    if matches.empty:
+    data = load_data()
+    rows = data.author_index.find(author)
+    if not rows:
         return [{"info": f"No match for author '{author}'."}]
 
+    matches = data.books_df.iloc[rows]
     matches = matches[["medium_id", "isbn13", "title", "author_list", "bildlink"]].head(top_n)
     return matches.to_dict(orient="records")
 
 
 # --------------------------
-# FUNKTION 4: verfügbare Bücher
+# FUNKTION 3B: Persönliche Empfehlungen
 # --------------------------
 
-# Findet Verfügbarkeitsstatus eines Buches
-def scrape_verfuegbarkeit(medium_id):
+# Empfiehlt einem Nutzer Bücher passend zu seiner ganzen Ausleihhistorie (vorberechnet, nur ein Lookup).
+# Für GPT als Tool "recommend_for_me" ohne Parameter: die user_id setzt chat_engine aus der
+# angemeldeten Session ein (ChatMemory.user_id), sie kommt nie aus dem Chat.
+# Unbekannte Nutzer und Nutzer ohne Empfehlungen bekommen dieselbe Antwort, damit sich nicht
+# herausfinden lässt, welche Ausweisnummern es gibt.
+def recommend_for_user(user_id: str, top_n: int = 5):
+    if not user_id:
+        return [{"info": "Personal recommendations need a signed-in library account."}]
+    data = load_data()
+    found = data.user_recommendations.lookup(user_id, top_n) if data.user_recommendations is not None else None
+    if found is None or len(found[0]) == 0:
+        return [{"info": "Personal recommendations are currently not available."}]
+    rows, scores = found
+
+    results = data.books_df.iloc[rows][["isbn13", "medium_id", "title", "author_list", "bildlink"]].copy()
+    results["score"] = scores
+    return results.to_dict(orient="records")
 
-    url = f"https://seengen.biblioweb.ch/medium/status/{medium_id}"
-    headers = {"User-Agent": "Mozilla/5.0"}
 
-    try:
-        response = requests.post(url, headers=headers, timeout=5)
-        response.raise_for_status()
+# --------------------------
+# FUNKTION 4: verfügbare Bücher
+# --------------------------
+
+# Findet Verfügbarkeitsstatus eines Buches (gepoolte Verbindung + prozessweiter Cache, siehe availability.py)
+def scrape_verfuegbarkeit(medium_id):
+    return get_availability_service().get(medium_id)
 
-        status_data = response.json()
-        status_text = status_data["ausleihstatus"]["status"]
-        return status_text
 
-    except (requests.RequestException, KeyError, ValueError) as e:
-        print(f"Fehler bei medium_id {medium_id}: {e}")
-        return None
-# --------------------------
+# Verfügbarkeit mehrerer Bücher auf einmal (parallel abgefragt): medium_id → Status oder None
+def scrape_verfuegbarkeiten(medium_ids):
+    return get_availability_service().get_many(medium_ids)
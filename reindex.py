@@ -0,0 +1,159 @@
+# reindex.py
+
+# Baut book_embeddings.npy inkrementell neu auf.
+# Die Embeddings sind zeilengleich mit filtered_books.csv (Zeile i = Buch i). Zu jeder Zeile wird
+# der SHA-1 ihres description_clean in einem Manifest neben der .npy-Datei festgehalten
+# (book_embeddings.manifest.json). Beim nächsten Lauf werden nur Zeilen mit neuem oder geändertem
+# Text mit dem SentenceTransformer kodiert; alle anderen Vektoren werden aus der alten Datei
+# übernommen (auch wenn sich die Zeilen verschoben haben). Die neue Datei wird atomar ersetzt.
+#
+#   python reindex.py             (nur neue/geänderte Bücher kodieren)
+#   python reindex.py --adopt     (vorhandene Datei ohne Kodieren übernehmen, nur Manifest schreiben)
+#   python reindex.py --full      (alles neu kodieren, z.B. nach einem Modellwechsel)
+#
+# recommender.py prüft beim Laden mit check_embeddings(), ob Datei, Manifest und Buchtabelle zusammenpassen.
+
+import hashlib
+import json
+import os
+
+import numpy as np  # für numerische Operationen (z.B. Matrizen)
+
+from catalog import DATA_DIR, EMBEDDING_MODEL, EMBEDDINGS_FILE, file_sha1, load_catalog
+
+MANIFEST_FILE = "book_embeddings.manifest.json"
+TEXT_COLUMN = "description_clean"
+ENCODE_CHUNK = 4096  # Texte pro encode()-Aufruf; der Zwischenspeicher bleibt so begrenzt
+BATCH_SIZE = 256     # Batch-Grösse innerhalb des Modells
+
+
+# SHA-1 des kodierten Textes pro Buchzeile
+def text_hashes(books_df):
+    texts = books_df[TEXT_COLUMN].fillna("").astype(str)
+    return [hashlib.sha1(text.encode("utf-8")).hexdigest() for text in texts]
+
+
+def read_manifest(data_dir=DATA_DIR):
+    try:
+        with open(os.path.join(data_dir, MANIFEST_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+# Vergleicht Embeddings, Manifest und Buchtabelle.
+# Unterschiedliche Zeilenzahlen sind ein Fehler (die Zuordnung Buch → Vektor wäre falsch),
+# alles andere wird als Warnung zurückgegeben. Ohne Manifest wird nur die Zeilenzahl geprüft.
+def check_embeddings(catalog):
+    n_books, n_rows = len(catalog.books_df), len(catalog.embeddings)
+    if n_rows != n_books:
+        raise ValueError(
+            f"{EMBEDDINGS_FILE} hat {n_rows} Zeilen, die Buchtabelle {n_books} – bitte 'python reindex.py' ausführen."
+        )
+
+    manifest = read_manifest(os.path.dirname(catalog.paths["embeddings"]))
+    if manifest is None:
+        return []
+
+    warnings = []
+    if manifest["embeddings_sha1"] != catalog.source_hashes["embeddings"]:
+        warnings.append(f"{EMBEDDINGS_FILE} wurde ausserhalb von reindex.py geändert")
+    if manifest["model"] != EMBEDDING_MODEL:
+        warnings.append(f"Embeddings stammen von {manifest['model']}, Anfragen werden mit {EMBEDDING_MODEL} kodiert")
+    # Schneller Weg: unveränderte Buchtabelle, dann passen auch die Texte
+    if manifest["books_sha1"] != catalog.source_hashes["books"]:
+        stale = sum(a != b for a, b in zip(text_hashes(catalog.books_df), manifest["text_sha1"]))
+        stale += abs(n_books - len(manifest["text_sha1"]))
+        if stale:
+            warnings.append(f"{stale} Bücher haben veraltete Embeddings")
+    return warnings
+
+
+# Kodiert nur neue oder geänderte Texte und schreibt die zeilengleiche Datei samt Manifest neu.
+# Rückgabe: (Anzahl kodierter Texte, Anzahl übernommener Zeilen)
+def reindex(data_dir=DATA_DIR, model=None, batch_size=BATCH_SIZE, full=False, adopt=False):
+    catalog = load_catalog(data_dir)
+    paths = {
+        "embeddings": catalog.paths["embeddings"],
+        "manifest": os.path.join(data_dir, MANIFEST_FILE),
+    }
+    hashes = text_hashes(catalog.books_df)
+    old = catalog.embeddings
+    manifest = read_manifest(data_dir)
+
+    if adopt:
+        if len(old) != len(hashes):
+            raise ValueError(f"{EMBEDDINGS_FILE} hat {len(old)} Zeilen, die Buchtabelle {len(hashes)}; --adopt nicht möglich")
+        _write_manifest(paths["manifest"], hashes, catalog.source_hashes["embeddings"], catalog.source_hashes["books"])
+        return 0, len(hashes)
+
+    # Text-Hash → Zeile in der alten Datei (nur, wenn das Manifest zu genau dieser Datei gehört)
+    known = {}
+    if (not full and manifest is not None and manifest["model"] == EMBEDDING_MODEL
+            and manifest["embeddings_sha1"] == catalog.source_hashes["embeddings"]):
+        known = {sha1: row for row, sha1 in enumerate(manifest["text_sha1"]) if row < len(old)}
+
+    reuse = np.array([known.get(sha1, -1) for sha1 in hashes], dtype=np.int64)
+    missing = np.flatnonzero(reuse < 0)
+    # Gleiche Texte nur einmal kodieren
+    unique_hashes, first, inverse = np.unique(np.asarray(hashes)[missing], return_index=True, return_inverse=True)
+    texts = catalog.books_df[TEXT_COLUMN].fillna("").astype(str).to_numpy()[missing[first]].tolist()
+    print(f"🔎 {len(hashes)} Bücher: {len(hashes) - len(missing)} unverändert, {len(unique_hashes)} Texte zu kodieren")
+
+    if texts and model is None:
+        from sentence_transformers import SentenceTransformer  # erst hier, zieht torch nach
+        model = SentenceTransformer(EMBEDDING_MODEL)
+
+    encoded = []
+    for start in range(0, len(texts), ENCODE_CHUNK):
+        chunk = texts[start:start + ENCODE_CHUNK]
+        encoded.append(np.asarray(model.encode(chunk, batch_size=batch_size), dtype=np.float32))
+        print(f"   {start + len(chunk)}/{len(texts)} kodiert")
+    dim = encoded[0].shape[1] if encoded else old.shape[1]
+    if len(known) and dim != old.shape[1]:
+        raise ValueError(f"Modell liefert {dim} Dimensionen, {EMBEDDINGS_FILE} hat {old.shape[1]}; bitte --full verwenden")
+
+    # Neue Datei neben der alten aufbauen und erst am Schluss austauschen
+    tmp_path = paths["embeddings"] + ".tmp"
+    out = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=(len(hashes), dim))
+    kept = np.flatnonzero(reuse >= 0)
+    out[kept] = old[reuse[kept]]
+    if encoded:
+        out[missing] = np.concatenate(encoded)[inverse]
+    out.flush()
+    del out
+    os.replace(tmp_path, paths["embeddings"])
+
+    _write_manifest(paths["manifest"], hashes, file_sha1(paths["embeddings"]), catalog.source_hashes["books"])
+    return len(texts), len(kept)
+
+
+# Manifest zuletzt schreiben: erst dann gilt die neue Datei als vollständig
+def _write_manifest(path, hashes, embeddings_sha1, books_sha1):
+    manifest = {
+        "model": EMBEDDING_MODEL,
+        "column": TEXT_COLUMN,
+        "rows": len(hashes),
+        "embeddings_sha1": embeddings_sha1,
+        "books_sha1": books_sha1,
+        "text_sha1": hashes,
+    }
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(path + ".tmp", path)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Kodiert neue oder geänderte Bücher und aktualisiert book_embeddings.npy.")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Batch-Grösse für model.encode")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--full", action="store_true", help="Alle Bücher neu kodieren")
+    group.add_argument("--adopt", action="store_true",
+                       help="Vorhandene Datei unverändert übernehmen und nur das Manifest schreiben")
+    args = parser.parse_args()
+
+    n_encoded, n_kept = reindex(args.data_dir, batch_size=args.batch_size, full=args.full, adopt=args.adopt)
+    print(f"✅ {n_encoded} Texte kodiert, {n_kept} Zeilen übernommen: {os.path.join(args.data_dir, EMBEDDINGS_FILE)}")
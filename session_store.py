@@ -0,0 +1,209 @@
+# session_store.py
+
+# Speicher für die Chat-Sessions (ChatMemory + Anzeige-Runden der Oberfläche).
+# Statt alles in st.session_state zu halten, liegen die Sessions in einer lokalen SQLite-Datei:
+# - kompakt: JSON ohne Leerzeichen, mit zlib komprimiert, eine Zeile pro Session
+# - im Speicher nur die zuletzt benutzten Sessions (LRU, höchstens max_hot); ältere werden
+#   verdrängt und bei Bedarf wieder aus der Datei geladen
+# - nach jeder Runde gespeichert, damit ein Neustart des Workers keinen Verlauf verliert
+# - Sessions, die länger als max_age_days nicht benutzt wurden, werden beim Öffnen gelöscht
+# SQLite im WAL-Modus verträgt mehrere Worker-Prozesse auf derselben Datei. Damit sich die Worker
+# nicht gegenseitig überschreiben, hat jede Zeile eine Versionsnummer:
+# - get() prüft sie auch für Sessions im Speicher und lädt neu, wenn ein anderer Worker gespeichert hat
+# - save() schreibt nur, wenn die Version noch die beim Laden ist (compare-and-set); sonst wird die
+#   neuere Fassung geladen, die eigenen Änderungen werden eingefügt und es wird erneut versucht
+
+import copy
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from chat_engine import ChatMemory
+
+SESSION_DB_PATH = os.environ.get("LIBBY_SESSION_DB", "./00_data/sessions.sqlite3")
+MAX_HOT_SESSIONS = 256  # Sessions im Speicher
+MAX_AGE_DAYS = 30       # unbenutzte Sessions werden danach gelöscht
+MAX_SAVE_ATTEMPTS = 5   # Versuche, wenn andere Worker gleichzeitig dieselbe Session speichern
+
+
+class Session:
+    def __init__(self, memory=None, turns=None):
+        self.memory = memory or ChatMemory()  # Verlauf für GPT
+        self.turns = turns or []              # fertige Anzeige-Pakete (siehe lit_libby.build_turn)
+        self.version = 0                      # Version in der Datei beim Laden/Speichern (0 = nicht gespeichert)
+        self.base = self.snapshot()           # Stand zu dieser Version, siehe merge_into
+
+    def to_dict(self):
+        # Verfügbarkeit als Liste von Paaren: JSON-Schlüssel wären sonst Strings statt medium_ids
+        turns = [dict(turn, availability=list(turn["availability"].items())) for turn in self.turns]
+        return {"memory": self.memory.to_dict(), "turns": turns}
+
+    @classmethod
+    def from_dict(cls, data):
+        turns = [dict(turn, availability=dict(turn["availability"])) for turn in data["turns"]]
+        return cls(ChatMemory.from_dict(data["memory"]), turns)
+
+    # Stand beim Laden/Speichern, gegen den merge_into die eigenen Änderungen erkennt
+    def snapshot(self):
+        history = self.memory.message_history
+        return len(self.turns), copy.deepcopy(history[-1]) if history else None
+
+    # Übernimmt die neuere Fassung eines anderen Workers (theirs) und fügt die eigenen Änderungen
+    # seit `base` ein: neue Runden anhängen, neuere Verfügbarkeit übernehmen, und die Nachrichten
+    # der eigenen letzten Runde anhängen (gespeichert wird nach jeder Runde, also höchstens eine)
+    def merge_into(self, theirs, base):
+        base_turns, base_last = base
+        turns = theirs.turns
+        for i, turn in enumerate(self.turns[:min(base_turns, len(turns))]):
+            if (turn["checked_at"] or 0) > (turns[i]["checked_at"] or 0):
+                turns[i] = dict(turns[i], availability=turn["availability"], checked_at=turn["checked_at"])
+        turns.extend(self.turns[base_turns:])
+
+        memory, history = theirs.memory, self.memory.message_history
+        if history and history[-1] != base_last:
+            start = max((i for i, m in enumerate(history) if m.get("role") == "user"), default=0)
+            memory.message_history.extend(history[start:])
+            memory.last_book_title = self.memory.last_book_title
+            memory.last_book_info = self.memory.last_book_info
+            memory.last_tool_used = self.memory.last_tool_used
+        memory.user_id = self.memory.user_id  # nicht gespeichert, gehört zur laufenden Anfrage
+        self.memory, self.turns = memory, turns
+
+
+# numpy-Zahlen (z.B. aus Buchdatensätzen) als Python-Zahlen, alles andere als Text
+def _json_default(value):
+    return value.item() if hasattr(value, "item") else str(value)
+
+
+def encode_session(session):
+    text = json.dumps(session.to_dict(), default=_json_default, ensure_ascii=False, separators=(",", ":"))
+    return zlib.compress(text.encode("utf-8"))
+
+
+def decode_session(blob):
+    return Session.from_dict(json.loads(zlib.decompress(blob).decode("utf-8")))
+
+
+class SessionStore:
+    def __init__(self, path=SESSION_DB_PATH, max_hot=MAX_HOT_SESSIONS, max_age_days=MAX_AGE_DAYS):
+        self.path = path
+        self.max_hot = max_hot
+        self._hot = OrderedDict()  # session_id → Session, zuletzt benutzte hinten
+        self._lock = threading.Lock()
+        self.hits = 0       # aus dem Speicher
+        self.loads = 0      # aus der Datei nachgeladen
+        self.conflicts = 0  # Speichern nach einer Änderung durch einen anderen Worker
+
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, data BLOB NOT NULL, updated REAL NOT NULL,"
+            " version INTEGER NOT NULL DEFAULT 1)"
+        )
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(sessions)")}
+        if "version" not in columns:  # Datei aus einer Version ohne Versionsnummern: alle Zeilen → 1
+            self._db.execute("ALTER TABLE sessions ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+        if max_age_days:
+            self._db.execute("DELETE FROM sessions WHERE updated < ?", (time.time() - max_age_days * 86400,))
+        self._db.commit()
+
+    def __len__(self):
+        return len(self._hot)
+
+    # Session zur ID; aus dem Speicher, wenn dort die aktuelle Version liegt, sonst aus der Datei, sonst neu
+    def get(self, session_id):
+        with self._lock:
+            session = self._hot.get(session_id)
+            row = self._db.execute("SELECT version FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            if session is not None and session.version == (row[0] if row is not None else 0):
+                self._hot.move_to_end(session_id)
+                self.hits += 1
+                return session
+            session = self._read(session_id)
+            self._hot[session_id] = session
+            self._hot.move_to_end(session_id)
+            if session.version:
+                self.loads += 1
+            self._evict()
+        return session
+
+    # Liest eine Session aus der Datei (Aufruf nur mit Lock); neue Session, wenn es keine gibt
+    def _read(self, session_id):
+        row = self._db.execute("SELECT data, version FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        if row is None:
+            return Session()
+        try:
+            session = decode_session(row[0])
+        except (zlib.error, ValueError, KeyError, TypeError) as e:
+            print(f"⚠️ Session {session_id} unlesbar, beginne neu: {e}")
+            session = Session()
+        session.version = row[1]
+        return session
+
+    # Schreibt eine Session in die Datei (nach jeder Runde aufrufen). Hat ein anderer Worker sie
+    # seit dem Laden gespeichert, wird dessen Fassung übernommen und die eigene Runde eingefügt.
+    def save(self, session_id, session):
+        with self._lock:
+            for _ in range(MAX_SAVE_ATTEMPTS):
+                if self._write(session_id, session, session.version):
+                    self._db.commit()
+                    session.version += 1
+                    session.base = session.snapshot()
+                    self._hot[session_id] = session
+                    self._hot.move_to_end(session_id)
+                    self._evict()
+                    return
+                self._db.commit()
+                self.conflicts += 1
+                theirs = self._read(session_id)
+                session.merge_into(theirs, session.base)
+                session.version, session.base = theirs.version, theirs.base
+            raise RuntimeError(f"Session {session_id} konnte wegen gleichzeitiger Änderungen nicht gespeichert werden")
+
+    # Compare-and-set: schreibt nur, wenn die Zeile noch `version` hat (0 = noch nicht vorhanden)
+    def _write(self, session_id, session, version):
+        blob, now = encode_session(session), time.time()
+        if version:
+            cursor = self._db.execute(
+                "UPDATE sessions SET data = ?, updated = ?, version = version + 1 WHERE id = ? AND version = ?",
+                (blob, now, session_id, version),
+            )
+            return cursor.rowcount == 1
+        try:
+            self._db.execute(
+                "INSERT INTO sessions (id, data, updated, version) VALUES (?, ?, ?, 1)", (session_id, blob, now)
+            )
+            return True
+        except sqlite3.IntegrityError:  # ein anderer Worker hat sie inzwischen angelegt
+            return False
+
+    def delete(self, session_id):
+        with self._lock:
+            self._hot.pop(session_id, None)
+            self._db.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+            self._db.commit()
+
+    def _evict(self):
+        while len(self._hot) > self.max_hot:
+            self._hot.popitem(last=False)  # steht schon in der Datei
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_default_store = None
+_default_lock = threading.Lock()
+
+
+# Prozessweit geteilter Speicher (eine Datenbankverbindung und ein LRU für alle Sessions)
+def get_session_store():
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = SessionStore()
+        return _default_store
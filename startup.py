@@ -0,0 +1,69 @@
+# startup.py
+
+# Startzeit-Messung und optionales Vorwärmen.
+# Modell, Datensätze und OpenAI-Client werden erst beim ersten Gebrauch geladen (siehe
+# recommender.load_model / recommender.load_data / chat_engine.get_client). Wer die Kosten
+# lieber beim Prozessstart bezahlt, ruft warm_up() auf. Jede Initialisierung wird mit
+# record() gemessen; format_report() zeigt, welche Komponente wie lange gebraucht hat.
+
+import importlib
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+timings = {}  # Komponente → Sekunden (Reihenfolge = Reihenfolge der Initialisierung)
+_lock = threading.Lock()
+
+# Schwere Bibliotheken, deren Importzeit im Bericht separat ausgewiesen wird
+HEAVY_IMPORTS = ["numpy", "pandas", "scipy.sparse", "streamlit", "openai", "sentence_transformers"]
+
+
+# Misst die Dauer eines Blocks und legt sie unter `name` ab
+@contextmanager
+def record(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        with _lock:
+            timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
+
+
+# Importiert ein Modul und misst die Zeit (0 s, wenn es schon geladen war)
+def timed_import(module_name):
+    already_loaded = module_name in sys.modules
+    with record(f"import {module_name}"):
+        module = importlib.import_module(module_name)
+    if already_loaded:
+        with _lock:
+            timings[f"import {module_name}"] = 0.0
+    return module
+
+
+# Lädt die gewünschten Komponenten sofort statt beim ersten Gebrauch
+def warm_up(model=True, data=True, client=True):
+    for module_name in HEAVY_IMPORTS:
+        timed_import(module_name)
+
+    recommender = timed_import("recommender")
+    if data:
+        recommender.load_data()
+    if model:
+        recommender.load_model()
+    if client:
+        timed_import("chat_engine").get_client()
+    return dict(timings)
+
+
+# Tabelle der gemessenen Zeiten, teuerste Komponente zuerst
+def format_report():
+    with _lock:
+        items = sorted(timings.items(), key=lambda item: item[1], reverse=True)
+    if not items:
+        return "⏱️ Noch keine Startzeiten gemessen."
+    width = max(len(name) for name, _ in items)
+    lines = ["⏱️ Startzeiten:"]
+    lines += [f"   {name:<{width}}  {seconds * 1000:9.1f} ms" for name, seconds in items]
+    lines.append(f"   {'Total':<{width}}  {sum(s for _, s in items) * 1000:9.1f} ms")
+    return "\n".join(lines)
@@ -0,0 +1,120 @@
+# tests/test_availability.py
+
+# AvailabilityService gegen den lokalen Fake-Server (benchmarks/fake_availability_server.py):
+# parallele Abfragen, gemeinsame laufende Abfragen, TTL, negatives Caching und stale-while-revalidate.
+# Die Zeiten sind kurz gewählt, aber mit genug Abstand zu den Grenzen.
+
+import threading
+import time
+
+import pytest
+
+from availability import AvailabilityService
+from benchmarks.fake_availability_server import FakeAvailabilityServer
+
+
+@pytest.fixture
+def server():
+    server = FakeAvailabilityServer().start()
+    yield server
+    server.stop()
+
+
+def make_service(server, **options):
+    return AvailabilityService(base_url=server.base_url, timeout=2, **options)
+
+
+# Wartet, bis keine Abfrage (auch keine Aktualisierung im Hintergrund) mehr läuft
+def wait_idle(service, timeout=5):
+    deadline = time.monotonic() + timeout
+    while service._inflight:
+        assert time.monotonic() < deadline, "Abfragen laufen immer noch"
+        time.sleep(0.01)
+
+
+def test_fetches_in_parallel(server):
+    server.latency = 0.3
+    service = make_service(server, max_workers=8)
+    start = time.monotonic()
+    results = service.get_many(range(1, 7))
+    elapsed = time.monotonic() - start
+
+    assert results == {i: "Verfügbar" for i in range(1, 7)}
+    assert elapsed < 1.0  # nacheinander wären es 1.8 s
+    assert server.max_in_flight > 1
+
+
+def test_shares_inflight_fetch(server):
+    server.latency = 0.3
+    service = make_service(server)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(service.get(7))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    results.append(service.get_many([7, 7, "7"])[7])
+    for thread in threads:
+        thread.join()
+
+    assert results == ["Verfügbar"] * 6
+    assert server.requests[7] == 1
+
+
+def test_fresh_entries_come_from_cache(server):
+    service = make_service(server, ttl=0.3, stale_ttl=0.3)
+    assert service.get(1) == "Verfügbar"
+    server.status = "Ausgeliehen"
+    assert service.get(1) == "Verfügbar"
+    assert server.requests[1] == 1
+
+    time.sleep(0.4)  # abgelaufen und zu alt zum Weiterliefern → neu abfragen
+    assert service.get(1) == "Ausgeliehen"
+    assert server.requests[1] == 2
+
+
+def test_errors_are_cached_briefly(server):
+    server.status = None
+    service = make_service(server, negative_ttl=0.3)
+    assert service.get(2) is None
+    assert service.get(2) is None
+    assert server.requests[2] == 1
+
+    server.status = "Verfügbar"
+    time.sleep(0.4)
+    assert service.get(2) == "Verfügbar"
+    assert server.requests[2] == 2
+
+
+def test_stale_value_is_served_while_revalidating(server):
+    service = make_service(server, ttl=0.2, stale_ttl=60)
+    assert service.get(3) == "Verfügbar"
+
+    server.status, server.latency = "Ausgeliehen", 0.3
+    time.sleep(0.3)
+    start = time.monotonic()
+    assert service.get(3) == "Verfügbar"  # sofort der alte Wert ...
+    assert time.monotonic() - start < 0.2
+    wait_idle(service)
+    assert service.get(3) == "Ausgeliehen"  # ... danach der aktualisierte
+    assert server.requests[3] == 2
+
+
+def test_failed_revalidation_keeps_stale_value(server):
+    service = make_service(server, ttl=0.2, negative_ttl=0.5, stale_ttl=60)
+    assert service.get(4) == "Verfügbar"
+
+    server.status = None
+    time.sleep(0.3)
+    assert service.get(4) == "Verfügbar"
+    wait_idle(service)
+    assert server.requests[4] == 2
+    # Fehlschlag überschreibt den guten Wert nicht, und vor negative_ttl gibt es keinen neuen Versuch
+    assert service.get(4) == "Verfügbar"
+    wait_idle(service)
+    assert server.requests[4] == 2
+
+    server.status = "Ausgeliehen"
+    time.sleep(0.6)
+    assert service.get(4) == "Verfügbar"
+    wait_idle(service)
+    assert service.get(4) == "Ausgeliehen"
+    assert server.requests[4] == 3
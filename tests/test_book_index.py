@@ -0,0 +1,74 @@
+# tests/test_book_index.py
+
+# Titel- und Autorensuche über den Katalog-Indizes: exakte Treffer (auch ohne Serien-Zusatz),
+# Teilstrings, unscharfe Treffer nur als Vorschläge, und Namensteile als ganze Wörter.
+
+from book_index import AuthorIndex, TitleIndex, base_title, normalize_text
+
+TITLES = [
+    "Der kleine Prinz",
+    "Covered Colors (Golden Hearts, Band 2)",
+    "Die Mädchen aus der Fabrik",
+    "Prinz Eisenherz",
+    "Der kleine Prinz: Jubiläumsausgabe",
+]
+AUTHORS = [
+    ["Saint-Exupéry, Antoine de"],
+    ["Moreno, Kim"],
+    ["Adler-Olsen, Jussi", "Moreno, Kim"],
+    ["Foster, Hal"],
+    ["Saint-Exupéry, Antoine de"],
+]
+
+
+def test_normalize_text():
+    assert normalize_text("MÄDCHEN!") == normalize_text("Maedchen") == "maedchen"
+    assert normalize_text("  Café   au lait ") == "cafe au lait"
+    assert base_title("Covered Colors (Golden Hearts, Band 2)") == "covered colors"
+
+
+def test_exact_title():
+    index = TitleIndex(TITLES)
+    assert index.find_exact("der kleine prinz") == 0
+    assert index.find_exact("Die Maedchen aus der Fabrik") == 2
+    assert index.find_exact("Covered Colors") == 1  # ohne Serien-Zusatz
+    assert index.find_exact("Prinz") is None
+
+
+def test_title_contains():
+    index = TitleIndex(TITLES)
+    assert index.find_containing("prinz") == [0, 3, 4]
+    assert index.find_containing("xyz") == []
+    assert index.find_containing("") == []
+    assert index.find_one("Eisenherz") == 3
+    assert index.find_one("Kleine Prinz") == 0
+
+
+def test_find_all_match_kind():
+    index = TitleIndex(TITLES)
+    assert index.find_all("Der kleine Prinz") == ([0, 4], "exact")
+    assert index.find_all("kleine Prinz") == ([0, 4], "contains")
+    assert index.find_all("Quantenphysik") == ([], None)
+
+
+def test_typo_is_only_a_suggestion():
+    index = TitleIndex(TITLES)
+    assert index.find_one("Prinz Eisenhertz") is None
+    rows, match = index.find_all("Prinz Eisenhertz")
+    assert match == "fuzzy" and rows[0] == 3
+
+
+def test_author_tokens():
+    index = AuthorIndex(AUTHORS)
+    assert index.find("Moreno") == [1, 2]
+    assert index.find("Kim Moreno") == index.find("moreno, kim") == [1, 2]
+    assert index.find("Saint-Exupery") == [0, 4]
+    assert index.find("Jussi Adler-Olsen") == [2]
+    assert index.find("Olsen") == [2]
+
+
+def test_author_needs_all_tokens_as_words():
+    index = AuthorIndex(AUTHORS)
+    assert index.find("Hal Moreno") == []
+    assert index.find("More") == []
+    assert index.find("") == []
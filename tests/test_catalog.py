@@ -0,0 +1,59 @@
+# tests/test_catalog.py
+
+# Binärer Katalog-Cache: mehrere Worker, die gleichzeitig kalt starten, dürfen sich beim Schreiben
+# nicht in die Quere kommen; nur einer liest die CSV-Dateien, die anderen den fertigen Cache.
+
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+import catalog
+from catalog import BOOKS_FILE, CACHE_DIR_NAME, DATA_DIR, EMBEDDINGS_FILE, USER_READS_FILE, load_catalog
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Ein Worker: wartet bis zur gemeinsamen Startzeit, lädt den Katalog und meldet, ob er die CSV gelesen hat
+WORKER = """
+import sys, time
+import catalog
+read_csv = catalog._read_csv
+catalog._read_csv = lambda paths: (print("CSV"), read_csv(paths))[1]
+time.sleep(max(0.0, float(sys.argv[2]) - time.time()))
+print(len(catalog.load_catalog(sys.argv[1]).books_df))
+"""
+
+
+def make_data_dir(tmp_path):
+    for name in (BOOKS_FILE, USER_READS_FILE, EMBEDDINGS_FILE):
+        os.symlink(os.path.abspath(os.path.join(ROOT, DATA_DIR, name)), tmp_path / name)
+    return str(tmp_path)
+
+
+def test_concurrent_cold_starts(tmp_path):
+    data_dir = make_data_dir(tmp_path)
+    start = str(time.time() + 2)  # genug Zeit, damit alle Prozesse importiert haben
+    workers = [
+        subprocess.Popen([sys.executable, "-c", WORKER, data_dir, start], cwd=ROOT, stdout=subprocess.PIPE,
+                         stderr=subprocess.PIPE, text=True)
+        for _ in range(6)
+    ]
+    outputs = [worker.communicate(timeout=120) for worker in workers]
+
+    assert all(worker.returncode == 0 for worker in workers), [err for _, err in outputs]
+    assert sum(out.split().count("CSV") for out, _ in outputs) == 1
+    assert len({out.split()[-1] for out, _ in outputs}) == 1
+    assert not [name for name in os.listdir(tmp_path / CACHE_DIR_NAME) if name.endswith(".tmp")]
+
+
+def test_cache_matches_csv(tmp_path):
+    data_dir = make_data_dir(tmp_path)
+    from_csv = load_catalog(data_dir, use_cache=False)
+    load_catalog(data_dir)  # schreibt den Cache
+    cached = catalog._load(data_dir, use_cache=True)
+
+    assert cached.books_df.equals(from_csv.books_df)
+    assert np.array_equal(cached.user_ids, from_csv.user_ids)
+    assert np.array_equal(cached.read_isbns, from_csv.read_isbns)
@@ -0,0 +1,74 @@
+# tests/test_context_budget.py
+
+# Ältere Tool-Ergebnisse werden verdichtet: Bücher behalten nur die Felder für Rückfragen,
+# egal ob sie unter "results", "suggestions", "recommendations" oder in verschachtelten Listen stehen.
+
+import json
+
+from context_budget import SUMMARY_FIELDS, compact_history, compact_tool_content
+
+DESCRIPTION = "Eine sehr lange Beschreibung. " * 50
+
+
+def book(n, **extra):
+    return {"medium_id": n, "isbn13": 9780000000000 + n, "title": f"Buch {n}", "authors": ["A. Autor"],
+            "bildlink": f"https://example.org/{n}.jpg", "description": DESCRIPTION, **extra}
+
+
+def assert_summarized(books):
+    for entry in books:
+        assert set(entry) <= set(SUMMARY_FIELDS)
+        assert entry["title"].startswith("Buch ")
+
+
+def test_suggestions_are_summarized():
+    content = json.dumps({"exists": False, "match": "fuzzy", "results": [], "suggestions": [book(1), book(2)]})
+    data = json.loads(compact_tool_content(content))
+
+    assert data["exists"] is False and data["match"] == "fuzzy"
+    assert_summarized(data["suggestions"])
+    assert len(compact_tool_content(content)) < len(content) / 5
+
+
+def test_recommendations_are_summarized():
+    content = json.dumps({
+        "found": True,
+        "book": book(1),
+        "recommendations": [book(2, score=0.03, based_on="content"), book(3, co_read_count=4)],
+    })
+    data = json.loads(compact_tool_content(content))
+
+    assert data["found"] is True
+    assert_summarized([data["book"]])
+    assert_summarized(data["recommendations"])
+    assert [b["medium_id"] for b in data["recommendations"]] == [2, 3]
+
+
+def test_nested_lists_and_info_entries():
+    content = json.dumps([[book(1)], [book(2), {"info": "Keine weiteren Treffer."}]])
+    data = json.loads(compact_tool_content(content))
+
+    assert_summarized([data[0][0], data[1][0]])
+    assert data[1][1] == {"info": "Keine weiteren Treffer."}
+
+
+def test_compacting_twice_changes_nothing():
+    content = compact_tool_content(json.dumps({"results": [book(1)], "suggestions": [book(2)]}))
+    assert compact_tool_content(content) == content
+    assert compact_tool_content("kein JSON") == "kein JSON"
+
+
+def test_only_old_turns_are_compacted():
+    tool_content = json.dumps({"suggestions": [book(1)]})
+    messages = []
+    for text in ("eins", "zwei", "drei"):
+        messages += [
+            {"role": "user", "content": text},
+            {"role": "tool", "tool_call_id": text, "content": tool_content},
+            {"role": "assistant", "content": "..."},
+        ]
+    compact_history(messages, keep_recent=2)
+
+    assert "description" not in messages[1]["content"]
+    assert messages[4]["content"] == tool_content
+    assert messages[7]["content"] == tool_content
@@ -0,0 +1,42 @@
+# tests/test_hide_id_line.py
+
+# Die abschliessende medium_id-Liste darf beim Streaming nie angezeigt werden,
+# egal wie GPT die Antwort in Stücke teilt.
+
+import pytest
+
+from chat_engine import _hide_id_line
+
+
+def shown(chunks):
+    return "".join(_hide_id_line(chunks))
+
+
+@pytest.mark.parametrize("chunks", [
+    ["Ende.\n[5]"],
+    ["Ende.\n[5]\n"],
+    ["Ende.\n", "[5]", "\n"],
+    ["Ende.", "\n", "[", "5", "]", "\n", "\n"],
+    ["Ende.\n\n[12345, ", "67896]\n"],
+    ["Ende.\n`[5]`\n"],
+    ["Ende.\n```\n[5]\n```\n"],
+])
+def test_id_line_is_hidden(chunks):
+    assert shown(chunks).strip() == "Ende."
+
+
+@pytest.mark.parametrize("chunks", [
+    ["[1] steht am Anfang\nund danach Text."],
+    ["Liste:\n", "[5]", "\nweiter geht's"],
+    ["Ende.\n[5", " Bände]"],
+])
+def test_other_text_is_kept(chunks):
+    assert shown(chunks) == "".join(chunks)
+
+
+# Normaler Text wird sofort weitergegeben, nicht erst am Ende
+def test_text_is_not_held_back():
+    stream = _hide_id_line(iter(["Hallo ", "Welt.\n", "[5]"]))
+    assert next(stream) == "Hallo "
+    assert next(stream) == "Welt.\n"
+    assert list(stream) == []
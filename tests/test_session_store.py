@@ -0,0 +1,116 @@
+# tests/test_session_store.py
+
+# Zwei SessionStores auf derselben Datei spielen zwei Worker-Prozesse: keiner darf die Runde
+# des anderen überschreiben, und eine Session im Speicher wird neu geladen, wenn der andere
+# Worker sie inzwischen gespeichert hat.
+
+import sqlite3
+import time
+
+import pytest
+
+from session_store import Session, SessionStore, encode_session
+
+
+@pytest.fixture
+def stores(tmp_path):
+    path = str(tmp_path / "sessions.sqlite3")
+    a, b = SessionStore(path), SessionStore(path)
+    yield a, b
+    a.close()
+    b.close()
+
+
+# Eine Runde wie in lit_libby: Nachrichten für GPT und ein Anzeige-Paket
+def add_turn(session, text, checked_at=None):
+    session.memory.message_history += [
+        {"role": "user", "content": text},
+        {"role": "assistant", "content": f"Antwort auf {text}"},
+    ]
+    session.turns.append({"user": text, "text": "", "books": [], "availability": {}, "checked_at": checked_at})
+
+
+def user_messages(session):
+    return [m["content"] for m in session.memory.message_history if m["role"] == "user"]
+
+
+def test_get_reloads_when_other_worker_saved(stores):
+    a, b = stores
+    session = a.get("s")
+    add_turn(session, "eins")
+    a.save("s", session)
+
+    other = b.get("s")
+    add_turn(other, "zwei")
+    b.save("s", other)
+
+    reloaded = a.get("s")
+    assert reloaded is not session
+    assert user_messages(reloaded) == ["eins", "zwei"]
+    assert a.get("s") is reloaded and a.hits == 1
+
+
+def test_concurrent_turns_are_merged(stores):
+    a, b = stores
+    first = a.get("s")
+    add_turn(first, "eins")
+    a.save("s", first)
+
+    # Beide Worker haben Version 1 geladen und hängen gleichzeitig eine Runde an
+    mine, theirs = a.get("s"), b.get("s")
+    add_turn(theirs, "zwei")
+    b.save("s", theirs)
+    add_turn(mine, "drei")
+    a.save("s", mine)
+
+    assert a.conflicts == 1
+    assert user_messages(mine) == ["eins", "zwei", "drei"]
+    assert [turn["user"] for turn in mine.turns] == ["eins", "zwei", "drei"]
+    assert user_messages(b.get("s")) == ["eins", "zwei", "drei"]
+
+
+def test_newer_availability_survives_conflict(stores):
+    a, b = stores
+    session = a.get("s")
+    add_turn(session, "eins", checked_at=1.0)
+    a.save("s", session)
+
+    mine, theirs = a.get("s"), b.get("s")
+    add_turn(theirs, "zwei")
+    b.save("s", theirs)
+    mine.turns[0].update(availability={7: "Ausgeliehen"}, checked_at=2.0)  # wie refresh_and_save
+    a.save("s", mine)
+
+    saved = b.get("s")
+    assert saved.turns[0]["availability"] == {7: "Ausgeliehen"}
+    assert user_messages(saved) == ["eins", "zwei"]
+
+
+def test_first_save_from_two_workers(stores):
+    a, b = stores
+    mine, theirs = a.get("neu"), b.get("neu")
+    add_turn(theirs, "eins")
+    b.save("neu", theirs)
+    add_turn(mine, "zwei")
+    a.save("neu", mine)
+
+    assert user_messages(b.get("neu")) == ["eins", "zwei"]
+
+
+def test_file_without_version_column(tmp_path):
+    path = str(tmp_path / "alt.sqlite3")
+    old = Session()
+    add_turn(old, "eins")
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE sessions (id TEXT PRIMARY KEY, data BLOB NOT NULL, updated REAL NOT NULL)")
+    db.execute("INSERT INTO sessions VALUES ('s', ?, ?)", (encode_session(old), time.time()))
+    db.commit()
+    db.close()
+
+    store = SessionStore(path)
+    session = store.get("s")
+    assert session.version == 1
+    add_turn(session, "zwei")
+    store.save("s", session)
+    assert store.conflicts == 0 and session.version == 2
+    store.close()
@@ -0,0 +1,75 @@
+# tests/test_tool_executor.py
+
+# Zeitlimits und Thread-Verteilung des ToolExecutor: das Zeitlimit zählt ab dem Start eines Aufrufs,
+# die Wartezeit auf einen Thread ist separat begrenzt, und eine Runde mit hängenden Aufrufen
+# blockiert die Aufrufe anderer Runden nicht.
+
+import asyncio
+import time
+
+from tool_executor import ToolExecutor
+
+
+def sleep(seconds):
+    time.sleep(seconds)
+    return {"slept": seconds}
+
+
+def make_executor(**options):
+    return ToolExecutor({"sleep": sleep}, **options)
+
+
+def test_deadline_starts_when_call_runs():
+    executor = make_executor(max_workers=1, timeout=0.4)
+    start = time.monotonic()
+    results = executor.run([("sleep", {"seconds": 0.3}), ("sleep", {"seconds": 0.3})])
+
+    assert results == [{"slept": 0.3}, {"slept": 0.3}]  # der zweite hat 0.3 s gewartet, nicht 0.6 s gerechnet
+    assert time.monotonic() - start >= 0.6
+
+
+def test_running_call_times_out():
+    executor = make_executor(timeout=0.1)
+    assert executor.run([("sleep", {"seconds": 0.3})]) == [{"error": "Timeout: sleep took longer than 0.1 seconds."}]
+
+
+def test_queue_wait_has_own_limit():
+    executor = make_executor(max_workers=1, timeout=5, queue_timeout=0.1)
+    blocker = executor.submit("sleep", {"seconds": 0.4})
+    queued = executor.submit("sleep", {"seconds": 0.01})
+
+    result = executor.collect([queued])[0]
+    assert "waited longer than 0.1 seconds" in result["error"]
+    assert queued.future.cancelled()  # läuft auch später nicht mehr
+    assert executor.collect([blocker]) == [{"slept": 0.4}]
+
+
+def test_hanging_turn_does_not_starve_others():
+    executor = make_executor(max_workers=2, timeout=0.1, max_per_turn=1)
+    slow = executor.turn_slots()
+    results = executor.run([("sleep", {"seconds": 0.5}), ("sleep", {"seconds": 0.5})], slow)
+    assert all("took longer" in r["error"] for r in results)
+
+    # Die langsame Runde belegt nach ihren Zeitlimits immer noch nur einen Thread
+    start = time.monotonic()
+    assert executor.run([("sleep", {"seconds": 0.01})], executor.turn_slots()) == [{"slept": 0.01}]
+    assert time.monotonic() - start < 0.1
+
+
+def test_turn_slots_limit_parallel_calls():
+    executor = make_executor(max_workers=4, max_per_turn=2)
+    start = time.monotonic()
+    results = executor.run([("sleep", {"seconds": 0.2})] * 4, executor.turn_slots())
+
+    assert results == [{"slept": 0.2}] * 4
+    assert time.monotonic() - start >= 0.4  # zwei Durchgänge mit je zwei Aufrufen
+
+
+def test_async_deadline_starts_when_call_runs():
+    executor = make_executor(max_workers=1, timeout=0.4, queue_timeout=2)
+    results = asyncio.run(executor.run_async([("sleep", {"seconds": 0.3}), ("sleep", {"seconds": 0.3})]))
+    assert results == [{"slept": 0.3}, {"slept": 0.3}]
+
+    executor = make_executor(max_workers=1, timeout=5, queue_timeout=0.1)
+    results = asyncio.run(executor.run_async([("sleep", {"seconds": 0.3}), ("sleep", {"seconds": 0.01})]))
+    assert results[0] == {"slept": 0.3} and "waited longer" in results[1]["error"]
@@ -0,0 +1,48 @@
+# tests/test_tracing.py
+
+# Die Kennzahlen-Datei wird nach jeder Runde neu geschrieben; das darf weder bei parallelen
+# Runden noch bei einer kaputten Ausgabe die Anfrage abbrechen.
+
+import os
+import threading
+
+import pytest
+
+import tracing
+
+
+@pytest.fixture
+def restore_tracing():
+    yield
+    tracing.configure(os.environ.get("LIBBY_TRACE"))
+    tracing.reset()
+
+
+def test_parallel_turns_write_metrics(tmp_path, restore_tracing):
+    tracing.configure(f"prometheus:{tmp_path / 'libby.prom'}")
+    errors = []
+
+    def turns():
+        for _ in range(100):
+            try:
+                with tracing.span("turn"):
+                    pass
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=turns) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert os.listdir(tmp_path) == ["libby.prom"]
+    assert 'libby_span_duration_seconds_count{span="turn"} ' in (tmp_path / "libby.prom").read_text(encoding="utf-8")
+
+
+def test_broken_sink_is_counted_not_raised(tmp_path, restore_tracing):
+    tracing.configure(f"prometheus:{tmp_path / 'fehlt' / 'libby.prom'}")
+    with tracing.span("turn"):
+        pass
+    assert 'libby_trace_sink_errors_total{sink="prometheus"} 1' in tracing.format_prometheus()
@@ -0,0 +1,79 @@
+# tests/test_user_tools.py
+
+# Persönliche Empfehlungen: GPT ruft recommend_for_me ohne Parameter auf, die user_id setzt die
+# Engine aus der angemeldeten Session ein – auch dann, wenn GPT selbst eine mitschickt.
+# Gespeichert wird die user_id nie.
+
+import asyncio
+
+import pytest
+
+import chat_engine
+import intent_router
+from benchmarks.fake_llm import FakeOpenAIClient
+from chat_engine import ChatMemory, tool_arguments
+from recommender import recommend_for_user
+
+SCRIPT = [
+    {"tool_calls": [("recommend_for_me", {"user_id": "fremde-nummer"}), ("find_books_by_author", {"author": "Fitzek"})]},
+    {"content": "Hier sind Bücher für dich.\n[1]"},
+]
+
+
+@pytest.fixture
+def seen_user_ids(monkeypatch):
+    seen = []
+    monkeypatch.setattr(intent_router, "ENABLED", False)
+    monkeypatch.setitem(chat_engine.function_map, "recommend_for_me", lambda user_id: seen.append(user_id) or [])
+    monkeypatch.setitem(chat_engine.function_map, "find_books_by_author", lambda author: [])
+    return seen
+
+
+def memory_for(user_id):
+    memory = ChatMemory()
+    memory.user_id = user_id
+    return memory
+
+
+def test_tool_arguments():
+    memory = memory_for("4711")
+    assert tool_arguments("recommend_for_me", "{}", memory) == {"user_id": "4711"}
+    assert tool_arguments("recommend_for_me", "", memory) == {"user_id": "4711"}
+    assert tool_arguments("recommend_for_me", '{"user_id": "0815", "top_n": 3}', memory) == {"user_id": "4711", "top_n": 3}
+    assert tool_arguments("recommend_for_me", "{}", ChatMemory()) == {"user_id": None}
+    assert tool_arguments("find_books_by_author", '{"author": "Fitzek"}', memory) == '{"author": "Fitzek"}'
+
+
+def test_session_user_id_is_injected(seen_user_ids):
+    chat_engine.handle_user_message("Was soll ich lesen?", memory_for("4711"), client=FakeOpenAIClient(SCRIPT))
+    asyncio.run(chat_engine.handle_user_message_async("Was soll ich lesen?", memory_for("4712"),
+                                                      client=_async(FakeOpenAIClient(SCRIPT))))
+    reply = chat_engine.stream_user_message("Was soll ich lesen?", memory_for(None), client=FakeOpenAIClient(SCRIPT))
+    list(reply)
+
+    assert seen_user_ids == ["4711", "4712", None]
+
+
+def test_user_id_is_not_stored():
+    memory = memory_for("4711")
+    assert "user_id" not in memory.to_dict()
+    assert ChatMemory.from_dict(memory.to_dict()).user_id is None
+
+
+def test_anonymous_user_gets_info():
+    assert recommend_for_user(None) == [{"info": "Personal recommendations need a signed-in library account."}]
+
+
+# Der Fake-Client ist synchron; für handle_user_message_async reicht eine Coroutine darum herum
+def _async(client):
+    class AsyncCompletions:
+        async def create(self, **kwargs):
+            return client.create(**kwargs)
+
+    class AsyncChat:
+        completions = AsyncCompletions()
+
+    class AsyncClient:
+        chat = AsyncChat()
+
+    return AsyncClient()
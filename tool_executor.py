@@ -0,0 +1,209 @@
+# tool_executor.py
+
+# Führt die Tool-Aufrufe einer GPT-Antwort parallel aus.
+# GPT schickt oft mehrere unabhängige Aufrufe in einer Nachricht (z.B. find_similar_books_by_title
+# und recommend_by_shared_reads). Statt sie nacheinander abzuarbeiten, laufen sie auf einem
+# begrenzten Thread-Pool. Die Ergebnisse kommen trotzdem in der ursprünglichen Reihenfolge
+# zurück, und jeder Aufruf hat ein eigenes Zeitlimit, damit ein langsames Tool nicht die
+# ganze Runde aufhält.
+# Das Zeitlimit eines Aufrufs zählt erst ab seinem Start auf einem Pool-Thread; die Wartezeit auf
+# einen freien Thread hat ein eigenes Limit (queue_timeout) und steht im Span als queue_ms.
+# Eine Runde belegt höchstens max_per_turn Threads (siehe TurnSlots), damit sie den gemeinsamen
+# Pool nicht für die anderen Sessions verstopft – auch nicht mit Aufrufen, die ihr Zeitlimit
+# überschritten haben und im Hintergrund noch weiterlaufen.
+# Läuft die Runde in einem Streamlit-Skript, bekommt der Pool-Thread für die Dauer des Aufrufs
+# dessen ScriptRunContext, damit st.cache_resource (load_data, load_model, ...) ihn findet.
+
+import asyncio
+import contextvars
+import json  # Für das Umwandeln von Funktionsargumenten
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from streamlit.runtime.scriptrunner_utils.script_run_context import SCRIPT_RUN_CONTEXT_ATTR_NAME
+
+import tracing
+
+
+# Ein gestarteter Aufruf: `started` bekommt die Startzeit auf dem Pool-Thread, `future` das Ergebnis
+class ToolCall:
+    def __init__(self, name):
+        self.name = name
+        self.submitted = time.monotonic()
+        self.started = Future()
+        self.future = Future()
+
+
+# Plätze einer Runde im gemeinsamen Pool: höchstens `limit` Aufrufe gleichzeitig, weitere warten
+# in der Schlange der Runde. Ein Platz wird erst frei, wenn der Aufruf wirklich zu Ende ist.
+class TurnSlots:
+    def __init__(self, pool, limit):
+        self._pool = pool
+        self._free = limit
+        self._waiting = deque()
+        self._lock = threading.Lock()
+
+    def submit(self, fn):
+        with self._lock:
+            if not self._free:
+                self._waiting.append(fn)
+                return
+            self._free -= 1
+        self._pool.submit(self._run, fn)
+
+    def _run(self, fn):
+        try:
+            fn()
+        finally:
+            with self._lock:
+                fn = self._waiting.popleft() if self._waiting else None
+                if fn is None:
+                    self._free += 1
+            if fn is not None:
+                self._pool.submit(self._run, fn)
+
+
+class ToolExecutor:
+    def __init__(self, function_map, max_workers=4, timeout=20.0, timeouts=None, queue_timeout=30.0, max_per_turn=4):
+        self.function_map = function_map  # Funktionsname → Python-Funktion
+        self.timeout = timeout            # Standard-Zeitlimit pro Aufruf in Sekunden (ab Start)
+        self.timeouts = timeouts or {}    # abweichende Zeitlimits pro Funktionsname
+        self.queue_timeout = queue_timeout  # höchstens so lange auf einen freien Thread warten
+        self.max_per_turn = max_per_turn    # Threads, die eine Runde gleichzeitig belegen darf
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool")
+
+    # Neue Plätze für eine Runde; alle Aufrufe der Runde mit slots=... starten
+    def turn_slots(self):
+        return TurnSlots(self._pool, self.max_per_turn)
+
+    # Ein einzelner Aufruf: Argumente parsen, Funktion ausführen, Fehler als Ergebnis zurückgeben
+    def _call(self, func_name, arguments, queued=0.0):
+        py_func = self.function_map.get(func_name)
+        if not py_func:
+            return {"error": f"Unknown function: {func_name}"}
+        tracing.add("tool_queue_seconds_total", queued, tool=func_name)
+        with tracing.span("tool", func_name) as span:
+            try:
+                func_args = json.loads(arguments) if isinstance(arguments, str) else dict(arguments or {})
+                result = py_func(**func_args)
+            except Exception as e:
+                span.status = "error"
+                result = {"error": f'Error: {str(e)}'}
+            if span.recording:
+                span.set(args_bytes=len(str(arguments)), result_bytes=len(json.dumps(result, default=str)),
+                         queue_ms=round(queued * 1000, 1))
+            return result
+
+    # Wie _call, aber mit dem ScriptRunContext der Streamlit-Session; danach bekommt der Thread
+    # seinen vorherigen zurück (die Pool-Threads werden von allen Sessions geteilt)
+    def _call_in_script(self, script_ctx, func_name, arguments, queued=0.0):
+        thread = threading.current_thread()
+        previous = get_script_run_ctx(suppress_warning=True)
+        add_script_run_ctx(thread, script_ctx)
+        try:
+            return self._call(func_name, arguments, queued)
+        finally:
+            setattr(thread, SCRIPT_RUN_CONTEXT_ATTR_NAME, previous)
+
+    # Startet einen Aufruf sofort im Hintergrund (z.B. sobald seine Argumente beim Streaming vollständig sind)
+    # Der Aufruf läuft im Kontext des Aufrufers, damit sein Span unter dem der Runde landet
+    def submit(self, func_name, arguments, slots=None):
+        call = ToolCall(func_name)
+        context = contextvars.copy_context()
+        script_ctx = get_script_run_ctx(suppress_warning=True)  # None ausserhalb von Streamlit (z.B. api_server)
+
+        def run():
+            if not call.future.set_running_or_notify_cancel():
+                return  # hat zu lange auf einen Thread gewartet
+            started = time.monotonic()
+            call.started.set_result(started)
+            queued = started - call.submitted
+            try:
+                if script_ctx is None:
+                    result = context.run(self._call, func_name, arguments, queued)
+                else:
+                    result = context.run(self._call_in_script, script_ctx, func_name, arguments, queued)
+            except BaseException as e:
+                call.future.set_exception(e)
+            else:
+                call.future.set_result(result)
+
+        if slots is None:
+            self._pool.submit(run)
+        else:
+            slots.submit(run)
+        return call
+
+    # Restliche Zeit bis zum Zeitlimit; es zählt ab dem Start des Aufrufs, nicht ab dem Warten auf einen Thread
+    def _remaining(self, name, started):
+        limit = self.timeouts.get(name, self.timeout)
+        return max(0.0, started + limit - time.monotonic()) if limit else None
+
+    def _queue_remaining(self, call):
+        if not self.queue_timeout:
+            return None
+        return max(0.0, call.submitted + self.queue_timeout - time.monotonic())
+
+    # Wartet zu lange auf einen Thread: aus der Schlange nehmen. False, wenn er gerade doch gestartet ist
+    def _give_up_queued(self, call):
+        if not call.future.cancel():
+            return False
+        tracing.add("tool_queue_timeouts_total", 1, tool=call.name)
+        return True
+
+    def _queue_timed_out(self, call):
+        return {"error": f"Timeout: {call.name} waited longer than {self.queue_timeout} seconds for a free worker."}
+
+    def _timed_out(self, call):
+        # Threads lassen sich nicht abbrechen: der Aufruf läuft weiter und sein Ergebnis wird verworfen,
+        # belegt bis dahin aber nur einen Platz seiner eigenen Runde
+        limit = self.timeouts.get(call.name, self.timeout)
+        tracing.add("tool_timeouts_total", 1, tool=call.name)
+        return {"error": f"Timeout: {call.name} took longer than {limit} seconds."}
+
+    # Wartet auf gestartete Aufrufe; Ergebnisse in derselben Reihenfolge, jedes mit eigenem Zeitlimit
+    def collect(self, submitted):
+        results = []
+        for call in submitted:
+            try:
+                started = call.started.result(timeout=self._queue_remaining(call))
+            except TimeoutError:
+                if self._give_up_queued(call):
+                    results.append(self._queue_timed_out(call))
+                    continue
+                started = call.started.result()
+            try:
+                results.append(call.future.result(timeout=self._remaining(call.name, started)))
+            except TimeoutError:
+                results.append(self._timed_out(call))
+        return results
+
+    # Wie collect, aber ohne einen Thread zu blockieren (für asyncio)
+    async def collect_async(self, submitted):
+        async def wait(call):
+            # shield: ein Zeitlimit beim Warten darf `started` nicht abbrechen, das setzt der Pool-Thread
+            try:
+                started = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(call.started)),
+                                                 self._queue_remaining(call))
+            except asyncio.TimeoutError:
+                if self._give_up_queued(call):
+                    return self._queue_timed_out(call)
+                started = await asyncio.wrap_future(call.started)
+            try:
+                return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(call.future)),
+                                              self._remaining(call.name, started))
+            except asyncio.TimeoutError:
+                return self._timed_out(call)
+
+        return list(await asyncio.gather(*(wait(call) for call in submitted)))
+
+    # Führt alle Aufrufe (Liste von (Name, Argumente)) gleichzeitig aus.
+    # Rückgabe: Ergebnisse in derselben Reihenfolge wie die Aufrufe
+    def run(self, calls, slots=None):
+        return self.collect([self.submit(name, arguments, slots) for name, arguments in calls])
+
+    async def run_async(self, calls, slots=None):
+        return await self.collect_async([self.submit(name, arguments, slots) for name, arguments in calls])
@@ -4,6 +4,39 @@
 # Sie werden z.B. von einem Sprachmodell wie GPT-4 verwendet, um gezielt eine Funktion auszuführen.
 
 tools = [
+    {
+        "type": "function",
+        "function": {
+            "name": "recommend_for_me",
+            "description": (
+                "Recommends books for the signed-in user based on their whole borrowing history. "
+                "Takes no arguments: the user is identified by the login, never by anything said in the chat. "
+                "Use this when the user asks for personal recommendations without naming a book or topic."
+            ),
+            "parameters": {"type": "object", "properties": {}}
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "recommend_books_like_title",
+            "description": (
+                "Finds the book with the given title and recommends similar books in a single call: "
+                "combines content similarity and books read by the same users into one ranked, deduplicated list "
+                "with medium_ids. Use this for any request like 'books like X' or 'I liked X, what else?'."
+            ),
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "title": {
+                        "type": "string",
+                        "description": "The title of the book the user liked, e.g. 'Die Frau in Rot'"
+                    }
+                },
+                "required": ["title"]
+            }
+        }
+    },
     {
         "type": "function",  # Typ: Funktion, d.h. diese Einheit ruft eine bestimmte Python-Funktion auf
         "function": {
@@ -55,7 +88,7 @@ tools = [
                 "properties": {
                     "author": {
                         "type": "string",
-                        "description": "The author's name, e.g. 'John Grisham'"
+                        "description": "The author's full name or just the last name, e.g. 'John Grisham' or 'Grisham'"
                     }
                 },
                 "required": ["author"]
@@ -93,7 +126,8 @@ tools = [
             "name": "is_book_in_library",
             "description": (
                 "Checks if one or more books with a given title exist in the dataset and returns metadata for all matches. "
-                "If multiple books match the title (e.g. a series), all are returned in the 'results' list."
+                "If multiple books match the title (e.g. a series), all are returned in the 'results' list. "
+                "If only similarly spelled titles exist, 'exists' is false and they are listed in 'suggestions'."
             ),
             "parameters": {
                 "type": "object",
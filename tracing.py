@@ -0,0 +1,266 @@
+# tracing.py
+
+# Strukturierte Messpunkte (Spans) für jede Runde: GPT-Anfragen, Tool-Aufrufe,
+# Verfügbarkeitsabfragen und model.encode, jeweils mit Dauer, Nutzlast-Grössen und
+# Token-Verbrauch. Eingeschaltet wird über die Umgebungsvariable LIBBY_TRACE (oder configure()),
+# eine kommagetrennte Liste von Ausgaben:
+#   console               eine Zeile pro Span auf stdout (ersetzt die früheren Emoji-Prints)
+#   jsonl:traces.jsonl    ein JSON-Objekt pro Span (trace_id/parent_id verbinden eine Runde)
+#   prometheus:libby.prom Kennzahlen im Prometheus-Textformat (Histogramme + Zähler),
+#                         nach jeder Runde und beim Beenden neu geschrieben (z.B. für den node_exporter)
+# Ohne LIBBY_TRACE liefert span() ein gemeinsames Leer-Objekt: kein Zeitstempel, keine
+# Allokation, kein Lock. Teure Attribute (z.B. JSON-Grössen) nur berechnen, wenn span.recording.
+
+import atexit
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+
+# Obergrenzen der Histogramm-Buckets in Sekunden
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_current = contextvars.ContextVar("libby_span", default=None)  # offener Span im aktuellen Kontext
+_ids = itertools.count(1)
+_lock = threading.Lock()
+_write_lock = threading.Lock()  # nur ein Thread schreibt die Kennzahlen-Datei
+_console = False
+_jsonl = None            # offene JSON-Lines-Datei
+_prometheus_path = None
+_histograms = {}         # (span, target) → [Anzahl pro Bucket..., +Inf, Summe]
+_errors = {}             # (span, target) → Anzahl
+_counters = {}           # (Name, Labels) → Summe
+enabled = False
+
+
+class _NoopSpan:
+    recording = False
+    status = "ok"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class Span:
+    recording = True
+
+    def __init__(self, name, target=None, attrs=None):
+        self.name = name          # Art des Spans, z.B. "llm", "tool", "availability.fetch"
+        self.target = target      # optional: was genau (Tool-Name, Modell ...), wird zum Metrik-Label
+        self.attrs = attrs or {}
+        self.status = "ok"
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        parent = _current.get()
+        self.parent_id = parent.span_id if parent else None
+        self.trace_id = parent.trace_id if parent else None
+        self.depth = parent.depth + 1 if parent else 0
+        self.span_id = next(_ids)
+        if self.trace_id is None:
+            self.trace_id = f"{os.getpid()}-{self.span_id}"
+        self._token = _current.set(self)
+        self.start = time.time()
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self._t0
+        if exc_type is not None:
+            self.status = "error"
+            self.attrs.setdefault("error", f"{exc_type.__name__}: {exc}")
+        try:
+            _current.reset(self._token)
+        except ValueError:
+            pass  # z.B. ein Generator, der in einem anderen Kontext geschlossen wurde
+        _finish(self)
+        return False
+
+
+# Neuer Span; als Kontextmanager verwenden:  with span("tool", "find_books_by_author") as s: ...
+def span(name, target=None, **attrs):
+    if not enabled:
+        return _NOOP
+    return Span(name, target, attrs)
+
+
+# Markiert den offenen Span als fehlerhaft, wenn eine Funktion den Fehler selbst abfängt
+# (z.B. ein Tool, das bei Fehlern eine leere Liste liefert)
+def record_error(exc):
+    current = _current.get()
+    if current is not None:
+        current.status = "error"
+        current.attrs.setdefault("error", f"{type(exc).__name__}: {exc}")
+
+
+# Addiert einen Zähler, z.B. add("llm_tokens_total", 1234, kind="prompt")
+def add(name, value, **labels):
+    if not enabled or not value:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def _finish(span):
+    key = (span.name, span.target)
+    with _lock:
+        counts = _histograms.setdefault(key, [0] * (len(BUCKETS) + 2))
+        for i, bound in enumerate(BUCKETS):
+            if span.duration <= bound:
+                counts[i] += 1
+        counts[len(BUCKETS)] += 1
+        counts[-1] += span.duration
+        if span.status != "ok":
+            _errors[key] = _errors.get(key, 0) + 1
+
+        failed = []  # Ausgaben, die nicht geschrieben werden konnten
+        if _jsonl is not None:
+            record = {
+                "trace_id": span.trace_id,
+                "span_id": span.span_id,
+                "parent_id": span.parent_id,
+                "name": span.name,
+                "target": span.target,
+                "start": round(span.start, 6),
+                "duration_ms": round(span.duration * 1000, 3),
+                "status": span.status,
+                **span.attrs,
+            }
+            try:
+                _jsonl.write(json.dumps(record, default=str, ensure_ascii=False) + "\n")
+                _jsonl.flush()
+            except Exception:
+                failed.append("jsonl")
+
+    if _console:
+        label = f"{span.name}[{span.target}]" if span.target else span.name
+        attrs = " ".join(f"{k}={v}" for k, v in span.attrs.items())
+        try:
+            print(f"{'  ' * span.depth}⏱️ {label} {span.duration * 1000:.1f} ms {span.status} {attrs}".rstrip())
+        except Exception:
+            failed.append("console")
+
+    # Eine abgeschlossene Runde (oberster Span) ist ein guter Zeitpunkt für die Kennzahlen-Datei
+    if span.parent_id is None and _prometheus_path:
+        try:
+            write_prometheus()
+        except Exception:
+            failed.append("prometheus")
+
+    # Fehler einer Ausgabe (volle Platte, gelöschter Ordner ...) dürfen nie die Anfrage abbrechen,
+    # deren Span gerade endet; sie werden nur gezählt
+    for sink in failed:
+        add("trace_sink_errors_total", 1, sink=sink)
+
+
+# --------------------------
+# Prometheus-Textformat
+# --------------------------
+
+def _labels(pairs):
+    pairs = [(k, v) for k, v in pairs if v is not None]
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def format_prometheus():
+    with _lock:
+        histograms = {key: list(counts) for key, counts in _histograms.items()}
+        errors = dict(_errors)
+        counters = dict(_counters)
+
+    lines = [
+        "# HELP libby_span_duration_seconds Dauer der Spans (GPT-Anfragen, Tools, Verfügbarkeit, Embeddings)",
+        "# TYPE libby_span_duration_seconds histogram",
+    ]
+    for (name, target), counts in sorted(histograms.items(), key=lambda item: (item[0][0], item[0][1] or "")):
+        base = [("span", name), ("target", target)]
+        for bound, count in zip(BUCKETS, counts):
+            lines.append(f"libby_span_duration_seconds_bucket{_labels(base + [('le', bound)])} {count}")
+        lines.append(f"libby_span_duration_seconds_bucket{_labels(base + [('le', '+Inf')])} {counts[len(BUCKETS)]}")
+        lines.append(f"libby_span_duration_seconds_sum{_labels(base)} {counts[-1]:.6f}")
+        lines.append(f"libby_span_duration_seconds_count{_labels(base)} {counts[len(BUCKETS)]}")
+
+    lines += ["# HELP libby_span_errors_total Spans mit Fehler", "# TYPE libby_span_errors_total counter"]
+    for (name, target), count in sorted(errors.items(), key=lambda item: (item[0][0], item[0][1] or "")):
+        lines.append(f"libby_span_errors_total{_labels([('span', name), ('target', target)])} {count}")
+
+    for metric in sorted({name for name, _ in counters}):
+        lines.append(f"# TYPE libby_{metric} counter")
+        for (name, labels), value in sorted(counters.items()):
+            if name == metric:
+                lines.append(f"libby_{metric}{_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+# Schreibt die Kennzahlen atomar, damit ein Scraper nie eine halbe Datei liest.
+# Temporäre Datei pro Prozess und Thread, geschrieben wird immer nur von einem Thread zur Zeit.
+def write_prometheus(path=None):
+    path = path or _prometheus_path
+    if not path:
+        return
+    text = format_prometheus()
+    tmp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    with _write_lock:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+
+# --------------------------
+# Konfiguration
+# --------------------------
+
+# spec wie LIBBY_TRACE, z.B. "console,jsonl:traces.jsonl"; None oder "" schaltet alles aus
+def configure(spec):
+    global enabled, _console, _jsonl, _prometheus_path
+    with _lock:
+        if _jsonl is not None:
+            _jsonl.close()
+        _console, _jsonl, _prometheus_path = False, None, None
+        for item in filter(None, (part.strip() for part in (spec or "").split(","))):
+            kind, _, path = item.partition(":")
+            if kind == "console":
+                _console = True
+            elif kind == "jsonl" and path:
+                _jsonl = open(path, "a", encoding="utf-8")
+            elif kind == "prometheus" and path:
+                _prometheus_path = path
+            else:
+                raise ValueError(f"Unbekannte Trace-Ausgabe: {item!r}")
+        enabled = bool(_console or _jsonl or _prometheus_path)
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _errors.clear()
+        _counters.clear()
+
+
+# Letzter Stand beim Beenden; ein Fehler hier soll das Beenden nicht stören
+def _write_at_exit():
+    try:
+        write_prometheus()
+    except OSError:
+        pass
+
+
+configure(os.environ.get("LIBBY_TRACE"))
+atexit.register(_write_at_exit)
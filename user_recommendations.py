@@ -0,0 +1,134 @@
+# user_recommendations.py
+
+# Persönliche Empfehlungen für alle Nutzer, offline vorberechnet.
+# Pro Nutzer werden zwei Signale über alle Bücher gemischt:
+# - Inhalt:   Kosinus-Ähnlichkeit zum Leseprofil (Mittelwert der normalisierten Embeddings
+#             der gelesenen Bücher)
+# - Co-Reads: wie oft jedes Buch von Lesern der eigenen Bücher gelesen wurde (Ko-Okkurrenz),
+#             pro Nutzer auf 0..1 skaliert
+# Bereits gelesene Bücher werden ausgeschlossen. Gerechnet wird vektorisiert in Blöcken von
+# Nutzern (Sparse-Matrix × Embeddings bzw. × Ko-Okkurrenz), damit der Speicher begrenzt bleibt.
+#
+# Offline-Build:   python user_recommendations.py [--top-n 20] [--content-weight 0.7]
+# Zur Laufzeit ist eine Empfehlung nur noch ein Hash-Lookup (user_id → Zeile) plus Zeilenzugriff.
+
+import numpy as np  # für numerische Operationen (z.B. Matrizen)
+
+from book_index import KeyIndex  # Hash-Map Schlüssel → Zeilen
+from catalog import DATA_DIR, load_catalog  # gemeinsamer, gecachter Datenlader
+from co_reads import CoReadIndex, co_occurrence
+from vector_search import VectorIndex, l2_normalize, top_k_indices
+
+USER_RECOMMENDATIONS_PATH = "./00_data/user_recommendations.npz"
+DEFAULT_TOP_N = 20
+CONTENT_WEIGHT = 0.7            # Anteil des Inhalts-Signals, der Rest kommt aus den Co-Reads
+MAX_BLOCK_ELEMENTS = 1 << 25    # Nutzer × Bücher pro Block (32M float32 ≈ 128 MB)
+
+
+# Empfehlungen für einen Block von Nutzern (Zeilen von user_reads); `exclude` sind Buchpositionen,
+# die nie empfohlen werden. Rückgabe: Buchpositionen (Nutzer × top_n, -1 = keine) und die gemischten Scores
+def score_users(user_reads, vectors, cooc, top_n=DEFAULT_TOP_N, content_weight=CONTENT_WEIGHT, exclude=None):
+    reads = user_reads.astype(np.float32)
+    reads.data[:] = 1.0  # jedes gelesene Buch zählt einmal
+
+    profiles = l2_normalize(reads @ vectors)  # Mittelwert-Richtung der gelesenen Bücher
+    content = profiles @ vectors.T
+
+    co_reads = (reads @ cooc).toarray()
+    top = co_reads.max(axis=1, keepdims=True)
+    np.divide(co_reads, top, out=co_reads, where=top > 0)
+
+    scores = content_weight * content + (1 - content_weight) * co_reads
+    scores[reads.nonzero()] = -np.inf  # schon gelesen
+    if exclude is not None:
+        scores[:, exclude] = -np.inf
+
+    idxs = top_k_indices(scores, top_n)
+    top_scores = np.take_along_axis(scores, idxs, axis=-1)
+    idxs[~np.isfinite(top_scores)] = -1
+    idxs[reads.getnnz(axis=1) == 0] = -1  # ohne Ausleihen keine persönliche Empfehlung
+    return idxs.astype(np.int32), np.where(idxs >= 0, top_scores, 0).astype(np.float32)
+
+
+class UserRecommendations:
+    def __init__(self, user_ids, recommendations, scores):
+        self.user_index = KeyIndex(user_ids)      # user_id → Zeile
+        self.recommendations = recommendations    # int32, (Nutzer × N) Buchpositionen, -1 = keine
+        self.scores = scores                      # float32, (Nutzer × N)
+
+    @property
+    def top_n(self):
+        return self.recommendations.shape[1]
+
+    # Buchpositionen und Scores für einen Nutzer; None, wenn die user_id unbekannt ist
+    def lookup(self, user_id, top_n=5):
+        row = self.user_index.first(user_id)
+        if row is None:
+            return None
+        idxs = self.recommendations[row, :top_n]
+        keep = idxs >= 0
+        return idxs[keep], self.scores[row, :top_n][keep]
+
+
+# Lädt die Tabelle; None, wenn sie fehlt oder nicht zu den aktuellen Quelldateien passt
+def load_user_recommendations(path, source_hashes):
+    try:
+        with np.load(path) as data:
+            if any(str(data[f"{name}_sha1"]) != sha1 for name, sha1 in source_hashes.items()):
+                print(f"⚠️ Empfehlungstabelle {path} ist veraltet – bitte 'python user_recommendations.py' ausführen.")
+                return None
+            return UserRecommendations(data["user_ids"], data["recommendations"], data["scores"])
+    except FileNotFoundError:
+        return None
+
+
+def build_user_recommendations(path=USER_RECOMMENDATIONS_PATH, data_dir=DATA_DIR, top_n=DEFAULT_TOP_N,
+                               content_weight=CONTENT_WEIGHT):
+    import os
+
+    catalog = load_catalog(data_dir)
+    isbns = catalog.books_df["isbn13"].to_numpy()
+    user_reads = CoReadIndex.from_flat(isbns, catalog.read_isbns, catalog.read_counts).user_reads
+    vectors = VectorIndex(catalog.embeddings).vectors
+    cooc = co_occurrence(user_reads).astype(np.float32)
+    # Doppelte ISBNs: Ausleihen zählen nur für die erste Zeile, die weiteren würden sonst
+    # als "ungelesen" empfohlen
+    _, first_rows = np.unique(isbns, return_index=True)
+    duplicates = np.setdiff1d(np.arange(len(isbns)), first_rows)
+
+    n_users = user_reads.shape[0]
+    top_n = min(top_n, len(isbns))
+    block = max(1, MAX_BLOCK_ELEMENTS // max(len(isbns), 1))
+    recommendations = np.full((n_users, top_n), -1, dtype=np.int32)
+    scores = np.zeros((n_users, top_n), dtype=np.float32)
+    for start in range(0, n_users, block):
+        stop = min(start + block, n_users)
+        recommendations[start:stop], scores[start:stop] = score_users(
+            user_reads[start:stop], vectors, cooc, top_n, content_weight, duplicates
+        )
+    print(f"🧱 Empfehlungen für {n_users} Nutzer berechnet ({len(isbns)} Bücher, Blöcke à {block} Nutzer)")
+
+    # Atomar schreiben, damit laufende Prozesse nie eine halbe Datei lesen
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(
+            f,
+            user_ids=catalog.user_ids,
+            recommendations=recommendations,
+            scores=scores,
+            content_weight=np.float32(content_weight),
+            **{f"{name}_sha1": np.str_(sha1) for name, sha1 in catalog.source_hashes.items()},
+        )
+    os.replace(tmp_path, path)
+    print(f"✅ Empfehlungstabelle gespeichert: {path}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Berechnet persönliche Empfehlungen für alle Nutzer.")
+    parser.add_argument("--top-n", type=int, default=DEFAULT_TOP_N, help="Anzahl gespeicherter Empfehlungen pro Nutzer")
+    parser.add_argument("--content-weight", type=float, default=CONTENT_WEIGHT,
+                        help="Gewicht der inhaltlichen Ähnlichkeit (0..1), der Rest zählt die Co-Reads")
+    args = parser.parse_args()
+    build_user_recommendations(top_n=args.top_n, content_weight=args.content_weight)
@@ -0,0 +1,174 @@
+# vector_search.py
+
+# Kleine Vektorsuche über die Buch-Embeddings.
+# Die Matrix wird einmal beim Laden L2-normalisiert; danach ist die Kosinus-Ähnlichkeit
+# nur noch ein Skalarprodukt. Für die Top-k wird argpartition verwendet, sodass nur die
+# wenigen besten Treffer sortiert werden statt aller Bücher.
+
+import numpy as np  # für numerische Operationen (z.B. Matrizen)
+
+
+# Normalisiert Vektoren zeilenweise auf Länge 1 (Nullvektoren bleiben unverändert)
+def l2_normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+# Indizes der k größten Werte pro Zeile, absteigend sortiert
+def top_k_indices(scores, k):
+    k = min(k, scores.shape[-1])
+    if k <= 0:
+        return np.empty(scores.shape[:-1] + (0,), dtype=np.int64)
+    part = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    part_scores = np.take_along_axis(scores, part, axis=-1)
+    order = np.argsort(-part_scores, axis=-1, kind="stable")
+    return np.take_along_axis(part, order, axis=-1)
+
+
+class VectorIndex:
+    def __init__(self, embeddings):
+        self.vectors = l2_normalize(embeddings)  # (Bücher × Dimension), einmalig normalisiert
+
+    def __len__(self):
+        return self.vectors.shape[0]
+
+    # Normalisierter Vektor eines Buches (float32)
+    def vector(self, idx):
+        return np.asarray(self.vectors[idx], dtype=np.float32)
+
+    # Normalisierte Vektoren eines Zeilenbereichs (float32)
+    def rows(self, start, stop):
+        return np.asarray(self.vectors[start:stop], dtype=np.float32)
+
+    # Kosinus-Ähnlichkeit einer oder mehrerer Anfragen zu allen Büchern
+    def scores(self, queries):
+        return l2_normalize(queries) @ self.vectors.T
+
+    # Top-k für einen einzelnen Anfragevektor; `exclude` entfernt z.B. das Ausgangsbuch selbst
+    def search(self, query, top_k=5, exclude=None):
+        scores = self.scores(np.asarray(query).reshape(-1))
+        if exclude is not None:
+            scores[exclude] = -np.inf
+            top_k = min(top_k, len(self) - np.size(exclude))
+        idxs = top_k_indices(scores, top_k)
+        return idxs, scores[idxs]
+
+    # Top-k für viele Anfragen auf einmal: eine Matrixmultiplikation für den ganzen Batch
+    def search_batch(self, queries, top_k=5):
+        scores = self.scores(np.atleast_2d(queries))
+        idxs = top_k_indices(scores, top_k)
+        return idxs, np.take_along_axis(scores, idxs, axis=-1)
+
+
+# --------------------------
+# Vorberechnete Tabelle ähnlicher Bücher
+# --------------------------
+
+# Für jedes Buch werden die Top-N Nachbarn (Indizes + Scores) offline berechnet und in 00_data/
+# abgelegt (python vector_search.py, dauert bei vielen Büchern einige Minuten). Zur Laufzeit wird die
+# Tabelle nur per Memory-Map geladen, eine Abfrage ist dann ein Zeilenzugriff. Passt sie nicht mehr
+# zu Embeddings oder Buchliste, wird sie ignoriert und ähnliche Bücher werden live gesucht.
+
+SIMILAR_BOOKS_PREFIX = "./00_data/similar_books"
+SIMILAR_BOOKS_TOP_N = 20
+
+
+# Berechnet die Top-N Nachbarn aller Bücher blockweise (ohne das Buch selbst)
+def build_similar_books_table(index, top_n=SIMILAR_BOOKS_TOP_N, chunk_size=1024):
+    n_books = len(index)
+    top_n = min(top_n, n_books - 1)
+    neighbors = np.empty((n_books, top_n), dtype=np.int32)
+    scores = np.empty((n_books, top_n), dtype=np.float32)
+    for start in range(0, n_books, chunk_size):
+        end = min(start + chunk_size, n_books)
+        block = index.scores(index.rows(start, end))
+        block[np.arange(end - start), np.arange(start, end)] = -np.inf  # sich selbst ausschliessen
+        idxs = top_k_indices(block, top_n)
+        neighbors[start:end] = idxs
+        scores[start:end] = np.take_along_axis(block, idxs, axis=-1)
+    return neighbors, scores
+
+
+class SimilarBooksTable:
+    def __init__(self, neighbors, scores):
+        self.neighbors = neighbors  # int32 (Bücher × N), memory-mapped
+        self.scores = scores        # float32 (Bücher × N), memory-mapped
+
+    @property
+    def top_n(self):
+        return self.neighbors.shape[1]
+
+    # O(1)-Lookup; None, wenn mehr Nachbarn verlangt werden als gespeichert sind
+    def lookup(self, idx, top_n):
+        if top_n > self.top_n:
+            return None
+        return np.asarray(self.neighbors[idx, :top_n]), np.asarray(self.scores[idx, :top_n])
+
+
+def _similar_books_paths(prefix):
+    return {"meta": f"{prefix}_meta.json", "neighbors": f"{prefix}_idx.npy", "scores": f"{prefix}_scores.npy"}
+
+
+def _similar_books_meta(index, source_hashes, top_n):
+    return {
+        "embeddings_sha1": source_hashes["embeddings"],
+        "books_sha1": source_hashes["books"],
+        "top_n": min(top_n, len(index) - 1),
+    }
+
+
+# Berechnet die Tabelle und schreibt sie atomar (erst Daten, zuletzt die Metadatei als "fertig"-Markierung).
+# Temporäre Dateien mit Prozess-ID, damit sich gleichzeitige Läufe nicht die Datei wegnehmen.
+def save_similar_books_table(index, source_hashes, prefix=SIMILAR_BOOKS_PREFIX, top_n=SIMILAR_BOOKS_TOP_N):
+    import json
+    import os
+
+    paths = _similar_books_paths(prefix)
+    neighbors, scores = build_similar_books_table(index, top_n)
+    for path, array in ((paths["neighbors"], neighbors), (paths["scores"], scores)):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp_path, path)
+    tmp_path = f"{paths['meta']}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(_similar_books_meta(index, source_hashes, top_n), f)
+    os.replace(tmp_path, paths["meta"])
+
+
+# Lädt die Tabelle per Memory-Map; None, wenn sie fehlt oder nicht mehr zu den Quelldateien passt.
+# source_hashes: SHA-1 der Quelldateien, z.B. catalog.source_hashes
+def load_similar_books_table(index, source_hashes, prefix=SIMILAR_BOOKS_PREFIX, top_n=SIMILAR_BOOKS_TOP_N):
+    import json
+
+    paths = _similar_books_paths(prefix)
+    try:
+        with open(paths["meta"], encoding="utf-8") as f:
+            fresh = json.load(f) == _similar_books_meta(index, source_hashes, top_n)
+    except FileNotFoundError:
+        return None
+    except ValueError:
+        fresh = False
+    if not fresh:
+        print(f"⚠️ Tabelle ähnlicher Bücher {prefix}_* ist veraltet – bitte 'python vector_search.py' ausführen.")
+        return None
+    return SimilarBooksTable(np.load(paths["neighbors"], mmap_mode="r"), np.load(paths["scores"], mmap_mode="r"))
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from catalog import load_catalog
+
+    parser = argparse.ArgumentParser(description="Baut die Tabelle der Top-N ähnlichen Bücher für alle Bücher.")
+    parser.add_argument("--top-n", type=int, default=SIMILAR_BOOKS_TOP_N, help="Anzahl gespeicherter Nachbarn pro Buch")
+    parser.add_argument("--prefix", default=SIMILAR_BOOKS_PREFIX)
+    args = parser.parse_args()
+
+    catalog = load_catalog()
+    start = time.perf_counter()
+    save_similar_books_table(VectorIndex(catalog.embeddings), catalog.source_hashes, args.prefix, args.top_n)
+    print(f"✅ Tabelle ähnlicher Bücher gespeichert: {args.prefix}_* ({time.perf_counter() - start:.1f} s)")